@@ -123,18 +123,22 @@
 # if __name__ == '__main__':
 #     app.run(debug=True, port=5000)
 
-import cv2
 import numpy as np
-from keras.models import load_model
-from keras.preprocessing.image import img_to_array
-import imutils
 import os
-import json
 import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
-import base64
 import sys
+import atexit
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from utils.inference_batcher import InferenceBatcher
+from utils.engagement_log import EngagementLog
+from utils.inference_backend import get_backend
+from utils.metrics import metrics, SamplingProfiler
+from utils.model_registry import model_registry
+from engine import AnalysisEngine, EngineConfig, TrackingConfig, TARGET_EMOTIONS
 
 app = Flask(__name__)
 #CORS(app, origins=["http://localhost:5173"], supports_credentials=True)
@@ -151,6 +155,9 @@ DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__
 # Create data directory if it doesn't exist
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# "batch", "interval" or "never"; see EngagementLog
+LOG_FSYNC_POLICY = os.environ.get('ENGAGEMENT_LOG_FSYNC', 'interval')
+
 # Debug: Check if Haar cascade XML files exist
 print("Face cascade path:", HAAR_FACE)
 print("Exists?", os.path.exists(HAAR_FACE))
@@ -159,78 +166,123 @@ print("Exists?", os.path.exists(HAAR_EYE))
 print("Data directory:", DATA_DIR)
 print("Exists?", os.path.exists(DATA_DIR))
 
-# Load Haarcascades
-face_cascade = cv2.CascadeClassifier(HAAR_FACE)
-eye_cascade = cv2.CascadeClassifier(HAAR_EYE)
+# keras, tflite-float16, tflite-int8 or onnx (see utils/inference_backend.py)
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras')
 
 # Load emotion model with error handling
 if not os.path.exists(MODEL_PATH):
     print(f"ERROR: Model file '{MODEL_PATH}' not found. Please add your trained model to this path.")
     sys.exit(1)
 else:
-    emotion_classifier = load_model(MODEL_PATH, compile=False)
-
-EMOTIONS = ["angry", "disgust", "fear", "happy", "sad", "surprised", "neutral"]
-
-# Map model emotions to 4 target emotions
-EMOTION_MAP = {
-    "angry": "frustrated",
-    "disgust": "frustrated",
-    "fear": "confused",
-    "happy": "focused",
-    "sad": "bored",
-    "surprised": "focused",
-    "neutral": "focused"
-}
-TARGET_EMOTIONS = ["bored", "confused", "frustrated", "focused"]
+    # Shared through the model registry so load time and memory are reported
+    emotion_classifier = get_backend(INFERENCE_BACKEND)
+    if emotion_classifier is None:
+        print(f"ERROR: Could not load model '{MODEL_PATH}'.")
+        sys.exit(1)
+    print("Inference backend:", emotion_classifier.name)
+
+# Concurrent requests share batched model calls; tune with these env vars
+BATCH_MAX_SIZE = int(os.environ.get('INFERENCE_BATCH_MAX_SIZE', 32))
+BATCH_MAX_WAIT_MS = float(os.environ.get('INFERENCE_BATCH_MAX_WAIT_MS', 5))
+
+inference_batcher = InferenceBatcher(
+    emotion_classifier.predict,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS
+)
+
+# Request-level metrics; per-stage latencies come from metrics.span
+requests_total = metrics.counter("engagement_requests_total", help_text="Analyzed requests")
+errors_total = metrics.counter("engagement_errors_total", help_text="Requests that raised")
+metrics.gauge(
+    "engagement_log_queue_depth",
+    fn=lambda: sum(log.queue_depth() for log in list(_engagement_logs.values())),
+    help_text="Records waiting for the log writer"
+)
+metrics.gauge(
+    "engagement_model_resident_bytes", {"model": "video_emotion"},
+    fn=lambda: model_registry.stats().get("video_emotion", {}).get("resident_bytes", 0),
+    help_text="Resident memory added by loading the model"
+)
+
+def predict_batched(rois):
+    """Submit each ROI to the shared batcher so concurrent requests share model calls"""
+    futures = [inference_batcher.submit(roi) for roi in rois]
+    return np.stack([future.result() for future in futures])
+
+# Shared analysis engine (src/engine). The face cascade scans a copy
+# DETECTION_WIDTH pixels wide and searches near each user's previous face
+# first (FACE_SEARCH_*); eye checks are reused for ATTENTION_RECHECK_EVERY
+# requests per user and debounced (ATTENTION_ON/OFF_CHECKS). Cascades are
+# loaded per thread, since CascadeClassifier is not safe to share.
+engine = AnalysisEngine(
+    EngineConfig.from_env(
+        detection={
+            'cascade': HAAR_FACE,
+            'detection_width': 400,
+            'scale_factor': 1.1,
+            'min_neighbors': 5,
+            'min_size': 30,
+            'search_window': True,
+            'search_ttl': float(os.environ.get('FACE_SEARCH_TTL_S', 2.0)),
+            'search_max_keys': int(os.environ.get('FACE_SEARCH_MAX_USERS', 1024)),
+            'search_expand': float(os.environ.get('FACE_SEARCH_EXPAND', 0.5))
+        },
+        attention={'cascade': HAAR_EYE},
+        tracking=TrackingConfig(mode='key'),
+        # Only the first face is reported
+        max_faces=1
+    ),
+    predict_fn=predict_batched
+)
+
+PROFILER_ENABLED = os.environ.get('ENABLE_PROFILER', '') == '1'
+profiler = SamplingProfiler()
+
+# One append-only log per data type, created on first write
+_engagement_logs = {}
+_engagement_logs_lock = threading.Lock()
+
+def get_engagement_log(data_type):
+    with _engagement_logs_lock:
+        log = _engagement_logs.get(data_type)
+        if log is None:
+            log = EngagementLog(DATA_DIR, data_type, fsync=LOG_FSYNC_POLICY)
+            _engagement_logs[data_type] = log
+        return log
+
+@atexit.register
+def close_engagement_logs():
+    with _engagement_logs_lock:
+        for log in _engagement_logs.values():
+            log.close()
 
 def write_to_json_file(data_type, data):
-    """Write data to a JSON file in the data directory"""
+    """Queue data for the append-only JSON-lines log of this data type"""
     try:
-        file_path = os.path.join(DATA_DIR, f"{data_type}.json")
-        
-        # Read existing data if available
-        existing_data = []
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                try:
-                    existing_data = json.load(f)
-                except json.JSONDecodeError:
-                    existing_data = []
-        
-        # Ensure existing_data is a list
-        if not isinstance(existing_data, list):
-            existing_data = []
-        
         # Add timestamp to the data
         data['timestamp'] = datetime.datetime.now().isoformat()
         
-        # Append new data
-        existing_data.append(data)
-        
-        # Write updated data back to the file
-        with open(file_path, 'w') as f:
-            json.dump(existing_data, f, indent=2)
-            
-        return True
+        return get_engagement_log(data_type).append(data)
     except Exception as e:
-        print(f"Error writing to JSON file: {e}")
+        print(f"Error writing to engagement log: {e}")
         return False
 
-def analyze_image(image_data):
-    """Analyze a single image and return engagement metrics"""
-    # Decode base64 image
-    img_bytes = base64.b64decode(image_data.split(',')[1])
-    nparr = np.frombuffer(img_bytes, np.uint8)
-    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    # Process the image
-    frame = imutils.resize(frame, width=400)
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30), flags=cv2.CASCADE_SCALE_IMAGE)
-    
+def analyze_image(image_data, user_id=None):
+    """Analyze a single image (base64 data URL or encoded bytes) and return engagement metrics"""
+    # Anonymous clients share an ID, so no per-user state is kept for them
+    key = None if user_id in (None, 'unknown') else user_id
+    return engagement_response(engine.analyze(encoded=image_data, key=key))
+
+def analyze_frame(frame, user_id=None):
+    """Analyze a decoded BGR frame and return engagement metrics"""
+    key = None if user_id in (None, 'unknown') else user_id
+    return engagement_response(engine.analyze(frame=frame, key=key))
+
+def engagement_response(result):
+    """Response body for the first face of an engine FrameResult"""
     # Default response when no faces detected
-    if len(faces) == 0:
+    if not result.faces:
         return {
             "attentive": False,
             "emotion": "unknown",
@@ -238,71 +290,92 @@ def analyze_image(image_data):
             "emotions_data": {emotion: 0.0 for emotion in TARGET_EMOTIONS}
         }
     
-    # Process detected face
-    for (x, y, w, h) in faces:
-        roi = gray[y:y + h, x:x + w]
-        eyes = eye_cascade.detectMultiScale(roi)
-        
-        # Analyze emotion
-        roi_resized = cv2.resize(roi, (48, 48))
-        roi_resized = roi_resized.astype("float") / 255.0
-        roi_resized = img_to_array(roi_resized)
-        roi_resized = np.expand_dims(roi_resized, axis=0)
-        preds = emotion_classifier.predict(roi_resized)[0]
-        # Map probabilities to 4 target emotions
-        mapped_probs = {e: 0.0 for e in TARGET_EMOTIONS}
-        for i, prob in enumerate(preds):
-            mapped_emotion = EMOTION_MAP[EMOTIONS[i]]
-            mapped_probs[mapped_emotion] += prob
-        dominant_emotion = max(mapped_probs, key=mapped_probs.get)
-        is_attentive = len(eyes) >= 1
-        
-        # Calculate engagement score based on attention and mapped emotion
-        # Higher score for attentive and positive emotions like happy or neutral
-        base_score = 0.5 if is_attentive else 0.2
-        emotion_multiplier = {
-            "focused": 1.5,
-            "confused": 1.1,
-            "bored": 0.8,
-            "frustrated": 0.6
-        }
-        engagement_score = min(1.0, base_score * emotion_multiplier.get(dominant_emotion, 1.0))
-        
-        # Return data for the first face detected
-        return {
-            "attentive": is_attentive,
-            "emotion": dominant_emotion,
-            "engagement_score": float(engagement_score),
-            "emotions_data": {emotion: float(mapped_probs[emotion]) for emotion in TARGET_EMOTIONS}
-        }
+    # Return data for the first face detected
+    face = result.faces[0]
+    return {
+        "attentive": bool(face.attentive),
+        "emotion": face.target_emotion,
+        "engagement_score": float(face.engagement_score),
+        "emotions_data": {emotion: float(face.target_probabilities[emotion]) for emotion in TARGET_EMOTIONS}
+    }
+
+def analyze_and_log(image_data, user_id):
+    """Analyze one image (data-URL string or raw encoded bytes) and store the result in the video log"""
+    with metrics.span("request"):
+        result = analyze_image(image_data, user_id)
+    
+    # Append the result to the video engagement log
+    video_data = {
+        'userId': user_id,
+        'attentive': result['attentive'],
+        'emotion': result['emotion'],
+        'engagement_score': result['engagement_score'],
+        'emotions_data': result['emotions_data']
+    }
+    
+    with metrics.span("log_write"):
+        write_to_json_file('video', video_data)
+    return result
+
+def read_engagement_request():
+    """Return (image, user_id) from a JSON, raw image/* or multipart request.
+
+    JSON bodies carry a base64 data URL in ``image``. Raw bodies are the
+    encoded image itself with ``userId`` in the query string, and multipart
+    forms carry an ``image`` file part plus an optional ``userId`` field.
+    """
+    if request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream':
+        image = request.get_data(cache=False)
+        return (image or None), request.args.get('userId', 'unknown')
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('image')
+        image = upload.read() if upload else None
+        return (image or None), request.form.get('userId', request.args.get('userId', 'unknown'))
+    payload = request.get_json(silent=True)
+    if not payload or 'image' not in payload:
+        return None, None
+    return payload['image'], payload.get('userId', 'unknown')
 
 @app.route('/api/analyze-engagement', methods=['POST'])
 def analyze_engagement():
-    if not request.json or 'image' not in request.json:
+    image_data, user_id = read_engagement_request()
+    if image_data is None:
         return jsonify({'error': 'No image provided'}), 400
     
     try:
-        image_data = request.json['image']
-        user_id = request.json.get('userId', 'unknown')
-        
-        result = analyze_image(image_data)
-        
-        # Store the result in the video.json file
-        video_data = {
-            'userId': user_id,
-            'attentive': result['attentive'],
-            'emotion': result['emotion'],
-            'engagement_score': result['engagement_score'],
-            'emotions_data': result['emotions_data']
-        }
-        
-        # Write to JSON file
-        write_to_json_file('video', video_data)
+        result = analyze_and_log(image_data, user_id)
         
+        requests_total.inc()
         return jsonify(result)
     except Exception as e:
         print(f"Error in analyze_engagement: {str(e)}")
+        errors_total.inc()
         return jsonify({'error': str(e)}), 500
 
+def service_stats():
+    stats = inference_batcher.stats()
+    stats['face_search'] = engine.stage('detect').search_cache.stats()
+    return stats
+
+@app.route('/api/inference-stats', methods=['GET'])
+def inference_stats():
+    return jsonify(service_stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+# Opt-in sampling profiler: POST start, then POST stop to get collapsed stacks
+@app.route('/debug/profile/<action>', methods=['POST'])
+def profile(action):
+    if not PROFILER_ENABLED:
+        return jsonify({'error': 'Profiler disabled; set ENABLE_PROFILER=1'}), 404
+    if action == 'start':
+        profiler.start()
+        return jsonify({'status': 'running'})
+    if action == 'stop':
+        return Response(profiler.stop(), mimetype='text/plain')
+    return jsonify({'error': f'Unknown action: {action}'}), 400
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=True, port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,442 @@
+"""Asyncio (ASGI) serving mode for the engagement API.
+
+Serves the same /api/analyze-engagement contract as api.py, but analysis runs
+in a bounded thread pool off the event loop, every request has a deadline,
+requests beyond the in-flight limit get 503, and shutdown drains in-flight
+work before the process exits.
+
+Besides JSON with a base64 data URL, /api/analyze-engagement accepts the raw
+encoded image (``Content-Type: image/jpeg``, ``userId`` in the query string)
+or a multipart form with an ``image`` file part. /ws/analyze-engagement keeps
+one WebSocket per client: it sends frames as binary messages (or JSON text
+with ``image``/``userId``) and receives one JSON result per analyzed frame.
+Frames that arrive while the previous one is still being analyzed replace the
+pending frame instead of queueing behind it.
+
+Run with:  uvicorn api_async:app --port 5000
+"""
+import asyncio
+import contextlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import api
+from api import analyze_and_log, close_engagement_logs
+from utils.metrics import metrics
+
+# Tune with these env vars
+ASYNC_WORKERS = int(os.environ.get('ASYNC_WORKERS', os.cpu_count() or 4))
+ASYNC_MAX_IN_FLIGHT = int(os.environ.get('ASYNC_MAX_IN_FLIGHT', 64))
+ASYNC_REQUEST_TIMEOUT = float(os.environ.get('ASYNC_REQUEST_TIMEOUT_S', 5.0))
+ASYNC_SHUTDOWN_GRACE = float(os.environ.get('ASYNC_SHUTDOWN_GRACE_S', 30.0))
+ASYNC_MAX_BODY_BYTES = int(os.environ.get('ASYNC_MAX_BODY_BYTES', 10 * 1024 * 1024))
+# How long a stream waits before retrying when every executor slot is busy
+STREAM_RETRY_SECONDS = 0.01
+
+ANALYZE_PATH = '/api/analyze-engagement'
+STREAM_PATH = '/ws/analyze-engagement'
+
+frames_received_total = metrics.counter(
+    "engagement_stream_frames_total", {"outcome": "received"}, help_text="WebSocket frames by outcome"
+)
+frames_dropped_total = metrics.counter(
+    "engagement_stream_frames_total", {"outcome": "dropped"}, help_text="WebSocket frames by outcome"
+)
+frames_analyzed_total = metrics.counter(
+    "engagement_stream_frames_total", {"outcome": "analyzed"}, help_text="WebSocket frames by outcome"
+)
+shutdown_abandoned_total = metrics.counter(
+    "engagement_shutdown_abandoned_total", help_text="Requests still running when the shutdown grace period expired"
+)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def parse_multipart(body, content_type):
+    """Split a multipart/form-data body into {field name: memoryview of the part}"""
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not match:
+        return {}
+    delimiter = b'--' + match.group(1).encode('latin-1')
+    view = memoryview(body)
+    fields = {}
+    pos = body.find(delimiter)
+    while pos != -1:
+        start = pos + len(delimiter)
+        if body[start:start + 2] == b'--':
+            break
+        headers_end = body.find(b'\r\n\r\n', start)
+        if headers_end == -1:
+            break
+        end = body.find(b'\r\n' + delimiter, headers_end + 4)
+        if end == -1:
+            break
+        name = re.search(rb'name="([^"]*)"', body[start:headers_end])
+        if name:
+            fields[name.group(1).decode('latin-1')] = view[headers_end + 4:end]
+        pos = end + 2
+    return fields
+
+
+def parse_engagement_request(headers, query, body):
+    """Return (image, user_id) from a JSON, raw image/* or multipart request body.
+
+    Raw and multipart images are returned as views into ``body`` so they are
+    decoded without an intermediate copy; ``image`` is None when missing.
+    """
+    content_type = headers.get(b'content-type', b'').decode('latin-1')
+    mimetype = content_type.split(';')[0].strip().lower()
+    user_id = query.get('userId', ['unknown'])[0]
+
+    if mimetype.startswith('image/') or mimetype == 'application/octet-stream':
+        return (memoryview(body) if body else None), user_id
+    if mimetype == 'multipart/form-data':
+        fields = parse_multipart(body, content_type)
+        image = fields.get('image')
+        if 'userId' in fields:
+            user_id = bytes(fields['userId']).decode('utf-8', 'replace')
+        return (image if image is not None and len(image) else None), user_id
+
+    try:
+        payload = json.loads(body) if body else None
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict) or 'image' not in payload:
+        return None, None
+    return payload['image'], payload.get('userId', 'unknown')
+
+
+class StreamSession:
+    """Per-connection state of a WebSocket stream: the newest unanalyzed frame and counters"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.pending = None
+        self.seq = 0
+        self.received = 0
+        self.analyzed = 0
+        self.dropped = 0
+        self.closed = False
+        self.ready = asyncio.Event()
+
+    def offer(self, image):
+        """Make ``image`` the next frame to analyze, dropping any frame still waiting"""
+        self.seq += 1
+        self.received += 1
+        frames_received_total.inc()
+        if self.pending is not None:
+            self.dropped += 1
+            frames_dropped_total.inc()
+        self.pending = (self.seq, image)
+        self.ready.set()
+
+    def take(self):
+        item, self.pending = self.pending, None
+        self.ready.clear()
+        return item
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+
+class AsyncEngagementServer:
+    """ASGI application wrapping api.analyze_image.
+
+    ``max_in_flight`` counts requests both queued for and running in the
+    executor, so it also bounds the executor's backlog. Work that is still
+    queued when its deadline passes is skipped rather than run for nobody.
+    """
+
+    def __init__(self, workers=ASYNC_WORKERS, max_in_flight=ASYNC_MAX_IN_FLIGHT,
+                 request_timeout=ASYNC_REQUEST_TIMEOUT, shutdown_grace=ASYNC_SHUTDOWN_GRACE):
+        self.workers = max(1, int(workers))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.request_timeout = request_timeout
+        self.shutdown_grace = shutdown_grace
+
+        self.executor = None
+        self.in_flight = 0
+        self.draining = False
+        self._idle = None
+
+        self.rejected_total = metrics.counter(
+            "engagement_async_rejected_total", {"reason": "saturated"}, help_text="Requests refused with 503"
+        )
+        self.draining_rejected_total = metrics.counter(
+            "engagement_async_rejected_total", {"reason": "draining"}, help_text="Requests refused with 503"
+        )
+        self.timeouts_total = metrics.counter(
+            "engagement_async_timeouts_total", help_text="Requests that missed their deadline"
+        )
+        metrics.gauge("engagement_async_in_flight", fn=lambda: self.in_flight,
+                      help_text="Requests queued for or running in the executor")
+        self.streams = 0
+        metrics.gauge("engagement_stream_connections", fn=lambda: self.streams,
+                      help_text="Open WebSocket streams")
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        elif scope['type'] == 'websocket':
+            await self._websocket(scope, receive, send)
+
+    def start(self):
+        # Each executor thread loads its own cascades up front
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="analyze", initializer=api.engine.prepare_thread
+        )
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.draining = False
+
+    async def drain(self):
+        """Refuse new work, wait for in-flight requests, then release the executor"""
+        self.draining = True
+        expired = False
+        if self._idle is not None:
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.shutdown_grace)
+            except asyncio.TimeoutError:
+                expired = True
+                shutdown_abandoned_total.inc(self.in_flight)
+        if self.executor is not None:
+            if expired:
+                # Stuck threads cannot be interrupted; do not block the loop waiting for them
+                self.executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                self.executor.shutdown(wait=True)
+            self.executor = None
+        close_engagement_logs()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.drain()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        method, path = scope['method'], scope['path']
+        if path == ANALYZE_PATH and method == 'POST':
+            status, body = await self._analyze_engagement(scope, receive)
+            await self._send_json(send, status, body)
+        elif path == '/api/inference-stats' and method == 'GET':
+            await self._send_json(send, 200, api.service_stats())
+        elif path == '/metrics' and method == 'GET':
+            await self._send(send, 200, metrics.render_prometheus().encode(), b'text/plain; version=0.0.4')
+        elif method == 'OPTIONS':
+            await self._send(send, 204, b'', b'text/plain')
+        else:
+            await self._send_json(send, 404, {'error': 'Not found'})
+
+    def _admit(self):
+        """Reserve an executor slot; returns an error message when refusing"""
+        if self.executor is None:
+            # Served without lifespan support
+            self.start()
+        if self.draining:
+            return 'Server is shutting down'
+        if self.in_flight >= self.max_in_flight:
+            return 'Server is busy, retry later'
+        self.in_flight += 1
+        self._idle.clear()
+        return None
+
+    async def _analyze_engagement(self, scope, receive):
+        refusal = self._admit()
+        if refusal is not None:
+            (self.draining_rejected_total if self.draining else self.rejected_total).inc()
+            return 503, {'error': refusal}
+
+        try:
+            raw = await self._read_body(receive)
+            if raw is None:
+                return 413, {'error': 'Request body too large'}
+            image, user_id = parse_engagement_request(
+                dict(scope.get('headers', [])), parse_qs(scope.get('query_string', b'').decode('latin-1')), raw
+            )
+            if image is None:
+                return 400, {'error': 'No image provided'}
+
+            try:
+                result = await self._run_analysis(image, user_id)
+            except DeadlineExceeded:
+                return 504, {'error': 'Analysis deadline exceeded'}
+
+            api.requests_total.inc()
+            return 200, result
+        except Exception as e:
+            print(f"Error in analyze_engagement: {str(e)}")
+            api.errors_total.inc()
+            return 500, {'error': str(e)}
+        finally:
+            self._release()
+
+    async def _run_analysis(self, image, user_id):
+        """Analyze in the executor under the request deadline; caller holds a slot"""
+        deadline = time.monotonic() + self.request_timeout
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, self._analyze_and_log, image, user_id, deadline
+        )
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(0.0, deadline - time.monotonic()))
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            self.timeouts_total.inc()
+            if not future.done():
+                # The worker thread cannot be interrupted; keep counting it as
+                # in flight until it finishes so the limit stays honest
+                self.in_flight += 1
+                future.add_done_callback(self._release_abandoned)
+            raise DeadlineExceeded()
+        except asyncio.CancelledError:
+            # The stream closed mid-analysis; the thread still holds its slot until done
+            if not future.done():
+                self.in_flight += 1
+                future.add_done_callback(self._release_abandoned)
+            raise
+
+    async def _websocket(self, scope, receive, send):
+        message = await receive()
+        if message['type'] != 'websocket.connect':
+            return
+        if scope['path'] != STREAM_PATH:
+            await send({'type': 'websocket.close', 'code': 1008})
+            return
+        if self.draining:
+            await send({'type': 'websocket.close', 'code': 1013})
+            return
+        await send({'type': 'websocket.accept'})
+
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        session = StreamSession(query.get('userId', ['unknown'])[0])
+        self.streams += 1
+        results = asyncio.ensure_future(self._stream_results(session, send))
+        try:
+            while not results.done():
+                message = await receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                if message.get('bytes'):
+                    session.offer(message['bytes'])
+                elif message.get('text'):
+                    try:
+                        payload = json.loads(message['text'])
+                    except ValueError:
+                        continue
+                    if isinstance(payload, dict):
+                        session.user_id = payload.get('userId', session.user_id)
+                        if payload.get('image'):
+                            session.offer(payload['image'])
+        finally:
+            session.close()
+            self.streams -= 1
+            # An analysis already running finishes on its thread, but nothing more is sent
+            results.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await results
+
+    async def _stream_results(self, session, send):
+        """Analyze the newest pending frame of ``session`` whenever a slot is free"""
+        while True:
+            await session.ready.wait()
+            if session.closed:
+                return
+            if self.draining:
+                await send({'type': 'websocket.close', 'code': 1001})
+                return
+            if self._admit() is not None:
+                # Saturated: newer frames keep replacing the pending one meanwhile
+                await asyncio.sleep(STREAM_RETRY_SECONDS)
+                continue
+
+            seq, image = session.take()
+            try:
+                reply = {'seq': seq}
+                reply.update(await self._run_analysis(image, session.user_id))
+                session.analyzed += 1
+                frames_analyzed_total.inc()
+            except DeadlineExceeded:
+                reply = {'seq': seq, 'error': 'Analysis deadline exceeded'}
+            except Exception as e:
+                api.errors_total.inc()
+                reply = {'seq': seq, 'error': str(e)}
+            finally:
+                self._release()
+
+            if session.closed:
+                return
+            reply['dropped'] = session.dropped
+            await send({'type': 'websocket.send', 'text': json.dumps(reply)})
+
+    def _release(self):
+        self.in_flight -= 1
+        if self.in_flight == 0 and self._idle is not None:
+            self._idle.set()
+
+    def _release_abandoned(self, future):
+        if not future.cancelled():
+            future.exception()
+        self._release()
+
+    @staticmethod
+    def _analyze_and_log(image_data, user_id, deadline):
+        """Runs on an executor thread; skips work whose deadline passed while queued"""
+        if time.monotonic() >= deadline:
+            raise DeadlineExceeded()
+        return analyze_and_log(image_data, user_id)
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > ASYNC_MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    async def _send_json(self, send, status, body):
+        await self._send(send, status, json.dumps(body).encode(), b'application/json')
+
+    @staticmethod
+    async def _send(send, status, body, content_type):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', content_type),
+                (b'content-length', str(len(body)).encode()),
+                (b'access-control-allow-origin', b'*'),
+                (b'access-control-allow-headers', b'*'),
+                (b'access-control-allow-methods', b'GET, POST, OPTIONS')
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+app = AsyncEngagementServer()
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='127.0.0.1', port=int(os.environ.get('PORT', 5000)),
+                timeout_graceful_shutdown=int(ASYNC_SHUTDOWN_GRACE))
@@ -0,0 +1,140 @@
+"""
+Face detection resolution sweep
+
+Runs utils.face_detection.FaceDetector at several detection widths over the
+synthetic benchmark videos and reports recall, precision and milliseconds per
+frame at each width, so DETECTION_WIDTH can be chosen from measurements.
+
+    python benchmarks/detection_sweep.py
+    python benchmarks/detection_sweep.py --widths 320 480 640 0 --scale-factor 1.3
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+CACHE_DIR = os.path.join(BENCH_DIR, '.cache')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+from synthetic import RESOLUTIONS, generate_video, face_boxes
+from utils.face_detection import FaceDetector
+from utils.face_tracker import box_iou
+
+FACE_CASCADE = os.path.join(ROOT, 'haarcascades', 'haarcascade_frontalface_default.xml')
+
+
+def match_detections(truth, detections, iou_threshold):
+    """Greedy one-to-one matching; returns the number of true positives"""
+    pairs = sorted(
+        ((box_iou(t, d), ti, di) for ti, t in enumerate(truth) for di, d in enumerate(detections)),
+        reverse=True
+    )
+    used_truth, used_det = set(), set()
+    for iou, ti, di in pairs:
+        if iou < iou_threshold:
+            break
+        if ti in used_truth or di in used_det:
+            continue
+        used_truth.add(ti)
+        used_det.add(di)
+    return len(used_truth)
+
+
+def sweep_video(frames, truth, detector, iou_threshold):
+    true_positives = n_truth = n_detected = 0
+    elapsed = 0.0
+    for frame_truth, gray in zip(truth, frames):
+        started = time.perf_counter()
+        faces = detector.detect(gray)
+        elapsed += time.perf_counter() - started
+        detections = [tuple(int(v) for v in box) for box in faces]
+        true_positives += match_detections(frame_truth, detections, iou_threshold)
+        n_truth += len(frame_truth)
+        n_detected += len(detections)
+    return {
+        "recall": true_positives / n_truth if n_truth else 0.0,
+        "precision": true_positives / n_detected if n_detected else 1.0,
+        "ms_per_frame": elapsed * 1000.0 / max(1, len(frames))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resolutions', nargs='+', default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument('--faces', nargs='+', type=int, default=[1, 5, 20])
+    parser.add_argument('--frames', type=int, default=60, help="Frames per synthetic video")
+    parser.add_argument('--widths', nargs='+', type=int, default=[320, 400, 480, 640, 960, 0],
+                        help="Detection widths to try; 0 means native resolution")
+    parser.add_argument('--scale-factor', type=float, default=1.1)
+    parser.add_argument('--min-neighbors', type=int, default=5)
+    parser.add_argument('--min-size', type=int, default=20)
+    parser.add_argument('--iou', type=float, default=0.3, help="IoU needed to count a detection as a hit")
+    parser.add_argument('--output', default=None, help="Results JSON (default: results/detection_sweep_<timestamp>.json)")
+    args = parser.parse_args()
+
+    cascade = cv2.CascadeClassifier(FACE_CASCADE)
+    results = {"created": datetime.datetime.now().isoformat(), "config": vars(args), "videos": {}}
+    totals = {width: {"recall": [], "ms_per_frame": []} for width in args.widths}
+
+    for resolution in args.resolutions:
+        width, height = RESOLUTIONS[resolution]
+        for n_faces in args.faces:
+            video = generate_video(
+                os.path.join(CACHE_DIR, f"synthetic_{resolution}_{n_faces}faces_{args.frames}f.avi"),
+                width, height, n_faces, n_frames=args.frames, seed=n_faces
+            )
+            cap = cv2.VideoCapture(video)
+            frames = []
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+            cap.release()
+            truth = [face_boxes(width, height, n_faces, t, seed=n_faces) for t in range(len(frames))]
+
+            name = f"{resolution}/{n_faces}faces"
+            results["videos"][name] = {}
+            print(name)
+            for detection_width in args.widths:
+                detector = FaceDetector(
+                    cascade, detection_width=detection_width, scale_factor=args.scale_factor,
+                    min_neighbors=args.min_neighbors, min_size=args.min_size
+                )
+                result = sweep_video(frames, truth, detector, args.iou)
+                results["videos"][name][str(detection_width)] = result
+                totals[detection_width]["recall"].append(result["recall"])
+                totals[detection_width]["ms_per_frame"].append(result["ms_per_frame"])
+                label = detection_width or "native"
+                print(f"    width {label:>6}: recall {result['recall']:.3f}  precision {result['precision']:.3f}  "
+                      f"{result['ms_per_frame']:8.2f} ms/frame")
+
+    print("\nMean over all videos")
+    summary = {}
+    for detection_width, values in totals.items():
+        summary[str(detection_width)] = {k: float(np.mean(v)) for k, v in values.items()}
+        label = detection_width or "native"
+        print(f"    width {label:>6}: recall {summary[str(detection_width)]['recall']:.3f}  "
+              f"{summary[str(detection_width)]['ms_per_frame']:8.2f} ms/frame")
+    results["summary"] = summary
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(
+        RESULTS_DIR, "detection_sweep_" + datetime.datetime.now().strftime("%Y%m%dT%H%M%S") + ".json"
+    )
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
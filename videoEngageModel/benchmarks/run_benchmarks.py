@@ -0,0 +1,321 @@
+"""
+Per-stage benchmark suite for EmotionDetector, api.analyze_image and VideoProcessor
+
+Generates deterministic synthetic videos and a stand-in Keras model under
+benchmarks/.cache, measures frames per second and per-stage latency for each
+component, and writes the results as JSON to benchmarks/results.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --resolutions 720p --faces 1 20
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import base64
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+CACHE_DIR = os.path.join(BENCH_DIR, '.cache')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINE_PATH = os.path.join(RESULTS_DIR, 'baseline.json')
+
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+from synthetic import RESOLUTIONS, generate_video
+from stand_in_model import build_stand_in_model
+
+
+class StageTimer:
+    """Collect wall-clock samples per named stage"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append(time.perf_counter() - started)
+
+    def record(self, timings, skip=()):
+        """Add samples from an engine FrameResult.timings dict"""
+        for name, seconds in timings.items():
+            if name not in skip:
+                self.samples[name].append(seconds)
+
+    def summary(self):
+        summary = {}
+        for name, samples in self.samples.items():
+            ms = np.array(samples) * 1000.0
+            summary[name] = {
+                "count": len(ms),
+                "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+                "total_ms": float(ms.sum())
+            }
+        return summary
+
+
+def read_frames(video_path, timer=None):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while True:
+        if timer is not None:
+            with timer.stage("decode"):
+                ret, frame = cap.read()
+        else:
+            ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def bench_emotion_detector(video_path, repeats):
+    from utils.emotion_detector import EmotionDetector
+    from utils.video_processor import VideoProcessor
+
+    detector = EmotionDetector()
+    processor = VideoProcessor()
+    timer = StageTimer()
+    frames = read_frames(video_path, timer)
+    detector.emotion_model  # load the model outside the timed loops
+    options = {"show_emotions": True, "show_confidence": True}
+
+    # Per-stage timings (grayscale, face_cascade, preprocess, predict, ...) as
+    # measured inside the shared analysis engine; "decode" here is video decoding
+    faces_seen = 0
+    for _ in range(repeats):
+        for frame in frames:
+            result = detector.engine.analyze(frame)
+            timer.record(result.timings, skip=("decode",))
+            faces_seen += len(result.faces)
+
+    # End to end through the public API, including drawing
+    started = time.perf_counter()
+    analyzed = 0
+    for _ in range(repeats):
+        for frame in frames:
+            with timer.stage("detect_emotions"):
+                emotions = detector.detect_emotions(frame)
+            with timer.stage("draw"):
+                processor.draw_emotions(frame, emotions, options)
+            analyzed += 1
+    elapsed = time.perf_counter() - started
+
+    return {
+        "fps": analyzed / elapsed if elapsed else 0.0,
+        "faces_per_frame": faces_seen / max(1, len(frames) * repeats),
+        "stages": timer.summary()
+    }
+
+
+def prepare_api_workspace(model_path):
+    """api.py loads models/ and haarcascades/ relative to the working directory"""
+    workspace = os.path.join(CACHE_DIR, 'api_workspace')
+    os.makedirs(os.path.join(workspace, 'models'), exist_ok=True)
+    target = os.path.join(workspace, 'models', 'model_num.hdf5')
+    if not os.path.exists(target):
+        shutil.copyfile(model_path, target)
+    cascades = os.path.join(workspace, 'haarcascades')
+    if not os.path.exists(cascades):
+        shutil.copytree(os.path.join(ROOT, 'haarcascades'), cascades)
+    return workspace
+
+
+def bench_api(video_path, repeats, model_path):
+    workspace = prepare_api_workspace(model_path)
+    cwd = os.getcwd()
+    os.chdir(workspace)
+    try:
+        sys.path.insert(0, ROOT)
+        import api
+    finally:
+        os.chdir(cwd)
+
+    frames = read_frames(video_path)
+    payloads = []
+    for frame in frames:
+        ok, encoded = cv2.imencode('.jpg', frame)
+        payloads.append("data:image/jpeg;base64," + base64.b64encode(encoded.tobytes()).decode())
+
+    timer = StageTimer()
+    faces_seen = 0
+    for _ in range(repeats):
+        for payload in payloads:
+            # analyze_image's engine keeps only the first face
+            result = api.engine.analyze(encoded=payload)
+            timer.record(result.timings)
+            faces_seen += len(result.faces)
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for payload in payloads:
+            with timer.stage("analyze_image"):
+                api.analyze_image(payload)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "fps": len(payloads) * repeats / elapsed if elapsed else 0.0,
+        "faces_per_frame": faces_seen / max(1, len(payloads) * repeats),
+        "stages": timer.summary()
+    }
+
+
+def bench_video_processor(video_path, repeats):
+    from utils.video_processor import VideoProcessor
+
+    processor = VideoProcessor()
+    cascade = cv2.CascadeClassifier(os.path.join(ROOT, 'haarcascades', 'haarcascade_frontalface_default.xml'))
+    frames = read_frames(video_path)
+    labels = ['Angry', 'Disgust', 'Fear', 'Happy', 'Neutral', 'Sad', 'Surprise']
+
+    # Fixed, model-free detections so only rendering is measured
+    detections = []
+    for i, frame in enumerate(frames):
+        faces = cascade.detectMultiScale(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), 1.3, 5)
+        detections.append([
+            {"bbox": tuple(int(v) for v in box), "dominant_emotion": labels[(i + j) % 7],
+             "confidence": ((i * 7 + j) % 100) / 100.0}
+            for j, box in enumerate(faces)
+        ])
+
+    timer = StageTimer()
+    options = {"show_emotions": True, "show_confidence": True}
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for frame, emotions in zip(frames, detections):
+            with timer.stage("draw"):
+                out = processor.draw_emotions(frame, emotions, options)
+            with timer.stage("overlay"):
+                processor.add_overlay_info(out, f"Faces: {len(emotions)}\nBenchmark", in_place=True)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "fps": len(frames) * repeats / elapsed if elapsed else 0.0,
+        "faces_per_frame": sum(len(d) for d in detections) / max(1, len(frames)),
+        "stages": timer.summary()
+    }
+
+
+def environment():
+    env = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__
+    }
+    try:
+        import tensorflow as tf
+        env["tensorflow"] = tf.__version__
+    except ImportError:
+        env["tensorflow"] = None
+    return env
+
+
+def compare_to_baseline(results, baseline):
+    print(f"\nComparison with baseline from {baseline.get('created', '?')}")
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        change = (current["fps"] / previous["fps"] - 1) * 100 if previous["fps"] else 0.0
+        print(f"{name}: {previous['fps']:.1f} -> {current['fps']:.1f} fps ({change:+.1f}%)")
+        for stage, stats in current["stages"].items():
+            before = previous["stages"].get(stage)
+            if before is None or not before["mean_ms"]:
+                continue
+            delta = (stats["mean_ms"] / before["mean_ms"] - 1) * 100
+            print(f"    {stage:<16}{before['mean_ms']:>9.3f} -> {stats['mean_ms']:>9.3f} ms ({delta:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resolutions', nargs='+', default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument('--faces', nargs='+', type=int, default=[1, 5, 20])
+    parser.add_argument('--frames', type=int, default=60, help="Frames per synthetic video")
+    parser.add_argument('--repeats', type=int, default=1, help="Passes over each video")
+    parser.add_argument('--components', nargs='+', default=['emotion_detector', 'api', 'video_processor'],
+                        choices=['emotion_detector', 'api', 'video_processor'])
+    parser.add_argument('--output', default=None, help="Results JSON (default: results/<timestamp>.json)")
+    parser.add_argument('--baseline', default=None, help="Baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Also write results/baseline.json")
+    args = parser.parse_args()
+
+    # Cascade and model paths in the app are relative to the project root
+    os.chdir(ROOT)
+
+    model_path = None
+    if {'emotion_detector', 'api'} & set(args.components):
+        model_path = build_stand_in_model(os.path.join(CACHE_DIR, 'stand_in_model.h5'))
+        from utils.model_registry import model_registry
+        model_registry.register('video_emotion', model_path)
+
+    results = {
+        "created": datetime.datetime.now().isoformat(),
+        "environment": environment(),
+        "config": vars(args),
+        "scenarios": {}
+    }
+
+    for resolution in args.resolutions:
+        width, height = RESOLUTIONS[resolution]
+        for n_faces in args.faces:
+            video = generate_video(
+                os.path.join(CACHE_DIR, f"synthetic_{resolution}_{n_faces}faces_{args.frames}f.avi"),
+                width, height, n_faces, n_frames=args.frames, seed=n_faces
+            )
+            for component in args.components:
+                name = f"{component}/{resolution}/{n_faces}faces"
+                try:
+                    if component == 'emotion_detector':
+                        result = bench_emotion_detector(video, args.repeats)
+                    elif component == 'api':
+                        result = bench_api(video, args.repeats, model_path)
+                    else:
+                        result = bench_video_processor(video, args.repeats)
+                except ImportError as e:
+                    print(f"{name}: skipped ({e})")
+                    continue
+                results["scenarios"][name] = result
+                print(f"{name}: {result['fps']:.1f} fps, {result['faces_per_frame']:.1f} faces/frame")
+                for stage, stats in result["stages"].items():
+                    print(f"    {stage:<16}{stats['mean_ms']:>9.3f} ms mean  {stats['p95_ms']:>9.3f} ms p95")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.datetime.now().strftime("%Y%m%dT%H%M%S") + ".json"
+    )
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {BASELINE_PATH}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare_to_baseline(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Stand-in Keras emotion model with the real 48x48x1 -> 7 signature"""
+import os
+
+
+def build_stand_in_model(path, seed=0):
+    """Build and save a randomly initialised CNN comparable in cost to the real model.
+
+    Predictions are meaningless, but the input/output shapes, layer types and
+    parameter count are close enough to measure preprocessing and inference.
+    The weights are seeded, so every run benchmarks the same model. ``path``
+    should end in ``.h5``: Keras 3 (TensorFlow 2.16+) only saves to ``.h5``
+    or ``.keras``, and ``.h5`` also loads on older Keras.
+    """
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    import tensorflow as tf
+    from tensorflow.keras import layers, models
+
+    tf.random.set_seed(seed)
+    model = models.Sequential([
+        layers.Input(shape=(48, 48, 1)),
+        layers.Conv2D(32, 3, padding='same', activation='relu'),
+        layers.Conv2D(32, 3, padding='same', activation='relu'),
+        layers.MaxPooling2D(),
+        layers.Conv2D(64, 3, padding='same', activation='relu'),
+        layers.Conv2D(64, 3, padding='same', activation='relu'),
+        layers.MaxPooling2D(),
+        layers.Conv2D(128, 3, padding='same', activation='relu'),
+        layers.MaxPooling2D(),
+        layers.Flatten(),
+        layers.Dense(128, activation='relu'),
+        layers.Dropout(0.5),
+        layers.Dense(7, activation='softmax')
+    ])
+    model.save(path)
+    return path
@@ -0,0 +1,105 @@
+"""Deterministic synthetic test videos with rendered face-like patches"""
+import os
+
+import cv2
+import numpy as np
+
+# (width, height) presets used by the benchmark runner
+RESOLUTIONS = {
+    "360p": (640, 360),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080)
+}
+
+
+def render_face(size, expression=0.0):
+    """Render a frontal cartoon face as a BGR patch of ``size`` x ``size``.
+
+    Shading follows the light/dark layout the Haar frontal-face cascade keys
+    on (dark brows and eyes, bright cheeks and nose bridge, dark mouth).
+    ``expression`` in [-1, 1] bends the mouth so emotion ROIs vary.
+    """
+    patch = np.full((size, size, 3), 40, dtype=np.uint8)
+    c = size // 2
+    s = size / 100.0
+
+    def pt(x, y):
+        return int(round(c + x * s)), int(round(c + y * s))
+
+    def ax(a, b):
+        return max(1, int(round(a * s))), max(1, int(round(b * s)))
+
+    cv2.ellipse(patch, pt(0, 2), ax(38, 48), 0, 0, 360, (150, 170, 200), -1)
+    for side in (-1, 1):
+        cv2.ellipse(patch, pt(side * 16, -18), ax(11, 3), 0, 0, 360, (45, 45, 60), -1)
+        cv2.ellipse(patch, pt(side * 16, -6), ax(9, 5), 0, 0, 360, (235, 235, 235), -1)
+        cv2.circle(patch, pt(side * 16, -6), max(1, int(round(4 * s))), (30, 30, 30), -1)
+        cv2.ellipse(patch, pt(side * 20, 14), ax(9, 7), 0, 0, 360, (170, 185, 220), -1)
+    cv2.ellipse(patch, pt(0, 8), ax(5, 11), 0, 0, 360, (175, 195, 225), -1)
+    cv2.ellipse(patch, pt(0, 18), ax(6, 3), 0, 0, 360, (110, 120, 150), -1)
+
+    # Mouth: smile for expression > 0, frown for < 0
+    mouth_h = max(1, int(round(abs(expression) * 8 * s))) + 1
+    start, end = (0, 180) if expression >= 0 else (180, 360)
+    cv2.ellipse(patch, pt(0, 30), (int(16 * s), mouth_h), 0, start, end, (40, 40, 110), max(1, int(3 * s)))
+    return cv2.GaussianBlur(patch, (3, 3), 0)
+
+
+def face_layout(width, height, n_faces, seed):
+    """Place ``n_faces`` on a jittered grid; returns [(x, y, size, phase), ...]"""
+    rng = np.random.default_rng(seed)
+    cols = int(np.ceil(np.sqrt(n_faces * width / height)))
+    rows = int(np.ceil(n_faces / cols))
+    cell_w, cell_h = width // cols, height // rows
+    size = int(min(cell_w, cell_h) * 0.6)
+    faces = []
+    for i in range(n_faces):
+        r, col = divmod(i, cols)
+        x = col * cell_w + (cell_w - size) // 2 + int(rng.integers(-cell_w // 10, cell_w // 10 + 1))
+        y = r * cell_h + (cell_h - size) // 2 + int(rng.integers(-cell_h // 10, cell_h // 10 + 1))
+        faces.append((x, y, size, float(rng.uniform(0, 2 * np.pi))))
+    return faces
+
+
+def face_positions(faces, width, height, t, fps=30):
+    """Top-left corner and expression of every face at frame ``t``; [(x0, y0, size, expression), ...]"""
+    positions = []
+    for x, y, size, phase in faces:
+        expression = round(np.sin(phase + t / fps), 1)
+        dx = int(round(4 * np.sin(phase + t / 20.0)))
+        dy = int(round(3 * np.cos(phase + t / 25.0)))
+        x0 = min(max(x + dx, 0), width - size)
+        y0 = min(max(y + dy, 0), height - size)
+        positions.append((x0, y0, size, expression))
+    return positions
+
+
+def face_boxes(width, height, n_faces, t, fps=30, seed=0):
+    """Ground-truth (x, y, w, h) face patches at frame ``t`` of a ``generate_video`` video"""
+    faces = face_layout(width, height, n_faces, seed)
+    return [(x0, y0, size, size) for x0, y0, size, _ in face_positions(faces, width, height, t, fps)]
+
+
+def generate_video(path, width, height, n_faces, n_frames=150, fps=30, seed=0):
+    """Write a deterministic MJPG video of drifting faces over a textured background"""
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(60, 120, (height, width, 3), dtype=np.uint8), (31, 31), 0)
+    faces = face_layout(width, height, n_faces, seed)
+    sprites = {}
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    frame = np.empty_like(background)
+    for t in range(n_frames):
+        np.copyto(frame, background)
+        for x0, y0, size, expression in face_positions(faces, width, height, t, fps):
+            key = (size, expression)
+            if key not in sprites:
+                sprites[key] = render_face(size, expression)
+            frame[y0:y0 + size, x0:x0 + size] = sprites[key]
+        writer.write(frame)
+    writer.release()
+    return path
@@ -0,0 +1,298 @@
+"""
+Batch Analysis - Headless Emotion Analysis of Recorded Videos
+
+Analyzes files, directories or glob patterns of videos across a pool of worker
+processes, each holding one warm model, largest files first. Writes one
+per-frame results file per video plus a line per video to summaries.jsonl,
+and records finished videos in a manifest so an interrupted run resumes where
+it stopped.
+
+    python scripts/batch_analyze.py recordings/*.mp4 --output data/batch
+    python scripts/batch_analyze.py recordings/ --workers 8 --format parquet
+    python scripts/batch_analyze.py recordings/ --output data/batch --no-resume
+
+Per-frame files hold one row per face: timestamp, person_id, bbox, dominant
+emotion, confidence, one prob_<label> column per emotion and the sampling
+weight and reason. Parquet output needs pandas with pyarrow installed.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import time
+
+import cv2
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+from utils.emotion_store import EmotionStore
+from utils.frame_sampler import AdaptiveFrameSampler
+from utils.live_metrics import LiveEmotionMetrics
+from utils.video_pipeline import VideoPipeline, create_emotion_detector
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+MANIFEST_NAME = 'manifest.jsonl'
+SUMMARIES_NAME = 'summaries.jsonl'
+
+# The worker process's detector, created once by init_worker
+_detector = None
+_settings = None
+
+
+def expand_inputs(inputs):
+    """Files, directories (searched recursively) and glob patterns -> unique video paths"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, '**', '*'), recursive=True)
+        else:
+            matches = glob.glob(item, recursive=True) or [item]
+        for path in matches:
+            if os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS):
+                paths.append(os.path.abspath(path))
+    return sorted(set(paths))
+
+
+def video_id(path, stat):
+    """Stable output name for a video version: stem plus a short hash of path, size and mtime"""
+    digest = hashlib.sha256(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{digest}"
+
+
+def load_manifest(path):
+    """Latest manifest entry per video id"""
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash
+                continue
+            entries[entry['id']] = entry
+    return entries
+
+
+def append_jsonl(path, record):
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def init_worker(settings):
+    global _detector, _settings
+    _settings = settings
+    os.chdir(ROOT)
+    _detector = create_emotion_detector(backend=settings['backend'], detection_width=settings['detection_width'])
+    # Load the model now so the first video does not pay for it
+    if _detector.emotion_model is None:
+        print(f"Error: could not load the '{settings['backend']}' emotion model; videos will be marked failed")
+
+
+def frame_rows(store, video):
+    """Per-face rows for JSONL output"""
+    columns = store.columns(include_spilled=True)
+    labels = store.labels
+    for i in range(len(columns['timestamp'])):
+        x, y, w, h = (int(v) for v in columns['bbox'][i])
+        row = {
+            'video': video,
+            'timestamp': float(columns['timestamp'][i]),
+            'person_id': int(columns['person_id'][i]),
+            'bbox_x': x, 'bbox_y': y, 'bbox_w': w, 'bbox_h': h,
+            'dominant_emotion': labels[columns['label_code'][i]],
+            'confidence': float(columns['confidence'][i])
+        }
+        for label, prob in zip(labels, columns['probs'][i]):
+            row[f'prob_{label}'] = float(prob)
+        row['sample_weight'] = float(columns['sample_weight'][i])
+        row['sampling_reason'] = store.reasons[columns['reason_code'][i]]
+        yield row
+
+
+def write_frames(store, video, path, output_format):
+    """Write per-frame rows to ``path`` atomically"""
+    tmp_path = path + f".{os.getpid()}.tmp"
+    if output_format == 'parquet':
+        df = store.frame(include_spilled=True)
+        df.insert(0, 'video', video)
+        df.to_parquet(tmp_path, index=False)
+    else:
+        with open(tmp_path, 'w') as f:
+            for row in frame_rows(store, video):
+                f.write(json.dumps(row) + '\n')
+    os.replace(tmp_path, path)
+
+
+def analyze_video(job):
+    """Worker task: analyze one video and write its per-frame file; returns its summary"""
+    settings = _settings
+    started = time.perf_counter()
+    spill_dir = os.path.join(settings['output'], '.spill', job['id'])
+    store = EmotionStore(_detector.emotion_labels, spill_dir=spill_dir)
+    live = LiveEmotionMetrics(_detector.emotion_labels)
+    try:
+        # Without a model every frame yields no faces; fail so a later run retries the video
+        if _detector.emotion_model is None:
+            raise RuntimeError(f"Emotion model '{settings['backend']}' not available")
+
+        cap = cv2.VideoCapture(job['path'])
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if not fps or fps <= 0:
+            raise ValueError("Could not read video")
+
+        pipeline = VideoPipeline(
+            job['path'],
+            workers=1,
+            sampler=AdaptiveFrameSampler(fps, target_rate=settings['frame_rate']),
+            track_faces=True,
+            detect_every=settings['detect_every'],
+            detector=_detector
+        )
+        analyzed = 0
+        for frame_index, frame, emotions, sample in pipeline:
+            analyzed += 1
+            timestamp = frame_index / fps
+            store.extend(emotions, timestamp, sample['sample_weight'], sample['reason'])
+            live.extend(emotions, timestamp)
+
+        extension = 'parquet' if settings['format'] == 'parquet' else 'jsonl'
+        frames_path = os.path.join(settings['output'], 'frames', f"{job['id']}.{extension}")
+        write_frames(store, job['path'], frames_path, settings['format'])
+
+        video_seconds = pipeline.frames_decoded / fps
+        counts = dict(zip(live.labels, live.label_counts))
+        return {
+            'id': job['id'],
+            'video': job['path'],
+            'status': 'done',
+            'frames_file': frames_path,
+            'video_seconds': video_seconds,
+            'wall_seconds': time.perf_counter() - started,
+            'frames_total': frame_count,
+            'frames_decoded': pipeline.frames_decoded,
+            'frames_analyzed': analyzed,
+            'detections': live.total,
+            'people': live.unique_tracks,
+            'dominant_emotion': live.mode,
+            'emotion_counts': counts,
+            'emotion_share': {label: count / live.total if live.total else 0.0 for label, count in counts.items()},
+            'confidence_mean': live.confidence_mean,
+            'confidence_std': live.confidence_std
+        }
+    except Exception as e:
+        print(f"Error analyzing {job['path']}: {e}")
+        return {'id': job['id'], 'video': job['path'], 'status': 'failed', 'error': str(e),
+                'wall_seconds': time.perf_counter() - started}
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def write_summaries_parquet(output):
+    import pandas as pd
+
+    summaries = load_manifest(os.path.join(output, SUMMARIES_NAME))
+    rows = [entry for entry in summaries.values() if entry.get('status') == 'done']
+    if rows:
+        pd.json_normalize(rows).to_parquet(os.path.join(output, 'summaries.parquet'), index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help="Video files, directories or glob patterns")
+    parser.add_argument('--output', default=os.path.join(ROOT, 'data', 'batch'), help="Output directory")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Worker processes, each with its own model")
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl', help="Per-frame output format")
+    parser.add_argument('--backend', default=os.environ.get('INFERENCE_BACKEND', 'keras'),
+                        help="Inference backend (see utils.inference_backend)")
+    parser.add_argument('--detection-width', type=int, default=None, help="Face detection width; 0 for native")
+    parser.add_argument('--frame-rate', type=float, default=6, help="Target analyzed frames per second of video")
+    parser.add_argument('--detect-every', type=int, default=5, help="Analyzed frames between face cascade runs")
+    parser.add_argument('--no-resume', action='store_true', help="Reanalyze videos already in the manifest")
+    args = parser.parse_args()
+
+    if args.format == 'parquet':
+        try:
+            import pandas  # noqa: F401
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("Error: --format parquet needs pandas and pyarrow")
+            sys.exit(1)
+
+    output = os.path.abspath(args.output)
+    os.makedirs(os.path.join(output, 'frames'), exist_ok=True)
+    manifest_path = os.path.join(output, MANIFEST_NAME)
+    summaries_path = os.path.join(output, SUMMARIES_NAME)
+    manifest = {} if args.no_resume else load_manifest(manifest_path)
+
+    jobs = []
+    skipped = 0
+    for path in expand_inputs(args.inputs):
+        stat = os.stat(path)
+        job = {'id': video_id(path, stat), 'path': path, 'size': stat.st_size}
+        if manifest.get(job['id'], {}).get('status') == 'done':
+            skipped += 1
+            continue
+        jobs.append(job)
+    # Largest first, so a long lecture does not start last and leave the other workers idle
+    jobs.sort(key=lambda job: job['size'], reverse=True)
+
+    print(f"{len(jobs)} videos to analyze, {skipped} already done; {args.workers} workers")
+    if not jobs:
+        return
+
+    settings = {
+        'output': output,
+        'format': args.format,
+        'backend': args.backend,
+        'detection_width': args.detection_width,
+        'frame_rate': args.frame_rate,
+        'detect_every': args.detect_every
+    }
+    workers = max(1, min(args.workers, len(jobs)))
+    started = time.perf_counter()
+    video_seconds = 0.0
+    done = failed = 0
+
+    ctx = mp.get_context('spawn')
+    with ctx.Pool(workers, initializer=init_worker, initargs=(settings,), maxtasksperchild=None) as pool:
+        for summary in pool.imap_unordered(analyze_video, jobs):
+            if summary['status'] == 'done':
+                done += 1
+                video_seconds += summary['video_seconds']
+                append_jsonl(summaries_path, summary)
+                print(f"[{done + failed}/{len(jobs)}] {summary['video']}: {summary['video_seconds']:.0f}s of video "
+                      f"in {summary['wall_seconds']:.1f}s, {summary['detections']} detections, "
+                      f"mostly {summary['dominant_emotion']}")
+            else:
+                failed += 1
+                print(f"[{done + failed}/{len(jobs)}] {summary['video']}: FAILED ({summary['error']})")
+            append_jsonl(manifest_path, {
+                'id': summary['id'],
+                'video': summary['video'],
+                'status': summary['status'],
+                'finished': time.time()
+            })
+
+    if args.format == 'parquet':
+        write_summaries_parquet(output)
+
+    elapsed = time.perf_counter() - started
+    print(f"\n{done} analyzed, {failed} failed, {skipped} skipped in {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"Throughput: {video_seconds / elapsed:.2f} video-seconds per wall-second")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Inference Backends - Conversion and Accuracy/Latency Report
+
+Converts the Keras emotion model to quantized TFLite (float16, int8) and ONNX,
+then compares every available backend against Keras on a local set of face
+ROIs so the fastest backend that stays within tolerance can be chosen.
+
+    python scripts/inference_backends.py convert --rois data/rois
+    python scripts/inference_backends.py compare --rois data/rois
+
+The ROI directory holds grayscale or color face crops (any size; they are
+resized to 48x48). int8 conversion uses them for calibration and is refused
+without them unless --allow-random-calibration is given. ONNX needs the
+optional `tf2onnx` (conversion) and `onnxruntime` (inference) packages.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+from utils.inference_backend import (
+    BACKENDS, converted_model_path, create_backend, load_roi_set,
+    convert_to_tflite, convert_to_onnx
+)
+
+DEFAULT_MODEL = os.path.join(ROOT, 'models', 'model_num.hdf5')
+DEFAULT_REPORT = os.path.join(ROOT, 'data', 'backend_report.json')
+
+
+def load_rois(args):
+    """(rois, real): the ROI set, or random inputs with real=False if none were found"""
+    if args.rois and os.path.isdir(args.rois):
+        rois = load_roi_set(args.rois, limit=args.limit)
+        if len(rois):
+            return rois, True
+    print("WARNING: no ROI images found; using random inputs, accuracy numbers are not meaningful")
+    rng = np.random.default_rng(0)
+    return rng.random((args.limit or 256, 48, 48, 1), dtype=np.float32), False
+
+
+def convert(args):
+    rois, real = load_rois(args)
+    if 'tflite-int8' in args.backends and not real and not args.allow_random_calibration:
+        print("Error: int8 calibration needs real face ROIs; pass --rois with face crops, "
+              "drop tflite-int8 from --backends or pass --allow-random-calibration")
+        sys.exit(1)
+
+    from tensorflow.keras.models import load_model
+
+    model = load_model(args.model, compile=False)
+
+    for backend in args.backends:
+        if backend == 'keras':
+            continue
+        output_path = converted_model_path(args.model, backend)
+        try:
+            if backend == 'onnx':
+                convert_to_onnx(model, output_path)
+            else:
+                quantization = backend.split('-', 1)[1]
+                convert_to_tflite(model, output_path, quantization, calibration_rois=rois)
+            print(f"{backend}: wrote {output_path} ({os.path.getsize(output_path) / 1e6:.2f} MB)")
+        except Exception as e:
+            print(f"{backend}: conversion failed: {e}")
+
+
+def time_predict(backend, batch, repeats):
+    """Median seconds per call after a short warm-up"""
+    for _ in range(3):
+        backend.predict(batch)
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        backend.predict(batch)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+def compare(args):
+    rois, _ = load_rois(args)
+    reference = None
+    results = []
+
+    for name in ['keras'] + [b for b in args.backends if b != 'keras']:
+        try:
+            backend = create_backend(name, args.model, num_threads=args.threads)
+        except Exception as e:
+            print(f"{name}: unavailable ({e})")
+            continue
+
+        preds = np.concatenate([
+            backend.predict(rois[i:i + args.batch_size]) for i in range(0, len(rois), args.batch_size)
+        ])
+        if reference is None:
+            reference = preds
+
+        single = time_predict(backend, rois[:1], args.repeats)
+        batch = rois[:args.batch_size]
+        batched = time_predict(backend, batch, args.repeats)
+
+        diff = np.abs(preds - reference)
+        path = backend.path
+        results.append({
+            "backend": name,
+            "model_bytes": os.path.getsize(path) if os.path.exists(path) else None,
+            "latency_ms_batch1": single * 1000,
+            "latency_ms_per_roi_batched": batched * 1000 / len(batch),
+            "top1_agreement": float(np.mean(preds.argmax(axis=1) == reference.argmax(axis=1))),
+            "mean_abs_diff": float(diff.mean()),
+            "max_abs_diff": float(diff.max())
+        })
+
+    for r in results:
+        r["within_tolerance"] = (
+            r["top1_agreement"] >= args.min_agreement and r["max_abs_diff"] <= args.max_abs_diff
+        )
+
+    print(f"\n{len(rois)} ROIs, batch size {args.batch_size}")
+    print(f"{'backend':<16}{'size MB':>9}{'b1 ms':>9}{'ms/roi':>9}{'top1':>8}{'max|d|':>9}  ok")
+    for r in results:
+        size = f"{r['model_bytes'] / 1e6:.2f}" if r["model_bytes"] else "-"
+        print(f"{r['backend']:<16}{size:>9}{r['latency_ms_batch1']:>9.2f}"
+              f"{r['latency_ms_per_roi_batched']:>9.3f}{r['top1_agreement']:>8.3f}"
+              f"{r['max_abs_diff']:>9.4f}  {'yes' if r['within_tolerance'] else 'no'}")
+
+    eligible = [r for r in results if r["within_tolerance"]]
+    recommended = min(eligible, key=lambda r: r["latency_ms_per_roi_batched"])["backend"] if eligible else None
+    print(f"\nRecommended backend: {recommended}")
+
+    report = {
+        "rois": len(rois),
+        "batch_size": args.batch_size,
+        "tolerance": {"min_agreement": args.min_agreement, "max_abs_diff": args.max_abs_diff},
+        "results": results,
+        "recommended": recommended
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.report}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['convert', 'compare'])
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="Keras .hdf5 model")
+    parser.add_argument('--rois', default=os.path.join(ROOT, 'data', 'rois'), help="Directory of face crops")
+    parser.add_argument('--limit', type=int, default=500, help="Maximum ROIs to load")
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=None, help="Interpreter threads for TFLite/ONNX")
+    parser.add_argument('--min-agreement', type=float, default=0.98, help="Minimum top-1 agreement with Keras")
+    parser.add_argument('--max-abs-diff', type=float, default=0.05, help="Maximum probability difference")
+    parser.add_argument('--report', default=DEFAULT_REPORT)
+    parser.add_argument('--allow-random-calibration', action='store_true',
+                        help="Calibrate int8 on random inputs when no ROIs are found (the model will be inaccurate)")
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        convert(args)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
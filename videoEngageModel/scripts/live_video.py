@@ -5,10 +5,12 @@ This script detects student attention and emotion from a video or webcam using O
 """
 import cv2
 import numpy as np
-from keras.models import load_model
-from keras.preprocessing.image import img_to_array
-import imutils
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from utils.inference_backend import create_backend
+from engine import AnalysisEngine, EngineConfig, TrackingConfig, TARGET_EMOTIONS
 
 # Paths (relative to project root)
 HAAR_FACE = os.path.join('..', 'haarcascades', 'haarcascade_frontalface_default.xml')
@@ -22,25 +24,23 @@ print("Exists?", os.path.exists(HAAR_FACE))
 print("Eye cascade path:", HAAR_EYE)
 print("Exists?", os.path.exists(HAAR_EYE))
 
-# Load Haarcascades
-face_cascade = cv2.CascadeClassifier(HAAR_FACE)
-eye_cascade = cv2.CascadeClassifier(HAAR_EYE)
-
-# Load emotion model
-emotion_classifier = load_model(MODEL_PATH, compile=False)
-EMOTIONS = ["angry", "disgust", "fear", "happy", "sad", "surprised", "neutral"]
+# Load emotion model; INFERENCE_BACKEND selects keras, tflite-float16, tflite-int8 or onnx
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras')
+emotion_classifier = create_backend(INFERENCE_BACKEND, MODEL_PATH)
 
-# Map model emotions to 4 target emotions
-EMOTION_MAP = {
-    "angry": "frustrated",
-    "disgust": "frustrated",
-    "fear": "confused",
-    "happy": "focused",
-    "sad": "bored",
-    "surprised": "focused",
-    "neutral": "focused"
-}
-TARGET_EMOTIONS = ["bored", "confused", "frustrated", "focused"]
+# Faces are searched on a DETECTION_WIDTH-wide copy; emotion ROIs come from the full frame.
+# Faces keep an ID across frames so the eye check can be reused and debounced.
+engine = AnalysisEngine(
+    EngineConfig.from_env(
+        detection={'cascade': HAAR_FACE, 'detection_width': 400, 'scale_factor': 1.1, 'min_neighbors': 5, 'min_size': 30},
+        attention={'cascade': HAAR_EYE},
+        tracking=TrackingConfig(mode='assign')
+    ),
+    predict_fn=emotion_classifier.predict
+)
+track_assigner = engine.stage('track').assigner
+# Last eye boxes per track, relative to the face box, for drawing between checks
+last_eyes = {}
 
 # Video source: set to 0 for webcam, or use SAMPLE_VIDEO for file
 USE_LIVE_VIDEO = True
@@ -57,37 +57,25 @@ while True:
         ret, frame = cap.read()
         if not ret:
             break
-        frame = imutils.resize(frame, width=400)
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30), flags=cv2.CASCADE_SCALE_IMAGE)
+        result = engine.analyze(frame)
         canvas = np.zeros((350, 400, 3), dtype="uint8")
-        if len(faces) == 0:
+        if not result.faces:
             cv2.putText(frame, "Not-Attentive (student unavailable)", (10, 23), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 255), 2)
-        for (x, y, w, h) in faces:
+        for stale in set(last_eyes) - set(track_assigner.tracks):
+            del last_eyes[stale]
+        for face in result.faces:
+            x, y, w, h = face.bbox
             cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
-            roi = gray[y:y + h, x:x + w]
             roi_color = frame[y:y + h, x:x + w]
-            eyes = eye_cascade.detectMultiScale(roi)
-            for (ex, ey, ew, eh) in eyes[:2]:
+            if face.eyes is not None:
+                last_eyes[face.track_id] = [(ex - x, ey - y, ew, eh) for (ex, ey, ew, eh) in face.eyes]
+            for (ex, ey, ew, eh) in last_eyes.get(face.track_id, [])[:2]:
                 cv2.rectangle(roi_color, (ex, ey), (ex + ew, ey + eh), (0, 255, 0), 2)
-            roi_resized = cv2.resize(roi, (48, 48))
-            roi_resized = roi_resized.astype("float") / 255.0
-            roi_resized = img_to_array(roi_resized)
-            roi_resized = np.expand_dims(roi_resized, axis=0)
-            preds = emotion_classifier.predict(roi_resized)[0]
-            # Map probabilities to 4 target emotions
-            mapped_probs = {e: 0.0 for e in TARGET_EMOTIONS}
-            for i, prob in enumerate(preds):
-                mapped_emotion = EMOTION_MAP[EMOTIONS[i]]
-                mapped_probs[mapped_emotion] += prob
-            # Get the max mapped emotion
-            label = max(mapped_probs, key=mapped_probs.get)
-            attentive = len(eyes) >= 1
-            label_text = f"{'Attentive' if attentive else 'Not-Attentive'} ({label})"
+            label_text = f"{'Attentive' if face.attentive else 'Not-Attentive'} ({face.target_emotion})"
             cv2.putText(frame, label_text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 255), 2)
             # Show mapped probabilities
             for i, emotion in enumerate(TARGET_EMOTIONS):
-                prob = mapped_probs[emotion]
+                prob = face.target_probabilities[emotion]
                 text = f"{emotion}: {prob * 100:.2f}%"
                 w_bar = int(prob * 300)
                 cv2.rectangle(canvas, (7, (i * 35) + 5), (w_bar, (i * 35) + 35), (0, 0, 255), -1)
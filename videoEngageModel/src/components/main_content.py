@@ -4,11 +4,46 @@ import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
 import tempfile
+import time
+import json
 import os
 
+from functools import partial
+
+from utils.video_pipeline import VideoPipeline, create_emotion_detector
+from utils.frame_sampler import AdaptiveFrameSampler
+from utils.result_cache import AnalysisCache
+from utils.emotion_store import EmotionStore
+from utils.live_metrics import LiveEmotionMetrics
+from utils.rollups import EmotionRollup, lttb
+from utils.face_detection import DEFAULT_DETECTION_WIDTH
+from utils.live_capture import LiveFrameScheduler
+from utils.ui_updates import UIUpdateScheduler, DEFAULT_PREVIEW_WIDTH, DEFAULT_PREVIEW_FPS, DEFAULT_PREVIEW_QUALITY
+
+CACHE_DIR = os.path.join('data', 'cache')
+
+# Per-face results kept in memory for a session; older chunks spill to disk when
+# EMOTION_STORE_SPILL_DIR is set and are dropped otherwise
+STORE_CAPACITY = int(os.environ.get('EMOTION_STORE_CAPACITY', 100000))
+STORE_SPILL_DIR = os.environ.get('EMOTION_STORE_SPILL_DIR')
+STORE_MAX_SPILL_CHUNKS = int(os.environ['EMOTION_STORE_MAX_SPILL_CHUNKS']) \
+    if os.environ.get('EMOTION_STORE_MAX_SPILL_CHUNKS') else None
+# Seconds of history behind the live detection rates
+METRICS_WINDOW = float(os.environ.get('LIVE_METRICS_WINDOW_S', 10.0))
+# Lowest rate the live view backs off to when analysis cannot keep up
+LIVE_MIN_RATE = float(os.environ.get('LIVE_MIN_RATE', 1.0))
+# Progress, status and panels are redrawn at most this often
+PANEL_INTERVAL_MS = int(os.environ.get('UI_PANEL_INTERVAL_MS', 250))
+# Timelines use the finest rollup level with at most TIMELINE_MAX_BUCKETS
+# buckets in range, then each trace is downsampled to TIMELINE_MAX_POINTS
+TIMELINE_MAX_BUCKETS = 600
+TIMELINE_MAX_POINTS = 300
+
 def render_main_content(options):
+    st.session_state.emotion_detector.set_backend(options.get("inference_backend", "keras"))
+    st.session_state.emotion_detector.set_detection_width(options.get("detection_width", DEFAULT_DETECTION_WIDTH))
+    
     if options["analysis_type"] == "Real-time Video":
         render_realtime_analysis(options)
     elif options["analysis_type"] == "Upload Video":
@@ -18,6 +53,39 @@ def render_main_content(options):
     elif options["analysis_type"] == "Audio Analysis":
         render_audio_analysis(options)
 
+def reset_emotion_data():
+    """Replace the session's results with an empty EmotionStore, LiveEmotionMetrics and EmotionRollup"""
+    previous = st.session_state.get('emotion_data')
+    if previous is not None:
+        previous.clear()
+    
+    spill_dir = None
+    if STORE_SPILL_DIR:
+        if 'emotion_spill_dir' not in st.session_state:
+            os.makedirs(STORE_SPILL_DIR, exist_ok=True)
+            st.session_state.emotion_spill_dir = tempfile.mkdtemp(prefix='session-', dir=STORE_SPILL_DIR)
+        spill_dir = st.session_state.emotion_spill_dir
+    
+    st.session_state.emotion_data = EmotionStore(
+        st.session_state.emotion_detector.emotion_labels,
+        capacity=STORE_CAPACITY,
+        spill_dir=spill_dir,
+        max_spill_chunks=STORE_MAX_SPILL_CHUNKS
+    )
+    st.session_state.emotion_metrics = LiveEmotionMetrics(
+        st.session_state.emotion_detector.emotion_labels, window=METRICS_WINDOW
+    )
+    st.session_state.emotion_rollup = EmotionRollup(st.session_state.emotion_detector.emotion_labels)
+    return st.session_state.emotion_data
+
+def make_ui_scheduler(options):
+    return UIUpdateScheduler(
+        preview_width=options.get("preview_width", DEFAULT_PREVIEW_WIDTH),
+        preview_quality=options.get("preview_quality", DEFAULT_PREVIEW_QUALITY),
+        preview_fps=options.get("preview_fps", DEFAULT_PREVIEW_FPS),
+        progress_interval_ms=PANEL_INTERVAL_MS
+    )
+
 def render_realtime_analysis(options):
     st.subheader("📹 Real-time Video Analysis")
     
@@ -28,6 +96,7 @@ def render_realtime_analysis(options):
         stop_button = st.button("Stop Camera")
         
         video_placeholder = st.empty()
+        status_placeholder = st.empty()
     
     with col2:
         emotion_placeholder = st.empty()
@@ -35,45 +104,66 @@ def render_realtime_analysis(options):
     
     if start_button and not st.session_state.get('camera_running', False):
         st.session_state.camera_running = True
-        st.session_state.emotion_data = []
+        store = reset_emotion_data()
+        st.session_state.emotion_detector.start_tracking()
         
         cap = cv2.VideoCapture(options["camera_source"])
+        started = time.time()
         
-        while st.session_state.get('camera_running', False):
-            ret, frame = cap.read()
-            if not ret:
-                st.error("Failed to access camera")
+        # A capture thread keeps only the newest frame; analysis takes it at the
+        # sidebar's rate, slowing down when frames take longer than the budget
+        scheduler = LiveFrameScheduler(cap, target_rate=options.get("frame_rate") or 10, min_rate=LIVE_MIN_RATE)
+        ui = make_ui_scheduler(options)
+        
+        for frame, captured_at in scheduler:
+            if not st.session_state.get('camera_running', False):
                 break
             
             # Process frame for emotions
             emotions = st.session_state.emotion_detector.detect_emotions(frame)
-            processed_frame = st.session_state.video_processor.draw_emotions(
-                frame, emotions, options
-            )
             
-            # Display frame
-            video_placeholder.image(processed_frame, channels="BGR", use_column_width=True)
+            # Display frame, drawn only when a preview is due
+            if ui.preview_due():
+                processed_frame = st.session_state.video_processor.draw_emotions(
+                    frame, emotions, options
+                )
+                ui.preview(video_placeholder, processed_frame)
+            
+            # Latency of the previous frame, from camera read to displayed result
+            status = f"{scheduler.rate:.1f} fps target · {scheduler.dropped} frames dropped"
+            if scheduler.last_latency is not None:
+                status += f" · latency {scheduler.last_latency * 1000:.0f} ms"
+            if ui.changed('status', status, PANEL_INTERVAL_MS):
+                status_placeholder.caption(status)
+            
+            # Seconds since the camera started, like video timestamps
+            timestamp = time.time() - started
             
             # Update emotion data
             if emotions:
-                timestamp = datetime.now().strftime("%H:%M:%S")
-                for emotion_data in emotions:
-                    emotion_data['timestamp'] = timestamp
-                    st.session_state.emotion_data.append(emotion_data)
+                store.extend(emotions, timestamp)
+                st.session_state.emotion_metrics.extend(emotions, timestamp)
+                st.session_state.emotion_rollup.extend(emotions, timestamp)
                 
                 # Update emotion display
-                with emotion_placeholder.container():
-                    display_current_emotions(emotions)
-                
-                # Update metrics
+                if ui.changed('emotions', current_emotions_rows(emotions), PANEL_INTERVAL_MS):
+                    with emotion_placeholder.container():
+                        display_current_emotions(emotions)
+            
+            # Update metrics, also on frames without faces so the windowed rates decay
+            if ui.changed('metrics', emotion_metrics_rows(timestamp), PANEL_INTERVAL_MS):
                 with metrics_placeholder.container():
-                    display_emotion_metrics()
+                    display_emotion_metrics(timestamp)
             
             if stop_button:
                 st.session_state.camera_running = False
                 break
+        else:
+            # The camera stopped delivering frames
+            st.error("Failed to access camera")
         
         cap.release()
+        st.session_state.emotion_detector.stop_tracking()
     
     if stop_button:
         st.session_state.camera_running = False
@@ -122,25 +212,69 @@ def render_audio_analysis(options):
             tmp_file.write(uploaded_audio.read())
             temp_path = tmp_file.name
         
-        # Process audio for emotions
-        audio_emotions = st.session_state.emotion_detector.detect_audio_emotions(temp_path)
+        # Process the whole recording window by window
+        audio_result = st.session_state.emotion_detector.detect_audio_emotions_timeline(temp_path)
         
-        if audio_emotions:
-            display_audio_emotions(audio_emotions)
+        if audio_result:
+            display_audio_emotions(audio_result['overall'])
+            if options["show_charts"]:
+                display_audio_timeline(audio_result['timeline'])
         
         os.unlink(temp_path)
 
+def get_analysis_cache():
+    if 'analysis_cache' not in st.session_state:
+        st.session_state.analysis_cache = AnalysisCache(CACHE_DIR)
+    return st.session_state.analysis_cache
+
 def process_video_file(video_path, options):
-    st.session_state.emotion_data = []
+    store = reset_emotion_data()
     
     progress_bar = st.progress(0)
     status_text = st.empty()
     
+    detector = st.session_state.emotion_detector
     cap = cv2.VideoCapture(video_path)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    
+    # Analyze more often when the scene changes, less when it is static
+    sampler = AdaptiveFrameSampler(fps, target_rate=options.get("frame_rate") or 6)
+    
+    pipeline = VideoPipeline(
+        video_path,
+        workers=options.get("workers", 1),
+        queue_depth=options.get("queue_depth", 8),
+        sampler=sampler,
+        track_faces=True,
+        detect_every=5,
+        detector=detector,
+        detector_factory=partial(
+            create_emotion_detector,
+            backend=detector.backend,
+            detection_width=detector.detection_width
+        )
+    )
     
-    frame_count = 0
+    # Only parameters that change the analysis belong in the key, not display options
+    model_fingerprint = detector.model_fingerprint()
+    cache = get_analysis_cache()
+    cache_key = None
+    if model_fingerprint is not None:
+        params = pipeline.analysis_params()
+        params["detection_width"] = detector.detection_width
+        cache_key = cache.make_key(video_path, model_fingerprint, params)
+        cached_columns = cache.load_columns(cache_key)
+        if cached_columns is not None:
+            metrics_snapshot = cached_columns.pop('metrics_snapshot', None)
+            store.extend_columns(cached_columns)
+            restore_emotion_metrics(metrics_snapshot, cached_columns)
+            st.session_state.emotion_rollup.add_columns(cached_columns)
+            progress_bar.progress(1.0)
+            status_text.text(f"Loaded {len(cached_columns['timestamp'])} cached detections")
+            if options["show_charts"] and st.session_state.emotion_data:
+                display_emotion_analytics()
+            return
     
     col1, col2 = st.columns([2, 1])
     
@@ -150,101 +284,133 @@ def process_video_file(video_path, options):
     with col2:
         emotion_placeholder = st.empty()
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        # Process every nth frame to speed up analysis
-        if frame_count % 5 == 0:
-            emotions = st.session_state.emotion_detector.detect_emotions(frame)
+    ui = make_ui_scheduler(options)
+    
+    # Results arrive in frame order; only analyzed frames are delivered
+    for frame_count, frame, emotions, sample in pipeline:
+        if ui.preview_due():
             processed_frame = st.session_state.video_processor.draw_emotions(
                 frame, emotions, options
             )
+            ui.preview(video_placeholder, processed_frame)
+        
+        if emotions:
+            timestamp = frame_count / pipeline.fps
+            store.extend(emotions, timestamp, sample['sample_weight'], sample['reason'])
+            st.session_state.emotion_metrics.extend(emotions, timestamp)
+            st.session_state.emotion_rollup.extend(emotions, timestamp)
             
-            video_placeholder.image(processed_frame, channels="BGR", use_column_width=True)
-            
-            if emotions:
-                timestamp = frame_count / fps
-                for emotion_data in emotions:
-                    emotion_data['timestamp'] = timestamp
-                    st.session_state.emotion_data.append(emotion_data)
-                
+            if ui.changed('emotions', current_emotions_rows(emotions), PANEL_INTERVAL_MS):
                 with emotion_placeholder.container():
                     display_current_emotions(emotions)
         
-        frame_count += 1
-        progress = frame_count / total_frames
-        progress_bar.progress(progress)
-        status_text.text(f"Processing frame {frame_count}/{total_frames}")
+        total_frames = max(pipeline.total_frames, 1)
+        ui.progress(progress_bar, status_text, (frame_count + 1) / total_frames,
+                    f"Processing frame {frame_count + 1}/{total_frames}")
     
-    cap.release()
-    status_text.text("Analysis complete!")
+    ui.progress(progress_bar, status_text, 1.0, "Analysis complete!", force=True)
+    
+    # Only complete results are cached
+    if cache_key is not None and not store.dropped:
+        columns = store.columns(include_spilled=True)
+        columns['metrics_snapshot'] = np.array(json.dumps(st.session_state.emotion_metrics.snapshot()))
+        cache.store_columns(cache_key, columns)
     
     # Display final analytics
     if options["show_charts"] and st.session_state.emotion_data:
         display_emotion_analytics()
 
+def restore_emotion_metrics(metrics_snapshot, columns):
+    """Rebuild the metrics panel's aggregator from a cached snapshot, or recount the cached rows"""
+    if metrics_snapshot is not None:
+        try:
+            snapshot = json.loads(str(metrics_snapshot))
+            if snapshot["labels"] == st.session_state.emotion_metrics.labels and snapshot["window"] == METRICS_WINDOW:
+                st.session_state.emotion_metrics = LiveEmotionMetrics.restore(snapshot)
+                return
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Error restoring cached emotion metrics: {e}")
+    st.session_state.emotion_metrics.add_columns(columns)
+
+def current_emotions_rows(emotions):
+    """The lines display_current_emotions shows, also used to skip redraws that change nothing"""
+    return tuple(
+        f"Person {emotion.get('person_id', i) + 1}: {emotion.get('dominant_emotion', 'Unknown')} "
+        f"({emotion.get('confidence', 0):.2f})"
+        for i, emotion in enumerate(emotions)
+    )
+
 def display_current_emotions(emotions):
     st.write("**Current Emotions:**")
-    for i, emotion in enumerate(emotions):
-        st.write(f"Person {i+1}: {emotion.get('dominant_emotion', 'Unknown')} "
-                f"({emotion.get('confidence', 0):.2f})")
+    for row in current_emotions_rows(emotions):
+        st.write(row)
 
-def display_emotion_metrics():
-    if not st.session_state.emotion_data:
-        return
-    
-    df = pd.DataFrame(st.session_state.emotion_data)
-    
-    # Calculate metrics
-    total_detections = len(df)
-    unique_people = df['person_id'].nunique() if 'person_id' in df.columns else 1
-    
-    st.metric("Total Detections", total_detections)
-    st.metric("People Detected", unique_people)
-    
-    if 'dominant_emotion' in df.columns:
-        most_common = df['dominant_emotion'].mode().iloc[0] if not df['dominant_emotion'].mode().empty else "None"
-        st.metric("Most Common Emotion", most_common)
+def emotion_metrics_rows(now=None):
+    """(label, value) pairs display_emotion_metrics shows; ``now`` is in detection timestamp seconds"""
+    # Running totals, so the panel costs the same in minute one and hour three
+    live = st.session_state.get('emotion_metrics')
+    if live is None or not live.total:
+        return ()
+    rate, _ = live.rates(now)
+    return (
+        ("Total Detections", live.total),
+        ("People Detected", live.unique_tracks),
+        ("Most Common Emotion", live.mode or "None"),
+        (f"Detections/s (last {live.window:g}s)", f"{rate:.1f}"),
+        ("Mean Confidence", f"{live.confidence_mean:.2f} ± {live.confidence_std:.2f}")
+    )
+
+def display_emotion_metrics(now=None):
+    for label, value in emotion_metrics_rows(now):
+        st.metric(label, value)
 
 def display_emotion_analytics():
-    if not st.session_state.emotion_data:
+    rollup = st.session_state.get('emotion_rollup')
+    if not st.session_state.emotion_data or rollup is None or rollup.start is None:
         return
     
     st.subheader("📊 Emotion Analytics")
     
-    df = pd.DataFrame(st.session_state.emotion_data)
-    
     col1, col2 = st.columns(2)
     
     with col1:
-        # Emotion distribution pie chart
-        if 'dominant_emotion' in df.columns:
-            emotion_counts = df['dominant_emotion'].value_counts()
-            fig = px.pie(
-                values=emotion_counts.values,
-                names=emotion_counts.index,
-                title="Emotion Distribution"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+        # Emotion distribution pie chart from the coarsest buckets
+        _, counts, _ = rollup.series(rollup.resolutions[-1])
+        fig = px.pie(
+            values=counts.sum(axis=0),
+            names=rollup.labels,
+            title="Emotion Distribution"
+        )
+        st.plotly_chart(fig, use_container_width=True)
     
     with col2:
-        # Emotion timeline
-        if 'timestamp' in df.columns and 'dominant_emotion' in df.columns:
-            timeline_df = df.groupby(['timestamp', 'dominant_emotion']).size().reset_index(name='count')
-            fig = px.line(
-                timeline_df,
-                x='timestamp',
-                y='count',
-                color='dominant_emotion',
-                title="Emotion Timeline"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+        # Emotion timeline at a bucket size picked from the visible range
+        start, end = float(rollup.start), float(rollup.end)
+        if end - start >= 1:
+            start, end = st.slider("Timeline range (s)", start, end, (start, end))
+        value = st.radio("Timeline value", ["Detections", "Mean probability"], horizontal=True)
+        res = rollup.level_for_range(end - start, max_buckets=TIMELINE_MAX_BUCKETS)
+        times, counts, means = rollup.series(res, start, end)
+        values = counts if value == "Detections" else means
+        
+        traces = []
+        for i, label in enumerate(rollup.labels):
+            kept = lttb(times, values[:, i], TIMELINE_MAX_POINTS)
+            traces.append(pd.DataFrame({'time': times[kept], 'value': values[kept, i], 'emotion': label}))
+        timeline_df = pd.concat(traces, ignore_index=True)
+        fig = px.line(
+            timeline_df,
+            x='time',
+            y='value',
+            color='emotion',
+            title=f"Emotion Timeline ({res}s buckets)",
+            labels={'time': 'Time (s)', 'value': value}
+        )
+        st.plotly_chart(fig, use_container_width=True)
     
     # Detailed data table
     if st.checkbox("Show Detailed Data"):
-        st.dataframe(df)
+        st.dataframe(st.session_state.emotion_data.frame(include_spilled=True))
 
 def display_audio_emotions(audio_emotions):
     st.subheader("🎵 Audio Emotion Results")
@@ -264,4 +430,32 @@ def display_audio_emotions(audio_emotions):
         
         # Display top emotion
         top_emotion = max(audio_emotions, key=audio_emotions.get)
-        st.success(f"Detected Emotion: **{top_emotion}** (Confidence: {audio_emotions[top_emotion]:.2f})")
\ No newline at end of file
+        st.success(f"Detected Emotion: **{top_emotion}** (Confidence: {audio_emotions[top_emotion]:.2f})")
+
+def display_audio_timeline(timeline):
+    if not timeline:
+        return
+    
+    st.subheader("🕒 Audio Emotion Timeline")
+    
+    df = pd.DataFrame(timeline)
+    df['time'] = (df['start'] + df['end']) / 2
+    emotion_columns = [c for c in df.columns if c not in ('start', 'end', 'time')]
+    timeline_df = df.melt(
+        id_vars='time',
+        value_vars=emotion_columns,
+        var_name='emotion',
+        value_name='confidence'
+    )
+    fig = px.line(
+        timeline_df,
+        x='time',
+        y='confidence',
+        color='emotion',
+        title="Audio Emotion Timeline",
+        labels={'time': 'Time (s)'}
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    
+    dominant = df[emotion_columns].idxmax(axis=1)
+    st.write(f"Analyzed {len(df)} windows; most frequent emotion: **{dominant.mode().iloc[0]}**")
@@ -1,6 +1,30 @@
 import streamlit as st
 import os
 
+from utils.model_registry import model_registry
+from utils.face_detection import DEFAULT_DETECTION_WIDTH
+from utils.ui_updates import DEFAULT_PREVIEW_WIDTH, DEFAULT_PREVIEW_FPS, DEFAULT_PREVIEW_QUALITY
+
+# Display name -> inference backend (utils.inference_backend.BACKENDS)
+MODEL_BACKENDS = {
+    "CNN Model": "keras",
+    "CNN Model (TFLite float16)": "tflite-float16",
+    "CNN Model (TFLite int8)": "tflite-int8",
+    "CNN Model (ONNX Runtime)": "onnx"
+}
+
+# Display name -> width of the image the face cascade scans (0 = native)
+DETECTION_WIDTHS = {
+    "320 px": 320,
+    "480 px": 480,
+    "640 px": 640,
+    "960 px": 960,
+    "Native": 0
+}
+
+# Widths of the JPEG previews sent to the browser
+PREVIEW_WIDTHS = [320, 480, 640, 960, 1280]
+
 def render_sidebar():
     st.sidebar.title("🎯 Configuration")
     
@@ -14,7 +38,8 @@ def render_sidebar():
     st.sidebar.subheader("Model Settings")
     emotion_model = st.sidebar.selectbox(
         "Emotion Detection Model",
-        ["CNN Model", "Advanced Model"]
+        list(MODEL_BACKENDS.keys()),
+        help="Quantized and ONNX variants must be converted first with scripts/inference_backends.py"
     )
     
     # Confidence threshold
@@ -33,7 +58,11 @@ def render_sidebar():
             "Camera Source",
             [0, 1, 2]  # Different camera indices
         )
-        
+    else:
+        camera_source = None
+    
+    # Target analysis rate (frames per second) for live and file video
+    if analysis_type != "Audio Analysis":
         frame_rate = st.sidebar.slider(
             "Frame Rate",
             min_value=1,
@@ -41,9 +70,23 @@ def render_sidebar():
             value=10
         )
     else:
-        camera_source = None
         frame_rate = None
     
+    # Face search resolution; emotions are still read from full-resolution faces
+    if analysis_type != "Audio Analysis":
+        default_width = next(
+            (name for name, width in DETECTION_WIDTHS.items() if width == DEFAULT_DETECTION_WIDTH), "Native"
+        )
+        detection_resolution = st.sidebar.select_slider(
+            "Detection Resolution",
+            options=list(DETECTION_WIDTHS.keys()),
+            value=default_width,
+            help="Lower is faster but misses small faces; see benchmarks/detection_sweep.py"
+        )
+        detection_width = DETECTION_WIDTHS[detection_resolution]
+    else:
+        detection_width = DEFAULT_DETECTION_WIDTH
+    
     # Sample video selection
     sample_video = None
     if analysis_type == "Sample Videos":
@@ -60,20 +103,79 @@ def render_sidebar():
             sample_videos
         )
     
+    # Video file processing settings
+    if analysis_type in ["Upload Video", "Sample Videos"]:
+        st.sidebar.subheader("Processing Settings")
+        workers = st.sidebar.slider(
+            "Analysis Workers",
+            min_value=1,
+            max_value=max(1, os.cpu_count() or 1),
+            value=1,
+            help="Worker processes for file analysis; 1 analyzes in the app process"
+        )
+        queue_depth = st.sidebar.slider(
+            "Frame Queue Depth",
+            min_value=2,
+            max_value=64,
+            value=8
+        )
+    else:
+        workers = 1
+        queue_depth = 8
+    
     # Display options
     st.sidebar.subheader("Display Options")
     show_emotions = st.sidebar.checkbox("Show Emotion Labels", value=True)
     show_confidence = st.sidebar.checkbox("Show Confidence Scores", value=True)
     show_charts = st.sidebar.checkbox("Show Analytics Charts", value=True)
+    if analysis_type != "Audio Analysis":
+        # Previews are downscaled JPEGs sent at their own rate, independent of analysis
+        preview_width = st.sidebar.select_slider(
+            "Preview Width",
+            options=PREVIEW_WIDTHS,
+            value=DEFAULT_PREVIEW_WIDTH
+        )
+        preview_fps = st.sidebar.slider(
+            "Preview FPS",
+            min_value=1,
+            max_value=30,
+            value=DEFAULT_PREVIEW_FPS
+        )
+        preview_quality = st.sidebar.slider(
+            "Preview JPEG Quality",
+            min_value=30,
+            max_value=95,
+            value=DEFAULT_PREVIEW_QUALITY
+        )
+    else:
+        preview_width = DEFAULT_PREVIEW_WIDTH
+        preview_fps = DEFAULT_PREVIEW_FPS
+        preview_quality = DEFAULT_PREVIEW_QUALITY
+    
+    # Shared model status for this server process
+    with st.sidebar.expander("Loaded Models"):
+        for name, stats in model_registry.stats().items():
+            if stats["status"] == "loaded":
+                st.write(f"**{name}**: {stats['load_seconds']:.2f}s load, "
+                         f"{stats['resident_bytes'] / 1e6:.1f} MB resident")
+            else:
+                st.write(f"**{name}**: {stats['status']}")
     
     return {
         "analysis_type": analysis_type,
         "emotion_model": emotion_model,
+        "inference_backend": MODEL_BACKENDS[emotion_model],
         "confidence_threshold": confidence_threshold,
         "camera_source": camera_source,
         "frame_rate": frame_rate,
+        "detection_width": detection_width,
         "sample_video": sample_video,
+        "workers": workers,
+        "queue_depth": queue_depth,
         "show_emotions": show_emotions,
         "show_confidence": show_confidence,
-        "show_charts": show_charts
+        "show_charts": show_charts,
+        "preview_width": preview_width,
+        "preview_fps": preview_fps,
+        "preview_quality": preview_quality
     }
\ No newline at end of file
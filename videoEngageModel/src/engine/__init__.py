@@ -0,0 +1,10 @@
+"""Shared frame analysis engine used by api.py, scripts/live_video.py and EmotionDetector"""
+from engine.config import (
+    EngineConfig, DetectionConfig, TrackingConfig, AttentionConfig,
+    MODEL_LABELS, ENGAGEMENT_MAP, TARGET_EMOTIONS, EMOTION_MULTIPLIERS
+)
+from engine.results import FaceResult, FrameResult
+from engine.stages import (
+    Stage, FrameContext, DecodeStage, DetectStage, TrackStage, AttendStage, ClassifyStage, ScoreStage, RenderStage
+)
+from engine.core import AnalysisEngine
@@ -0,0 +1,97 @@
+import os
+from dataclasses import dataclass, field
+
+from utils.face_detection import DEFAULT_DETECTION_WIDTH, detection_settings_from_env
+
+# Class order of the FER-2013 emotion model (models/model_num.hdf5)
+MODEL_LABELS = ("angry", "disgust", "fear", "happy", "sad", "surprised", "neutral")
+
+# Map model emotions to the 4 engagement emotions
+ENGAGEMENT_MAP = {
+    "angry": "frustrated",
+    "disgust": "frustrated",
+    "fear": "confused",
+    "happy": "focused",
+    "sad": "bored",
+    "surprised": "focused",
+    "neutral": "focused"
+}
+TARGET_EMOTIONS = ("bored", "confused", "frustrated", "focused")
+
+# Engagement score = base (attentive or not) x multiplier of the engagement emotion
+EMOTION_MULTIPLIERS = {
+    "focused": 1.5,
+    "confused": 1.1,
+    "bored": 0.8,
+    "frustrated": 0.6
+}
+
+
+@dataclass
+class DetectionConfig:
+    """Face cascade settings; see utils.face_detection.FaceDetector"""
+    cascade: str = 'haarcascades/haarcascade_frontalface_default.xml'
+    detection_width: int = DEFAULT_DETECTION_WIDTH
+    scale_factor: float = 1.1
+    min_neighbors: int = 5
+    min_size: int = 30
+    max_size: int = None
+    # Search near each key's previous face first (utils.face_search_cache)
+    search_window: bool = False
+    search_ttl: float = 2.0
+    search_max_keys: int = 1024
+    search_expand: float = 0.5
+
+
+@dataclass
+class TrackingConfig:
+    """How faces get IDs across frames.
+
+    ``none``: no IDs. ``key``: the first face takes the frame's key (one
+    face per client). ``assign``: IoU/centroid association of every
+    detection. ``flow``: optical-flow tracking that re-runs the cascade only
+    every ``detect_every`` frames.
+    """
+    mode: str = 'none'
+    detect_every: int = 5
+
+
+@dataclass
+class AttentionConfig:
+    """Eye-cascade attentiveness settings; see utils.attentiveness"""
+    enabled: bool = True
+    cascade: str = 'haarcascades/haarcascade_eye.xml'
+    recheck_every: int = 5
+    on_checks: int = 2
+    off_checks: int = 2
+
+
+@dataclass
+class EngineConfig:
+    detection: DetectionConfig = field(default_factory=DetectionConfig)
+    tracking: TrackingConfig = field(default_factory=TrackingConfig)
+    attention: AttentionConfig = field(default_factory=AttentionConfig)
+    # Inference backend used when no predict_fn is given (utils.inference_backend)
+    backend: str = 'keras'
+    labels: tuple = MODEL_LABELS
+    engagement_map: dict = field(default_factory=lambda: dict(ENGAGEMENT_MAP))
+    target_emotions: tuple = TARGET_EMOTIONS
+    # Only the first max_faces faces are classified (None for all)
+    max_faces: int = None
+    roi_size: int = 48
+
+    @classmethod
+    def from_env(cls, detection=None, attention=None, **kwargs):
+        """Config whose detection and attention settings can be overridden by env vars.
+
+        DETECTION_* as in utils.face_detection.detection_settings_from_env;
+        ATTENTION_RECHECK_EVERY, ATTENTION_ON_CHECKS and ATTENTION_OFF_CHECKS.
+        ``detection`` and ``attention`` are dicts of defaults for those sections.
+        """
+        detection = DetectionConfig(**detection_settings_from_env(**(detection or {})))
+        attention = dict(attention or {})
+        for key in ('recheck_every', 'on_checks', 'off_checks'):
+            value = os.environ.get(f'ATTENTION_{key.upper()}')
+            if value:
+                attention[key] = int(value)
+        return cls(detection=detection, attention=AttentionConfig(**attention), **kwargs)
@@ -0,0 +1,101 @@
+import time
+
+from engine.config import EngineConfig
+from engine.results import FrameResult
+from engine.stages import (
+    FrameContext, DecodeStage, DetectStage, TrackStage, AttendStage, ClassifyStage, ScoreStage, RenderStage
+)
+from utils.metrics import metrics
+
+faces_per_frame = metrics.histogram(
+    "engagement_faces_per_frame", buckets=[0, 1, 2, 4, 8, 16, 32], help_text="Faces detected per frame"
+)
+no_face_frames = metrics.counter("engagement_no_face_frames_total", help_text="Frames with no face detected")
+
+
+class AnalysisEngine:
+    """Frame -> faces -> ROIs -> predict -> engagement, shared by every entry point.
+
+    Stages run in STAGE_ORDER; ``stages`` replaces or removes (None) any of
+    the defaults built from ``config``. ``predict_fn`` takes a float32
+    (N, 48, 48, 1) batch and returns (N, len(labels)) probabilities; by
+    default it is the config's inference backend. Each stage is timed into
+    the ``engagement_stage_seconds`` metric and into ``FrameResult.timings``,
+    which also holds the finer steps the stages time themselves (grayscale,
+    resize, face_cascade, eye_cascade, preprocess, predict).
+
+    One engine may be shared by threads as long as its tracking mode is
+    ``none`` or ``key``; ``assign`` and ``flow`` keep per-stream state.
+    """
+
+    STAGE_ORDER = ("decode", "detect", "track", "attend", "classify", "score", "render")
+
+    def __init__(self, config=None, predict_fn=None, render_fn=None, stages=None):
+        self.config = config or EngineConfig()
+        if predict_fn is None:
+            predict_fn = self._backend_predict
+
+        config = self.config
+        detect = DetectStage(config.detection, lazy=config.tracking.mode == 'flow')
+        defaults = {
+            "decode": DecodeStage(),
+            "detect": detect,
+            "track": TrackStage(config.tracking, detect_stage=detect, max_faces=config.max_faces),
+            "attend": AttendStage(config.attention) if config.attention.enabled else None,
+            "classify": ClassifyStage(predict_fn, roi_size=config.roi_size),
+            "score": ScoreStage(config),
+            "render": RenderStage(render_fn) if render_fn is not None else None
+        }
+        defaults.update(stages or {})
+        self.stages = [defaults[name] for name in self.STAGE_ORDER if defaults.get(name) is not None]
+
+    def _backend_predict(self, rois):
+        from utils.inference_backend import get_backend
+
+        backend = get_backend(self.config.backend)
+        if backend is None:
+            raise RuntimeError(f"Inference backend '{self.config.backend}' is not available")
+        return backend.predict(rois)
+
+    def stage(self, name):
+        """Return the configured stage called ``name``, or None"""
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        return None
+
+    def analyze(self, frame=None, encoded=None, key=None):
+        """Analyze one BGR frame, or one encoded image (data URL or bytes)"""
+        return self._run([FrameContext(frame=frame, encoded=encoded, key=key)])[0]
+
+    def analyze_batch(self, frames, keys=None):
+        """Analyze several frames with a single model call"""
+        keys = keys if keys is not None else [None] * len(frames)
+        return self._run([FrameContext(frame=frame, key=key) for frame, key in zip(frames, keys)])
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    def prepare_thread(self):
+        """Load this thread's cascades now rather than on its first frame"""
+        for stage in self.stages:
+            stage.prepare_thread()
+
+    def _run(self, contexts):
+        for stage in self.stages:
+            started = time.perf_counter()
+            with metrics.span(stage.name):
+                stage.process_batch(contexts)
+            share = (time.perf_counter() - started) / len(contexts)
+            for ctx in contexts:
+                ctx.timings[stage.name] = share
+
+        results = []
+        for ctx in contexts:
+            faces_per_frame.observe(len(ctx.faces))
+            if not ctx.faces:
+                no_face_frames.inc()
+            shape = ctx.frame.shape if ctx.frame is not None else None
+            results.append(FrameResult(faces=ctx.faces, frame_shape=shape, timings=ctx.timings, rendered=ctx.rendered))
+        return results
@@ -0,0 +1,31 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+@dataclass
+class FaceResult:
+    """One analyzed face; boxes are (x, y, w, h) in full-resolution pixels"""
+    bbox: tuple
+    track_id: object = None
+    # Model probabilities in EngineConfig.labels order
+    probabilities: np.ndarray = None
+    label: str = None
+    confidence: float = 0.0
+    # None when attention was not checked
+    attentive: bool = None
+    # Eye boxes from this frame's check; None when the last check was reused
+    eyes: list = None
+    target_probabilities: dict = field(default_factory=dict)
+    target_emotion: str = None
+    engagement_score: float = 0.0
+
+
+@dataclass
+class FrameResult:
+    faces: list
+    frame_shape: tuple
+    # Seconds spent in each stage for this frame
+    timings: dict = field(default_factory=dict)
+    # Output of the render stage, when one is configured
+    rendered: np.ndarray = None
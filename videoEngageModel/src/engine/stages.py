@@ -0,0 +1,340 @@
+import base64
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from engine.config import EMOTION_MULTIPLIERS
+from engine.results import FaceResult
+from utils.attentiveness import AttentivenessEstimator
+from utils.face_detection import FaceDetector
+from utils.face_search_cache import FaceSearchCache
+from utils.face_tracker import FaceTracker, TrackAssigner
+from utils.metrics import metrics
+
+face_search_hits = metrics.counter(
+    "engagement_face_search_total", {"result": "hit"}, help_text="Windowed face searches by result"
+)
+face_search_misses = metrics.counter(
+    "engagement_face_search_total", {"result": "miss"}, help_text="Windowed face searches by result"
+)
+face_search_saved = metrics.counter(
+    "engagement_face_search_saved_seconds_total", help_text="Estimated cascade time saved by windowed searches"
+)
+
+
+def add_timing(ctx, name, seconds):
+    """Accumulate a sub-stage time (e.g. face_cascade inside detect) into ctx.timings"""
+    ctx.timings[name] = ctx.timings.get(name, 0.0) + seconds
+
+
+class FrameContext:
+    """Per-frame state handed from stage to stage"""
+
+    def __init__(self, frame=None, encoded=None, key=None):
+        self.frame = frame
+        # Data-URL string or encoded image bytes, for the decode stage
+        self.encoded = encoded
+        # Caller's identity for the frame (e.g. a userId), used by key tracking and face search
+        self.key = key
+        self.gray = None
+        self.small = None
+        self.scale = 1.0
+        self.boxes = []
+        self.track_ids = []
+        self.attentive = []
+        self.eyes = []
+        self.probabilities = None
+        self.faces = []
+        self.rendered = None
+        self.timings = {}
+
+
+class Stage:
+    """One step of the analysis engine.
+
+    Subclasses implement ``process(ctx)``; stages that gain from seeing
+    several frames at once (model inference) override ``process_batch``.
+    """
+
+    name = "stage"
+
+    def process(self, ctx):
+        raise NotImplementedError
+
+    def process_batch(self, contexts):
+        for ctx in contexts:
+            self.process(ctx)
+
+    def reset(self):
+        """Forget state carried between frames"""
+
+    def prepare_thread(self):
+        """Load per-thread resources ahead of the first frame"""
+
+
+class DecodeStage(Stage):
+    """Decode a data URL or encoded bytes into a BGR frame"""
+
+    name = "decode"
+
+    def process(self, ctx):
+        if ctx.frame is not None or ctx.encoded is None:
+            return
+        encoded = ctx.encoded
+        if isinstance(encoded, str):
+            encoded = base64.b64decode(encoded.split(',')[1])
+        ctx.frame = cv2.imdecode(np.frombuffer(encoded, np.uint8), cv2.IMREAD_COLOR)
+        if ctx.frame is None:
+            raise ValueError("Could not decode image")
+
+
+class DetectStage(Stage):
+    """Grayscale, downscale and run the face cascade (one cascade per thread).
+
+    With ``lazy`` the cascade is not run here; a flow-tracking stage calls
+    ``find_faces`` when it needs a fresh detection.
+    """
+
+    name = "detect"
+
+    def __init__(self, config, lazy=False):
+        self.config = config
+        self.lazy = lazy
+        self._local = threading.local()
+        self.search_cache = None
+        if config.search_window:
+            self.search_cache = FaceSearchCache(
+                ttl=config.search_ttl, max_users=config.search_max_keys, expand=config.search_expand
+            )
+            metrics.gauge("engagement_face_search_hit_rate", fn=self.search_cache.hit_rate,
+                          help_text="Share of windowed face searches that found the face")
+            metrics.gauge("engagement_face_search_users", fn=lambda: self.search_cache.stats()["users"],
+                          help_text="Keys with a cached face box")
+
+    @property
+    def detector(self):
+        detector = getattr(self._local, 'detector', None)
+        if detector is None:
+            config = self.config
+            detector = FaceDetector(
+                config.cascade, detection_width=config.detection_width, scale_factor=config.scale_factor,
+                min_neighbors=config.min_neighbors, min_size=config.min_size, max_size=config.max_size
+            )
+            self._local.detector = detector
+        return detector
+
+    def prepare_thread(self):
+        self.detector
+
+    def process(self, ctx):
+        started = time.perf_counter()
+        ctx.gray = cv2.cvtColor(ctx.frame, cv2.COLOR_BGR2GRAY)
+        add_timing(ctx, "grayscale", time.perf_counter() - started)
+        detector = self.detector
+        # Settings may have been changed on the shared config
+        detector.detection_width = self.config.detection_width
+        started = time.perf_counter()
+        ctx.small, ctx.scale = detector.downscale(ctx.gray)
+        add_timing(ctx, "resize", time.perf_counter() - started)
+        if not self.lazy:
+            ctx.boxes = [tuple(int(v) for v in box) for box in self.find_faces(ctx)]
+
+    def find_faces(self, ctx):
+        """Faces in full-resolution coordinates, searching near the key's last face first"""
+        started = time.perf_counter()
+        try:
+            return self._find_faces(ctx)
+        finally:
+            add_timing(ctx, "face_cascade", time.perf_counter() - started)
+
+    def _find_faces(self, ctx):
+        cache = self.search_cache if ctx.key is not None else None
+        detector = self.detector
+        if cache is None:
+            return detector.detect_scaled(ctx.small, ctx.scale)
+
+        shape = ctx.gray.shape
+        window = cache.lookup(ctx.key, shape)
+        if window is not None:
+            started = time.perf_counter()
+            faces = detector.detect_scaled(ctx.small, ctx.scale, window)
+            if len(faces):
+                face_search_hits.inc()
+                face_search_saved.inc(cache.record_hit(time.perf_counter() - started))
+                cache.update(ctx.key, faces[0], shape)
+                return faces
+            face_search_misses.inc()
+            cache.record_miss()
+
+        started = time.perf_counter()
+        faces = detector.detect_scaled(ctx.small, ctx.scale)
+        cache.record_full_scan(time.perf_counter() - started)
+        if len(faces):
+            cache.update(ctx.key, faces[0], shape)
+        else:
+            cache.forget(ctx.key)
+        return faces
+
+
+class TrackStage(Stage):
+    """Give faces IDs according to TrackingConfig.mode and apply max_faces"""
+
+    name = "track"
+
+    def __init__(self, config, detect_stage=None, max_faces=None):
+        self.mode = config.mode
+        self.detect_every = config.detect_every
+        self.detect_stage = detect_stage
+        self.max_faces = max_faces
+        self.assigner = TrackAssigner() if self.mode == 'assign' else None
+        self.tracker = None
+        self._ctx = None
+        if self.mode == 'flow':
+            if detect_stage is None:
+                raise ValueError("flow tracking needs the detect stage")
+            self.tracker = FaceTracker(self._detect, detect_every=self.detect_every)
+
+    def _detect(self, gray):
+        return self.detect_stage.find_faces(self._ctx)
+
+    def process(self, ctx):
+        if self.mode == 'flow':
+            self._ctx = ctx
+            tracked = self.tracker.update(ctx.gray)
+            self._ctx = None
+            ctx.track_ids = [track_id for track_id, _ in tracked]
+            ctx.boxes = [tuple(int(v) for v in bbox) for _, bbox in tracked]
+        elif self.mode == 'assign':
+            ctx.track_ids = self.assigner.assign(ctx.boxes)
+        elif self.mode == 'key':
+            ctx.track_ids = [ctx.key] + [None] * (len(ctx.boxes) - 1) if ctx.boxes else []
+        else:
+            ctx.track_ids = [None] * len(ctx.boxes)
+
+        if self.max_faces is not None:
+            ctx.boxes = ctx.boxes[:self.max_faces]
+            ctx.track_ids = ctx.track_ids[:self.max_faces]
+
+    def reset(self):
+        if self.assigner is not None:
+            self.assigner.reset()
+        if self.tracker is not None:
+            self.tracker = FaceTracker(self._detect, detect_every=self.detect_every)
+
+
+class AttendStage(Stage):
+    """Amortized, debounced eye check per face (utils.attentiveness) at detection resolution"""
+
+    name = "attend"
+
+    def __init__(self, config):
+        self.estimator = AttentivenessEstimator(
+            config.cascade, recheck_every=config.recheck_every,
+            on_checks=config.on_checks, off_checks=config.off_checks
+        )
+
+    def prepare_thread(self):
+        self.estimator.cascade
+
+    def process(self, ctx):
+        ctx.attentive = []
+        ctx.eyes = []
+        for track_id, (x, y, w, h) in zip(ctx.track_ids, ctx.boxes):
+            face_small = tuple(int(v / ctx.scale) for v in (x, y, w, h))
+            started = time.perf_counter()
+            attentive, eyes = self.estimator.update(track_id, ctx.small, face_small)
+            add_timing(ctx, "eye_cascade", time.perf_counter() - started)
+            if eyes is not None:
+                eyes = [tuple(int(v * ctx.scale) for v in eye) for eye in eyes]
+            ctx.attentive.append(attentive)
+            ctx.eyes.append(eyes)
+
+
+class ClassifyStage(Stage):
+    """Crop every face from the full-resolution gray frame and run one batched predict"""
+
+    name = "classify"
+
+    def __init__(self, predict_fn, roi_size=48):
+        self.predict_fn = predict_fn
+        self.roi_size = roi_size
+
+    def process(self, ctx):
+        self.process_batch([ctx])
+
+    def process_batch(self, contexts):
+        total = sum(len(ctx.boxes) for ctx in contexts)
+        if total == 0:
+            return
+        started = time.perf_counter()
+        size = self.roi_size
+        rois = np.empty((total, size, size, 1), dtype=np.float32)
+        n = 0
+        for ctx in contexts:
+            for x, y, w, h in ctx.boxes:
+                rois[n, :, :, 0] = cv2.resize(ctx.gray[y:y + h, x:x + w], (size, size), interpolation=cv2.INTER_AREA)
+                n += 1
+        rois /= 255.0
+        preprocess = time.perf_counter() - started
+
+        started = time.perf_counter()
+        predictions = np.asarray(self.predict_fn(rois))
+        predict = time.perf_counter() - started
+        n = 0
+        for ctx in contexts:
+            ctx.probabilities = predictions[n:n + len(ctx.boxes)]
+            n += len(ctx.boxes)
+            # Batch cost split by each frame's share of the faces
+            share = len(ctx.boxes) / total
+            add_timing(ctx, "preprocess", preprocess * share)
+            add_timing(ctx, "predict", predict * share)
+
+
+class ScoreStage(Stage):
+    """Turn probabilities into FaceResults with engagement emotions and score"""
+
+    name = "score"
+
+    def __init__(self, config):
+        self.labels = config.labels
+        self.engagement_map = config.engagement_map
+        self.target_emotions = config.target_emotions
+
+    def process(self, ctx):
+        ctx.faces = []
+        for i, bbox in enumerate(ctx.boxes):
+            face = FaceResult(bbox=bbox, track_id=ctx.track_ids[i] if i < len(ctx.track_ids) else None)
+            if i < len(ctx.attentive):
+                face.attentive = ctx.attentive[i]
+                face.eyes = ctx.eyes[i]
+            if ctx.probabilities is not None:
+                probs = ctx.probabilities[i]
+                idx = int(np.argmax(probs))
+                face.probabilities = probs
+                face.label = self.labels[idx]
+                face.confidence = float(probs[idx])
+
+                mapped = {emotion: 0.0 for emotion in self.target_emotions}
+                for label, prob in zip(self.labels, probs):
+                    mapped[self.engagement_map[label]] += float(prob)
+                face.target_probabilities = mapped
+                face.target_emotion = max(mapped, key=mapped.get)
+
+                # Higher score for attentive faces and positive emotions
+                base_score = 0.5 if face.attentive else 0.2
+                face.engagement_score = min(1.0, base_score * EMOTION_MULTIPLIERS.get(face.target_emotion, 1.0))
+            ctx.faces.append(face)
+
+
+class RenderStage(Stage):
+    """Call ``draw_fn(frame, faces)`` and keep what it returns"""
+
+    name = "render"
+
+    def __init__(self, draw_fn):
+        self.draw_fn = draw_fn
+
+    def process(self, ctx):
+        ctx.rendered = self.draw_fn(ctx.frame, ctx.faces)
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+from utils.metrics import metrics
+
+eye_checks_run = metrics.counter(
+    "engagement_eye_checks_total", {"result": "run"}, help_text="Attentiveness checks by whether the eye cascade ran"
+)
+eye_checks_reused = metrics.counter(
+    "engagement_eye_checks_total", {"result": "reused"}, help_text="Attentiveness checks by whether the eye cascade ran"
+)
+
+
+class AttentivenessEstimator:
+    """Eye-cascade attentiveness check that is restricted, amortized and debounced.
+
+    The eye cascade only scans the upper part of the face box (where eyes
+    are), with minSize/maxSize derived from the face width. A tracked face
+    (any hashable ``track_id``) reuses its last eye check for
+    ``recheck_every`` frames, and its attentive state only flips after
+    ``on_checks`` consecutive checks with eyes or ``off_checks`` without.
+    Untracked faces (``track_id`` None) are checked every time, undebounced.
+    Given a cascade path, each thread loads its own CascadeClassifier, so one
+    estimator (and its per-track state) can be shared by request threads.
+    """
+
+    # Eye band as fractions of the face box height
+    EYE_BAND = (0.15, 0.6)
+
+    def __init__(self, eye_cascade, recheck_every=5, on_checks=2, off_checks=2,
+                 min_neighbors=3, max_tracks=1024, ttl=10.0):
+        self.eye_cascade = eye_cascade
+        self._local = threading.local()
+        self.recheck_every = max(1, int(recheck_every))
+        self.on_checks = max(1, int(on_checks))
+        self.off_checks = max(1, int(off_checks))
+        self.min_neighbors = min_neighbors
+        self.max_tracks = max_tracks
+        self.ttl = ttl
+        self._tracks = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def cascade(self):
+        if not isinstance(self.eye_cascade, str):
+            return self.eye_cascade
+        cascade = getattr(self._local, 'cascade', None)
+        if cascade is None:
+            cascade = cv2.CascadeClassifier(self.eye_cascade)
+            self._local.cascade = cascade
+        return cascade
+
+    def detect_eyes(self, gray, bbox):
+        """Eye boxes in ``gray`` coordinates for the face at (x, y, w, h)"""
+        x, y, w, h = (int(v) for v in bbox)
+        top, bottom = y + int(h * self.EYE_BAND[0]), y + int(h * self.EYE_BAND[1])
+        band = gray[max(0, top):max(0, bottom), max(0, x):max(0, x + w)]
+        if band.size == 0:
+            return []
+        min_side = max(6, int(w * 0.12))
+        max_side = max(min_side + 1, int(w * 0.45))
+        eyes = self.cascade.detectMultiScale(
+            band, scaleFactor=1.1, minNeighbors=self.min_neighbors,
+            minSize=(min_side, min_side), maxSize=(max_side, max_side)
+        )
+        return [(ex + max(0, x), ey + max(0, top), ew, eh) for (ex, ey, ew, eh) in eyes]
+
+    def update(self, track_id, gray, bbox):
+        """Return (attentive, eyes) for a face; ``eyes`` is None when the last check was reused"""
+        if track_id is None:
+            eye_checks_run.inc()
+            eyes = self.detect_eyes(gray, bbox)
+            return len(eyes) >= 1, eyes
+
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            state = self._tracks.get(track_id)
+            if state is not None and state["frames_since_check"] + 1 < self.recheck_every:
+                state["frames_since_check"] += 1
+                state["seen"] = now
+                self._tracks.move_to_end(track_id)
+                eye_checks_reused.inc()
+                return state["attentive"], None
+
+        eye_checks_run.inc()
+        eyes = self.detect_eyes(gray, bbox)
+        raw = len(eyes) >= 1
+
+        with self._lock:
+            state = self._tracks.get(track_id)
+            if state is None:
+                state = {"attentive": raw, "streak": 0}
+                self._tracks[track_id] = state
+            elif raw != state["attentive"]:
+                state["streak"] += 1
+                if state["streak"] >= (self.on_checks if raw else self.off_checks):
+                    state["attentive"] = raw
+                    state["streak"] = 0
+            else:
+                state["streak"] = 0
+            state["frames_since_check"] = 0
+            state["seen"] = now
+            self._tracks.move_to_end(track_id)
+            while len(self._tracks) > self.max_tracks:
+                self._tracks.popitem(last=False)
+            return state["attentive"], eyes
+
+    def forget(self, track_id):
+        with self._lock:
+            self._tracks.pop(track_id, None)
+
+    def _expire(self, now):
+        while self._tracks:
+            track_id, state = next(iter(self._tracks.items()))
+            if now - state["seen"] <= self.ttl:
+                break
+            del self._tracks[track_id]
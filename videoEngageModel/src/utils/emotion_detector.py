@@ -1,68 +1,128 @@
-import cv2
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.models import load_model
 import librosa
+import itertools
 import os
 
+from utils.video_processor import EMOTION_COLORS, DEFAULT_COLOR
+from utils.face_detection import DEFAULT_DETECTION_WIDTH
+from utils.model_registry import model_registry
+from utils.inference_backend import get_backend
+from utils.metrics import metrics
+from engine import AnalysisEngine, EngineConfig, DetectionConfig, TrackingConfig, AttentionConfig
+
+# The audio model's training setup: librosa.load at 22050 Hz, default MFCC window and hop
+AUDIO_SR = 22050
+AUDIO_N_FFT = 2048
+AUDIO_HOP = 512
+
 class EmotionDetector:
-    def __init__(self):
-        self.face_cascade = cv2.CascadeClassifier('haarcascades/haarcascade_frontalface_default.xml')
-        self.emotion_labels = ['Angry', 'Disgust', 'Fear', 'Happy', 'Neutral', 'Sad', 'Surprise']
+    AUDIO_MODEL = 'audio_emotion'
+    
+    def __init__(self, backend='keras', detection_width=DEFAULT_DETECTION_WIDTH):
+        self.backend = backend
+        # Display names in the model's class order (engine.MODEL_LABELS)
+        self.emotion_labels = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
         self.audio_labels = ['Angry', 'Disgust', 'Fear', 'Happy', 'Neutral', 'Sad', 'Surprise']
-        
-        # Load models
-        self.load_models()
+        # Faces are found on a downscaled copy; ROIs are cropped at full resolution
+        self.engine_config = EngineConfig(
+            detection=DetectionConfig(detection_width=detection_width, scale_factor=1.3, min_neighbors=5, min_size=24),
+            tracking=TrackingConfig(mode='none'),
+            attention=AttentionConfig(enabled=False)
+        )
+        self._engine = None
+    
+    # Models live in the process-wide registry and load on first use,
+    # so every session shares one copy and video-only sessions never load audio
+    @property
+    def emotion_model(self):
+        return get_backend(self.backend)
+    
+    @property
+    def audio_model(self):
+        return model_registry.get(self.AUDIO_MODEL)
+    
+    @property
+    def engine(self):
+        """Shared analysis engine (src/engine) built from engine_config"""
+        if self._engine is None:
+            self._engine = AnalysisEngine(self.engine_config, predict_fn=self._predict)
+        return self._engine
+    
+    def _predict(self, rois):
+        return self.emotion_model.predict(rois)
     
     def load_models(self):
-        try:
-            self.emotion_model = load_model('models/model_num.hdf5')
-            print("Video emotion model loaded successfully")
-        except Exception as e:
-            print(f"Error loading video emotion model: {e}")
-            self.emotion_model = None
+        """Load both models now instead of on first use"""
+        return self.emotion_model is not None, self.audio_model is not None
+    
+    def set_backend(self, backend):
+        """Switch the video model's inference backend (see utils.inference_backend)"""
+        self.backend = backend
+    
+    @property
+    def detection_width(self):
+        return self.engine_config.detection.detection_width
+    
+    def set_detection_width(self, detection_width):
+        """Width of the image the face cascade scans; 0 or None for native resolution"""
+        self.engine_config.detection.detection_width = detection_width
+    
+    def model_fingerprint(self):
+        """Identify the loaded video model, backend and label order for result caching"""
+        model = self.emotion_model
+        if model is None:
+            return None
+        stat = os.stat(model.path)
+        # The label order maps output indices to emotions, so changing it must invalidate cached results
+        labels = ",".join(self.emotion_labels)
+        return f"{model.name}:{model.path}:{stat.st_size}:{stat.st_mtime_ns}:{labels}"
+    
+    def start_tracking(self, detect_every=5):
+        """Track faces across consecutive frames so person_id stays stable.
         
-        try:
-            self.audio_model = load_model('models/audio_model7label_CNN.hdf5')
-            print("Audio emotion model loaded successfully")
-        except Exception as e:
-            print(f"Error loading audio emotion model: {e}")
-            self.audio_model = None
+        The cascade then runs only every ``detect_every`` frames or when a track
+        is lost; boxes are propagated by optical flow in between.
+        """
+        self.engine_config.tracking = TrackingConfig(mode='flow', detect_every=detect_every)
+        self._engine = None
+    
+    def stop_tracking(self):
+        self.engine_config.tracking = TrackingConfig(mode='none')
+        self._engine = None
     
     def detect_emotions(self, frame):
+        return self.detect_emotions_batch([frame])[0]
+    
+    def detect_emotions_batch(self, frames):
+        """Detect emotions for all faces in one or more frames with a single model call"""
         if self.emotion_model is None:
-            return []
+            return [[] for _ in frames]
         
-        emotions = []
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
-        
-        for i, (x, y, w, h) in enumerate(faces):
-            roi_gray = gray[y:y+h, x:x+w]
-            roi_gray = cv2.resize(roi_gray, (48, 48))
-            roi_gray = roi_gray.astype('float32') / 255.0
-            roi_gray = np.expand_dims(roi_gray, axis=0)
-            roi_gray = np.expand_dims(roi_gray, axis=-1)
-            
-            try:
-                predictions = self.emotion_model.predict(roi_gray, verbose=0)
-                emotion_idx = np.argmax(predictions[0])
-                confidence = np.max(predictions[0])
-                
-                emotion_data = {
-                    'person_id': i,
-                    'bbox': (x, y, w, h),
-                    'dominant_emotion': self.emotion_labels[emotion_idx],
-                    'confidence': float(confidence),
-                    'all_emotions': {
-                        label: float(prob) for label, prob in zip(self.emotion_labels, predictions[0])
-                    }
-                }
-                emotions.append(emotion_data)
-            except Exception as e:
-                print(f"Error predicting emotion: {e}")
+        try:
+            results = self.engine.analyze_batch(frames)
+        except Exception as e:
+            print(f"Error predicting emotion: {e}")
+            metrics.counter("engagement_errors_total", help_text="Requests that raised").inc()
+            return [[] for _ in frames]
         
-        return emotions
+        return [
+            [self._build_emotion_data(i if face.track_id is None else face.track_id, face)
+             for i, face in enumerate(result.faces)]
+            for result in results
+        ]
+    
+    def _build_emotion_data(self, person_id, face):
+        probs = face.probabilities
+        emotion_idx = np.argmax(probs)
+        return {
+            'person_id': person_id,
+            'bbox': face.bbox,
+            'dominant_emotion': self.emotion_labels[emotion_idx],
+            'confidence': face.confidence,
+            'all_emotions': {
+                label: float(prob) for label, prob in zip(self.emotion_labels, probs)
+            }
+        }
     
     def detect_audio_emotions(self, audio_path):
         if self.audio_model is None:
@@ -91,14 +151,114 @@ class EmotionDetector:
             print(f"Error in audio emotion detection: {e}")
             return None
     
+    def _audio_blocks(self, audio_path, block_seconds):
+        """Yield consecutive mono blocks of the recording resampled to AUDIO_SR
+        
+        Formats soundfile can read are streamed about ``block_seconds`` at a
+        time; others (e.g. m4a) are decoded whole through librosa.load.
+        """
+        try:
+            sr = librosa.get_samplerate(audio_path)
+            block_samples = max(1, int(block_seconds * sr))
+            blocks = librosa.stream(
+                audio_path,
+                block_length=1,
+                frame_length=block_samples,
+                hop_length=block_samples,
+                mono=True
+            )
+            first = next(blocks, None)
+        except Exception:
+            audio, _ = librosa.load(audio_path, sr=AUDIO_SR, mono=True)
+            yield audio
+            return
+        
+        if first is None:
+            return
+        for block in itertools.chain([first], blocks):
+            if sr != AUDIO_SR:
+                block = librosa.resample(block, orig_sr=sr, target_sr=AUDIO_SR)
+            yield block
+    
+    def detect_audio_emotions_timeline(self, audio_path, window_seconds=3.0, hop_seconds=1.5,
+                                       block_seconds=30.0):
+        """Classify a whole recording window by window in constant memory
+        
+        The file is streamed in blocks of about ``block_seconds``, resampled
+        to the 22050 Hz the audio model was trained at, and turned into MFCCs
+        with the training window and hop. Each sliding window's mean MFCC
+        vector goes through a single batched predict. Returns ``{"timeline":
+        [...], "overall": {...}}`` where each timeline entry holds the
+        window's ``start``/``end`` in seconds and one probability per label.
+        """
+        if self.audio_model is None:
+            return None
+        
+        try:
+            sr = AUDIO_SR
+            n_fft = AUDIO_N_FFT
+            hop_length = AUDIO_HOP
+            window_frames = max(1, int(round(window_seconds * sr / hop_length)))
+            hop_frames = max(1, int(round(hop_seconds * sr / hop_length)))
+            
+            # Samples not yet covered by a full MFCC frame, carried into the next block
+            carry = np.empty(0, dtype=np.float32)
+            # MFCC frames not yet covered by a full window, starting at frame `offset`
+            pending = np.empty((13, 0), dtype=np.float32)
+            offset = 0
+            next_start = 0
+            features = []
+            spans = []
+            for block in self._audio_blocks(audio_path, block_seconds):
+                samples = np.concatenate([carry, block.astype(np.float32)])
+                if len(samples) < n_fft:
+                    carry = samples
+                    continue
+                n_frames = 1 + (len(samples) - n_fft) // hop_length
+                mfccs = librosa.feature.mfcc(
+                    y=samples[:(n_frames - 1) * hop_length + n_fft], sr=sr, n_mfcc=13,
+                    n_fft=n_fft, hop_length=hop_length, center=False
+                )
+                carry = samples[n_frames * hop_length:]
+                pending = np.concatenate([pending, mfccs.astype(np.float32)], axis=1)
+                while next_start + window_frames <= offset + pending.shape[1]:
+                    i = next_start - offset
+                    features.append(pending[:, i:i + window_frames].mean(axis=1))
+                    spans.append((next_start, next_start + window_frames))
+                    next_start += hop_frames
+                consumed = min(next_start - offset, pending.shape[1])
+                if consumed > 0:
+                    pending = pending[:, consumed:]
+                    offset += consumed
+            
+            # Short recordings or a long tail still get a (partial) window
+            if pending.shape[1] and (not features or pending.shape[1] >= window_frames // 2):
+                features.append(pending.mean(axis=1))
+                spans.append((offset, offset + pending.shape[1]))
+            
+            if not features:
+                return None
+            
+            batch = np.stack(features)[..., np.newaxis]
+            predictions = self.audio_model.predict(batch, batch_size=256, verbose=0)
+            
+            timeline = []
+            for (start, end), probs in zip(spans, predictions):
+                entry = {
+                    'start': start * hop_length / sr,
+                    'end': end * hop_length / sr
+                }
+                entry.update({label: float(p) for label, p in zip(self.audio_labels, probs)})
+                timeline.append(entry)
+            
+            overall = {
+                label: float(p) for label, p in zip(self.audio_labels, predictions.mean(axis=0))
+            }
+            return {'timeline': timeline, 'overall': overall}
+            
+        except Exception as e:
+            print(f"Error in audio emotion detection: {e}")
+            return None
+    
     def get_emotion_color(self, emotion):
-        color_map = {
-            'Happy': (0, 255, 0),      # Green
-            'Sad': (255, 0, 0),        # Blue
-            'Angry': (0, 0, 255),      # Red
-            'Fear': (128, 0, 128),     # Purple
-            'Surprise': (255, 255, 0), # Cyan
-            'Disgust': (0, 128, 0),    # Dark Green
-            'Neutral': (128, 128, 128) # Gray
-        }
-        return color_map.get(emotion, (255, 255, 255))
\ No newline at end of file
+        return EMOTION_COLORS.get(emotion, DEFAULT_COLOR)
\ No newline at end of file
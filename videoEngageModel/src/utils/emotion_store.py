@@ -0,0 +1,193 @@
+import glob
+import os
+
+import numpy as np
+
+
+def record_dtype(n_labels):
+    """Fixed-width row layout for one face in one analyzed frame"""
+    return np.dtype([
+        ("timestamp", np.float64),
+        ("person_id", np.int32),
+        ("bbox", np.int32, (4,)),
+        ("label_code", np.int8),
+        ("confidence", np.float32),
+        ("probs", np.float32, (n_labels,)),
+        ("sample_weight", np.float32),
+        ("reason_code", np.int8)
+    ])
+
+
+class EmotionStore:
+    """Bounded columnar store for per-face emotion results.
+
+    Rows live in one preallocated NumPy structured array of ``capacity``
+    rows. When it is full the oldest ``chunk_rows`` rows are evicted in one
+    move (amortized O(1) per row), so the live rows always sit contiguously
+    at the front of the buffer and ``columns()`` can return views of them
+    instead of copies. Evicted chunks are written to ``spill_dir`` as
+    ``.npy`` files when it is set, keeping at most ``max_spill_chunks``
+    (None for all); otherwise they are dropped.
+
+    Labels are stored as codes into ``labels`` and sampling reasons as codes
+    into ``reasons``, matching the columns of utils.result_cache.AnalysisCache.
+    """
+
+    def __init__(self, labels, capacity=100000, chunk_rows=None, spill_dir=None, max_spill_chunks=None):
+        self.labels = list(labels)
+        self.reasons = [""]
+        self.dtype = record_dtype(len(self.labels))
+        self.capacity = capacity
+        self.chunk_rows = max(1, min(capacity, chunk_rows or capacity // 4 or 1))
+        self.spill_dir = spill_dir
+        self.max_spill_chunks = max_spill_chunks
+
+        self._label_index = {label: i for i, label in enumerate(self.labels)}
+        self._reason_index = {"": 0}
+        self._buffer = np.zeros(capacity, dtype=self.dtype)
+        self._size = 0
+        self._spill_seq = 0
+        # Rows no longer available in memory or on disk
+        self.dropped = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def rows(self):
+        """The live rows as a structured-array view (no copy)"""
+        return self._buffer[:self._size]
+
+    def clear(self):
+        self._size = 0
+        self.dropped = 0
+        for path in self.spilled_paths():
+            os.unlink(path)
+
+    def append(self, emotion_data, timestamp, sample_weight=0.0, sampling_reason=""):
+        """Store one face from EmotionDetector.detect_emotions"""
+        if self._size == self.capacity:
+            self._evict_chunk()
+        row = self._buffer[self._size]
+        row["timestamp"] = timestamp
+        row["person_id"] = emotion_data.get("person_id", 0)
+        row["bbox"] = emotion_data["bbox"]
+        row["label_code"] = self._label_index[emotion_data["dominant_emotion"]]
+        row["confidence"] = emotion_data["confidence"]
+        emotions = emotion_data["all_emotions"]
+        row["probs"] = [emotions[label] for label in self.labels]
+        row["sample_weight"] = sample_weight
+        row["reason_code"] = self._reason_code(sampling_reason)
+        self._size += 1
+
+    def extend(self, emotions, timestamp, sample_weight=0.0, sampling_reason=""):
+        for emotion_data in emotions:
+            self.append(emotion_data, timestamp, sample_weight, sampling_reason)
+
+    def _reason_code(self, reason):
+        code = self._reason_index.get(reason)
+        if code is None:
+            code = len(self.reasons)
+            self.reasons.append(reason)
+            self._reason_index[reason] = code
+        return code
+
+    def _evict_chunk(self):
+        n = self.chunk_rows
+        if self.spill_dir:
+            self._spill(self._buffer[:n])
+        else:
+            self.dropped += n
+        self._buffer[:self._size - n] = self._buffer[n:self._size]
+        self._size -= n
+
+    def _spill(self, rows):
+        path = os.path.join(self.spill_dir, f"chunk-{self._spill_seq:06d}.npy")
+        self._spill_seq += 1
+        try:
+            np.save(path, rows)
+        except Exception as e:
+            print(f"Error spilling emotion results to {path}: {e}")
+            self.dropped += len(rows)
+            return
+        if self.max_spill_chunks is not None:
+            for stale in self.spilled_paths()[:-self.max_spill_chunks or None]:
+                self.dropped += len(np.load(stale, mmap_mode="r"))
+                os.unlink(stale)
+
+    def spilled_paths(self):
+        if not self.spill_dir:
+            return []
+        return sorted(glob.glob(os.path.join(self.spill_dir, "chunk-*.npy")))
+
+    def columns(self, include_spilled=False):
+        """Columns in the AnalysisCache layout; views of the buffer unless spilled rows are included"""
+        rows = self.rows
+        if include_spilled:
+            spilled = [np.load(path) for path in self.spilled_paths()]
+            if spilled:
+                rows = np.concatenate(spilled + [rows])
+        columns = {name: rows[name] for name in self.dtype.names}
+        columns["labels"] = np.array(self.labels)
+        columns["reasons"] = np.array(self.reasons, dtype=str)
+        return columns
+
+    def extend_columns(self, columns):
+        """Append rows given as AnalysisCache columns"""
+        labels = [str(label) for label in columns["labels"]]
+        reasons = [str(reason) for reason in columns["reasons"]]
+        label_map = np.array([self._label_index[label] for label in labels], dtype=np.int8)
+        reason_map = np.array([self._reason_code(reason) for reason in reasons], dtype=np.int8)
+        # Reorder probability columns if the entry used a different label order
+        prob_order = [labels.index(label) for label in self.labels]
+
+        total = len(columns["timestamp"])
+        start = 0
+        while start < total:
+            if self._size == self.capacity:
+                self._evict_chunk()
+            n = min(total - start, self.capacity - self._size)
+            end = start + n
+            dest = self._buffer[self._size:self._size + n]
+            for name in ("timestamp", "person_id", "bbox", "confidence", "sample_weight"):
+                dest[name] = columns[name][start:end]
+            dest["label_code"] = label_map[columns["label_code"][start:end]]
+            dest["reason_code"] = reason_map[columns["reason_code"][start:end]]
+            dest["probs"] = columns["probs"][start:end][:, prob_order]
+            self._size += n
+            start = end
+
+    @classmethod
+    def from_columns(cls, columns, labels=None, **kwargs):
+        labels = labels if labels is not None else [str(label) for label in columns["labels"]]
+        kwargs.setdefault("capacity", max(1, len(columns["timestamp"])))
+        store = cls(labels, **kwargs)
+        store.extend_columns(columns)
+        return store
+
+    def frame(self, include_spilled=False):
+        """pandas DataFrame of the live rows.
+
+        One ``prob_<label>`` column per label. pandas consolidates columns of
+        the same dtype into blocks, so the frame holds a copy of the rows and
+        stays valid after later appends; build it once per render, not per
+        detection.
+        """
+        import pandas as pd
+
+        columns = self.columns(include_spilled)
+        data = {
+            "timestamp": columns["timestamp"],
+            "person_id": columns["person_id"],
+            "dominant_emotion": pd.Categorical.from_codes(columns["label_code"], self.labels),
+            "confidence": columns["confidence"],
+            "sample_weight": columns["sample_weight"],
+            "sampling_reason": pd.Categorical.from_codes(columns["reason_code"], self.reasons)
+        }
+        for i, name in enumerate("xywh"):
+            data[f"bbox_{name}"] = columns["bbox"][:, i]
+        for i, label in enumerate(self.labels):
+            data[f"prob_{label}"] = columns["probs"][:, i]
+        return pd.DataFrame(data)
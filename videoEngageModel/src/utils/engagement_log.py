@@ -0,0 +1,260 @@
+import datetime
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+
+class EngagementLog:
+    """Append-only JSON-lines log written in batches by a background thread.
+
+    Records go into a bounded in-memory queue and are flushed to the active
+    segment file ``<directory>/<name>/<name>-<start>-<pid>-<seq>.jsonl``. Segments
+    rotate when they exceed ``max_segment_bytes`` or ``max_segment_age`` seconds,
+    and each process writes its own segments so concurrent workers never
+    clobber each other.
+
+    fsync policies:
+        "batch"    - fsync after every flushed batch
+        "interval" - fsync at most every ``fsync_interval`` seconds
+        "never"    - leave durability to the OS
+    """
+
+    FSYNC_POLICIES = ("batch", "interval", "never")
+
+    def __init__(self, directory, name, max_queue=10000, batch_size=256, flush_interval=0.5,
+                 fsync="interval", fsync_interval=5.0, max_segment_bytes=64 * 1024 * 1024,
+                 max_segment_age=24 * 3600, enqueue_timeout=0.1):
+        if fsync not in self.FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+
+        self.name = name
+        self.segment_dir = os.path.join(directory, name)
+        self.legacy_path = os.path.join(directory, f"{name}.json")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.enqueue_timeout = enqueue_timeout
+
+        self.written = 0
+        self.dropped = 0
+        # I/O failures (write, fsync, open, rotate) survived by the writer thread
+        self.errors = 0
+
+        os.makedirs(self.segment_dir, exist_ok=True)
+        self.migrate_legacy()
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._segment_started = 0.0
+        self._segment_seq = 0
+        self._last_fsync = time.monotonic()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"engagement-log-{name}", daemon=True)
+        self._thread.start()
+
+    def append(self, record):
+        """Queue a record for writing; returns False if the queue stayed full"""
+        if self._closed:
+            return False
+        try:
+            self._queue.put(record, timeout=self.enqueue_timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def segments(self):
+        return sorted(glob.glob(os.path.join(self.segment_dir, f"{self.name}-*.jsonl")))
+
+    def read_all(self):
+        """Yield every record from all segments, oldest segment first"""
+        for path in self.segments():
+            with open(path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crash can leave a torn final line; skip it
+                        continue
+
+    def migrate_legacy(self):
+        """Move records from the legacy ``<name>.json`` array into a segment once.
+
+        The segment is written and fsynced before the legacy file is renamed
+        to ``.migrated``, so a crash or an unreadable legacy file never loses
+        records; an unparsable legacy file is left where it is.
+        """
+        if not os.path.exists(self.legacy_path):
+            return 0
+
+        try:
+            with open(self.legacy_path, "r") as f:
+                records = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reading legacy log {self.legacy_path}: {e}")
+            return 0
+        if not isinstance(records, list):
+            records = []
+
+        # Sorts before any regular segment so read_all keeps chronological order
+        segment_path = os.path.join(self.segment_dir, f"{self.name}-00000000T000000-legacy.jsonl")
+        tmp_path = segment_path + f".{os.getpid()}.tmp"
+        migrated = len(records)
+        try:
+            with open(tmp_path, "w") as f:
+                for record in records:
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            # Linking fails if the segment exists, so only one process publishes it
+            os.link(tmp_path, segment_path)
+        except FileExistsError:
+            # Another process (or a run that crashed before the rename) already migrated it
+            migrated = 0
+        except OSError as e:
+            print(f"Error migrating legacy log {self.legacy_path}: {e}")
+            return 0
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        try:
+            os.rename(self.legacy_path, self.legacy_path + ".migrated")
+        except OSError:
+            pass
+        return migrated
+
+    def close(self, timeout=None):
+        """Flush everything still queued and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._maybe_rotate()
+                self._maybe_fsync()
+                continue
+            if item is None:
+                break
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._write_batch(batch)
+
+        self._close_segment()
+
+    def _io_error(self, action, e):
+        """Count an I/O failure and drop the segment so the next batch opens a fresh one"""
+        print(f"Error {action} engagement log: {e}")
+        self.errors += 1
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _fsync(self):
+        try:
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            self._io_error("syncing", e)
+            return False
+        self._last_fsync = time.monotonic()
+        return True
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+        except OSError as e:
+            self._io_error("closing", e)
+
+    def _write_batch(self, batch):
+        self._maybe_rotate()
+        if self._file is None:
+            try:
+                self._open_segment()
+            except OSError as e:
+                self._io_error("opening", e)
+                self.dropped += len(batch)
+                return
+
+        lines = []
+        for record in batch:
+            try:
+                lines.append(json.dumps(record, separators=(",", ":"), default=str))
+            except (TypeError, ValueError) as e:
+                print(f"Error serializing log record: {e}")
+        if not lines:
+            return
+
+        try:
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+            self.written += len(lines)
+        except OSError as e:
+            self._io_error("writing to", e)
+            self.dropped += len(lines)
+            return
+
+        if self.fsync == "batch":
+            self._fsync()
+        else:
+            self._maybe_fsync()
+
+    def _maybe_fsync(self):
+        if self._file is None or self.fsync != "interval":
+            return
+        if time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self._fsync()
+
+    def _maybe_rotate(self):
+        if self._file is None:
+            return
+        too_big = self._file.tell() >= self.max_segment_bytes
+        too_old = time.monotonic() - self._segment_started >= self.max_segment_age
+        if too_big or too_old:
+            self._close_segment()
+
+    def _open_segment(self):
+        started = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+        self._segment_seq += 1
+        path = os.path.join(
+            self.segment_dir, f"{self.name}-{started}-{os.getpid()}-{self._segment_seq:04d}.jsonl"
+        )
+        self._file = open(path, "a")
+        self._segment_started = time.monotonic()
@@ -0,0 +1,88 @@
+import os
+
+import cv2
+import numpy as np
+
+# Width of the grayscale image the cascade scans; 0 or None scans at native resolution
+DEFAULT_DETECTION_WIDTH = 480
+
+
+def detection_settings_from_env(prefix='DETECTION', **defaults):
+    """Read FaceDetector keyword arguments from ``<prefix>_*`` environment variables.
+
+    DETECTION_WIDTH, DETECTION_SCALE_FACTOR, DETECTION_MIN_NEIGHBORS and
+    DETECTION_MIN_SIZE / DETECTION_MAX_SIZE (square side, in detection pixels).
+    ``defaults`` supply values for variables that are not set.
+    """
+    settings = dict(defaults)
+    readers = {
+        'detection_width': ('WIDTH', int),
+        'scale_factor': ('SCALE_FACTOR', float),
+        'min_neighbors': ('MIN_NEIGHBORS', int),
+        'min_size': ('MIN_SIZE', int),
+        'max_size': ('MAX_SIZE', int)
+    }
+    for key, (suffix, cast) in readers.items():
+        value = os.environ.get(f'{prefix}_{suffix}')
+        if value:
+            settings[key] = cast(value)
+    return settings
+
+
+class FaceDetector:
+    """Haar cascade face detection on a downscaled grayscale copy of the frame.
+
+    The cascade scans an image ``detection_width`` pixels wide (never
+    upscaled); returned boxes are in full-resolution coordinates, so emotion
+    ROIs can be cropped from the original frame. ``min_size`` and ``max_size``
+    are square sides in detection-resolution pixels, like the cascade sees them.
+    """
+
+    def __init__(self, cascade, detection_width=DEFAULT_DETECTION_WIDTH, scale_factor=1.1,
+                 min_neighbors=5, min_size=30, max_size=None):
+        self.cascade = cv2.CascadeClassifier(cascade) if isinstance(cascade, str) else cascade
+        self.detection_width = detection_width
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.max_size = max_size
+
+    def downscale(self, gray):
+        """Return (detection image, scale) where full-resolution = detection * scale"""
+        width = gray.shape[1]
+        if not self.detection_width or width <= self.detection_width:
+            return gray, 1.0
+        scale = width / float(self.detection_width)
+        height = max(1, int(round(gray.shape[0] / scale)))
+        return cv2.resize(gray, (self.detection_width, height), interpolation=cv2.INTER_AREA), scale
+
+    def detect(self, gray, window=None):
+        """Detect faces in a full-resolution grayscale frame"""
+        small, scale = self.downscale(gray)
+        return self.detect_scaled(small, scale, window)
+
+    def detect_scaled(self, small, scale, window=None):
+        """Detect on an image from ``downscale``; ``window`` is a full-resolution (x0, y0, x1, y1)"""
+        x0 = y0 = 0
+        image = small
+        if window is not None:
+            x0, y0 = int(window[0] / scale), int(window[1] / scale)
+            x1, y1 = int(np.ceil(window[2] / scale)), int(np.ceil(window[3] / scale))
+            image = small[y0:y1, x0:x1]
+
+        kwargs = {}
+        if self.max_size:
+            kwargs['maxSize'] = (self.max_size, self.max_size)
+        faces = self.cascade.detectMultiScale(
+            image, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=(self.min_size, self.min_size), flags=cv2.CASCADE_SCALE_IMAGE, **kwargs
+        )
+        if not len(faces):
+            return np.empty((0, 4), dtype=np.int32)
+
+        faces = np.asarray(faces, dtype=np.float64)
+        faces[:, 0] += x0
+        faces[:, 1] += y0
+        if scale != 1.0:
+            faces *= scale
+        return np.round(faces).astype(np.int32)
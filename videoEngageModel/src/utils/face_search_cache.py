@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def search_window(bbox, frame_shape, expand=0.5):
+    """Window around an (x, y, w, h) box grown by ``expand`` box sizes per side, clipped to the frame.
+
+    Returns (x0, y0, x1, y1).
+    """
+    x, y, w, h = bbox
+    height, width = frame_shape[:2]
+    dx, dy = int(w * expand), int(h * expand)
+    return max(0, x - dx), max(0, y - dy), min(width, x + w + dx), min(height, y + h + dy)
+
+
+class FaceSearchCache:
+    """Last known face box per user, so detection can search near it first.
+
+    Entries expire ``ttl`` seconds after their last update and the least
+    recently used user is evicted beyond ``max_users``. Hit/miss counts and an
+    estimate of cascade time saved (average full-frame scan time minus the
+    windowed scan time, per hit) are kept for reporting.
+    """
+
+    def __init__(self, ttl=2.0, max_users=1024, expand=0.5):
+        self.ttl = ttl
+        self.max_users = max_users
+        self.expand = expand
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.full_scan_seconds = None  # moving average of full-frame scans
+
+    def lookup(self, user_id, frame_shape):
+        """Return the search window for ``user_id``'s last face, or None"""
+        if user_id is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            bbox, updated, shape = entry
+            if now - updated > self.ttl or shape != frame_shape[:2]:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        return search_window(bbox, frame_shape, self.expand)
+
+    def update(self, user_id, bbox, frame_shape):
+        if user_id is None:
+            return
+        with self._lock:
+            self._entries[user_id] = (tuple(int(v) for v in bbox), time.monotonic(), frame_shape[:2])
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def forget(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def record_hit(self, seconds):
+        """Count a windowed search that found the face; returns the estimated time saved"""
+        saved = max(0.0, self.full_scan_seconds - seconds) if self.full_scan_seconds else 0.0
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += saved
+        return saved
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def record_full_scan(self, seconds):
+        with self._lock:
+            if self.full_scan_seconds is None:
+                self.full_scan_seconds = seconds
+            else:
+                self.full_scan_seconds += 0.1 * (seconds - self.full_scan_seconds)
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate(),
+                "saved_seconds": self.saved_seconds,
+                "full_scan_ms": (self.full_scan_seconds or 0.0) * 1000.0
+            }
@@ -0,0 +1,184 @@
+import cv2
+import numpy as np
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class TrackAssigner:
+    """Give detections persistent IDs by associating them with existing tracks.
+
+    Detections are matched greedily by IoU; boxes that barely overlap but whose
+    centers are within ``max_center_dist`` box sizes of a track still match, so
+    fast head movement between sparse samples does not create a new person.
+    Tracks unmatched for more than ``max_missed`` updates are dropped.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_center_dist=0.75, max_missed=10):
+        self.iou_threshold = iou_threshold
+        self.max_center_dist = max_center_dist
+        self.max_missed = max_missed
+        self.tracks = {}
+        self.next_id = 0
+
+    def reset(self):
+        self.tracks = {}
+        self.next_id = 0
+
+    def assign(self, bboxes):
+        """Return one track ID per bbox, creating tracks for new faces"""
+        bboxes = [tuple(int(v) for v in bbox) for bbox in bboxes]
+        candidates = []
+        for track_id, track in self.tracks.items():
+            for det_idx, bbox in enumerate(bboxes):
+                score = self._match_score(track["bbox"], bbox)
+                if score > 0:
+                    candidates.append((score, track_id, det_idx))
+        candidates.sort(reverse=True)
+
+        ids = [None] * len(bboxes)
+        matched_tracks = set()
+        for score, track_id, det_idx in candidates:
+            if track_id in matched_tracks or ids[det_idx] is not None:
+                continue
+            ids[det_idx] = track_id
+            matched_tracks.add(track_id)
+
+        for det_idx, bbox in enumerate(bboxes):
+            if ids[det_idx] is None:
+                ids[det_idx] = self.next_id
+                self.next_id += 1
+            self.tracks[ids[det_idx]] = {"bbox": bbox, "missed": 0}
+
+        for track_id in list(self.tracks):
+            if track_id not in ids:
+                self.tracks[track_id]["missed"] += 1
+                if self.tracks[track_id]["missed"] > self.max_missed:
+                    del self.tracks[track_id]
+
+        return ids
+
+    def move(self, track_id, bbox):
+        """Update a track's box from a propagated (non-detected) position"""
+        if track_id in self.tracks:
+            self.tracks[track_id]["bbox"] = bbox
+
+    def _match_score(self, track_box, det_box):
+        iou = box_iou(track_box, det_box)
+        if iou >= self.iou_threshold:
+            return iou
+
+        # Centroid fallback, always ranked below a real IoU match
+        tx, ty, tw, th = track_box
+        dx, dy, dw, dh = det_box
+        size = (tw + th + dw + dh) / 4.0
+        if size <= 0:
+            return 0.0
+        dist = np.hypot((tx + tw / 2) - (dx + dw / 2), (ty + th / 2) - (dy + dh / 2)) / size
+        if dist >= self.max_center_dist:
+            return 0.0
+        return self.iou_threshold * (1.0 - dist / self.max_center_dist) * 0.99
+
+
+class FaceTracker:
+    """Run the face detector every ``detect_every`` frames and track in between.
+
+    Between detections each face box is moved by the median sparse optical
+    flow (Lucas-Kanade) of corner features inside it. If too few features
+    survive for any track, the next frame falls back to full detection. Track
+    IDs come from a ``TrackAssigner`` and persist for the whole video.
+    """
+
+    LK_PARAMS = dict(
+        winSize=(15, 15),
+        maxLevel=2,
+        criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03)
+    )
+
+    def __init__(self, detect_fn, detect_every=5, iou_threshold=0.3, max_missed=10,
+                 max_features=20, min_features=4):
+        self.detect_fn = detect_fn
+        self.detect_every = max(1, int(detect_every))
+        self.max_features = max_features
+        self.min_features = min_features
+        self.assigner = TrackAssigner(iou_threshold=iou_threshold, max_missed=max_missed)
+
+        self.detections_run = 0
+        self.frames_tracked = 0
+        self.reset()
+
+    def reset(self):
+        self.assigner.reset()
+        self.active = []
+        self.points = {}
+        self.prev_gray = None
+        self.frames_since_detect = 0
+
+    def update(self, gray):
+        """Return [(track_id, (x, y, w, h)), ...] for this grayscale frame"""
+        boxes = None
+        if self.active and self.prev_gray is not None and self.frames_since_detect < self.detect_every:
+            boxes = self._propagate(gray)
+
+        if boxes is None:
+            boxes = self._detect(gray)
+        else:
+            self.frames_since_detect += 1
+            self.frames_tracked += 1
+
+        self.prev_gray = gray
+        return boxes
+
+    def _detect(self, gray):
+        faces = self.detect_fn(gray)
+        ids = self.assigner.assign(faces)
+        self.active = [(track_id, self.assigner.tracks[track_id]["bbox"]) for track_id in ids]
+        self.points = {track_id: self._features(gray, bbox) for track_id, bbox in self.active}
+        self.frames_since_detect = 1
+        self.detections_run += 1
+        return self.active
+
+    def _features(self, gray, bbox):
+        x, y, w, h = bbox
+        roi = gray[max(y, 0):y + h, max(x, 0):x + w]
+        if roi.size == 0:
+            return None
+        pts = cv2.goodFeaturesToTrack(roi, self.max_features, 0.01, 3)
+        if pts is None:
+            return None
+        pts[:, 0, 0] += max(x, 0)
+        pts[:, 0, 1] += max(y, 0)
+        return pts
+
+    def _propagate(self, gray):
+        frame_h, frame_w = gray.shape[:2]
+        moved = []
+        for track_id, (x, y, w, h) in self.active:
+            pts = self.points.get(track_id)
+            if pts is None or len(pts) < self.min_features:
+                return None
+            new_pts, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, pts, None, **self.LK_PARAMS)
+            if new_pts is None:
+                return None
+            good = status.reshape(-1) == 1
+            if good.sum() < self.min_features:
+                return None
+
+            shift = np.median(new_pts[good] - pts[good], axis=0).reshape(-1)
+            nx = int(round(min(max(x + shift[0], 0), frame_w - w)))
+            ny = int(round(min(max(y + shift[1], 0), frame_h - h)))
+            moved.append((track_id, (nx, ny, w, h)))
+            self.points[track_id] = new_pts[good].reshape(-1, 1, 2)
+
+        for track_id, bbox in moved:
+            self.assigner.move(track_id, bbox)
+        self.active = moved
+        return moved
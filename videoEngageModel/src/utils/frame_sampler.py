@@ -0,0 +1,128 @@
+import threading
+
+import cv2
+import numpy as np
+
+
+class AdaptiveFrameSampler:
+    """Decide which decoded frames get full face/emotion analysis.
+
+    Each frame is reduced to a tiny grayscale thumbnail and compared with the
+    thumbnail of the last analyzed frame, over the whole image and over the
+    face boxes last reported through ``update_faces``. A frame is analyzed when
+    the change score clears an adaptive threshold, never more often than
+    ``max_rate`` and never less often than ``min_rate`` analyses per second.
+    The threshold drifts so that the analysis rate over the last
+    ``rate_window`` seconds tracks ``target_rate``.
+
+    ``update_faces`` may be called from a different thread than ``decide``
+    (VideoPipeline reports faces from its consumer while the decoder thread
+    samples); the face state is guarded by a lock.
+    """
+
+    THUMB_SIZE = (64, 36)
+
+    def __init__(self, fps, target_rate=10, min_rate=None, max_rate=None,
+                 threshold=0.04, threshold_bounds=(0.005, 0.5), adapt_speed=0.05,
+                 rate_window=2.0):
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.target_rate = min(float(target_rate), self.fps)
+        self.min_rate = min_rate if min_rate is not None else max(0.5, self.target_rate / 4)
+        self.max_rate = min(max_rate if max_rate is not None else self.target_rate * 3, self.fps)
+
+        self.threshold = threshold
+        self.threshold_bounds = threshold_bounds
+        self.adapt_speed = adapt_speed
+        # Exponential moving average of analyses per second over ~rate_window seconds
+        self.rate_alpha = 1.0 / max(1.0, rate_window * self.fps)
+        self.recent_rate = self.target_rate
+
+        # Frame gaps between analyses implied by the rate bounds
+        self.min_gap = max(1, int(round(self.fps / self.max_rate)))
+        self.max_gap = max(self.min_gap, int(round(self.fps / self.min_rate)))
+
+        self.last_thumb = None
+        self.last_index = None
+        self.face_boxes = []
+        self.frame_shape = None
+        self._faces_lock = threading.Lock()
+        self.analyzed = 0
+        self.seen = 0
+
+    def update_faces(self, bboxes, frame_shape):
+        """Remember the latest face boxes so changes inside them weigh in"""
+        face_boxes = [tuple(int(v) for v in bbox) for bbox in bboxes]
+        with self._faces_lock:
+            self.face_boxes = face_boxes
+            self.frame_shape = frame_shape[:2]
+
+    def decide(self, frame_index, frame):
+        """Return the sampling decision for this frame as a dict"""
+        self.seen += 1
+        thumb = self._thumbnail(frame)
+
+        if self.last_thumb is None:
+            decision = self._accept(frame_index, thumb, 1.0, "first")
+        elif frame_index - self.last_index < self.min_gap:
+            decision = {"analyze": False, "reason": "min_interval", "change_score": None}
+        else:
+            score = self._change_score(thumb)
+            if frame_index - self.last_index >= self.max_gap:
+                decision = self._accept(frame_index, thumb, score, "max_interval")
+            elif score >= self.threshold:
+                decision = self._accept(frame_index, thumb, score, "change")
+            else:
+                decision = {"analyze": False, "reason": "static", "change_score": score}
+
+        self._adapt_threshold(decision["analyze"])
+        return decision
+
+    def analysis_rate(self):
+        """Observed analyses per second of video so far"""
+        if not self.seen:
+            return 0.0
+        return self.analyzed * self.fps / self.seen
+
+    def _accept(self, frame_index, thumb, score, reason):
+        gap = frame_index - self.last_index if self.last_index is not None else 1
+        self.last_thumb = thumb
+        self.last_index = frame_index
+        self.analyzed += 1
+        return {
+            "analyze": True,
+            "reason": reason,
+            "change_score": float(score),
+            # Seconds of video this sample stands for, for weighted analytics
+            "sample_weight": gap / self.fps
+        }
+
+    def _adapt_threshold(self, analyzed):
+        instant_rate = self.fps if analyzed else 0.0
+        self.recent_rate += self.rate_alpha * (instant_rate - self.recent_rate)
+        low, high = self.threshold_bounds
+        if self.recent_rate > self.target_rate:
+            self.threshold = min(high, self.threshold * (1 + self.adapt_speed))
+        elif self.recent_rate < self.target_rate:
+            self.threshold = max(low, self.threshold * (1 - self.adapt_speed))
+
+    def _thumbnail(self, frame):
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+    def _change_score(self, thumb):
+        diff = cv2.absdiff(thumb, self.last_thumb)
+        score = float(np.mean(diff)) / 255.0
+
+        with self._faces_lock:
+            face_boxes, frame_shape = self.face_boxes, self.frame_shape
+        if face_boxes and frame_shape is not None:
+            scale_x = self.THUMB_SIZE[0] / frame_shape[1]
+            scale_y = self.THUMB_SIZE[1] / frame_shape[0]
+            for (x, y, w, h) in face_boxes:
+                x0, y0 = int(x * scale_x), int(y * scale_y)
+                x1 = max(x0 + 1, int(np.ceil((x + w) * scale_x)))
+                y1 = max(y0 + 1, int(np.ceil((y + h) * scale_y)))
+                region = diff[y0:y1, x0:x1]
+                if region.size:
+                    score = max(score, float(np.mean(region)) / 255.0)
+        return score
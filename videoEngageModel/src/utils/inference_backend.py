@@ -0,0 +1,209 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from utils.model_registry import model_registry
+
+DEFAULT_KERAS_PATH = os.path.join('models', 'model_num.hdf5')
+
+# Backend names accepted by create_backend/get_backend
+BACKENDS = ['keras', 'tflite-float16', 'tflite-int8', 'onnx']
+
+
+def converted_model_path(keras_path, backend):
+    """Where the converted model for ``backend`` lives next to the Keras file"""
+    stem = os.path.splitext(keras_path)[0]
+    if backend.startswith('tflite-'):
+        return f"{stem}_{backend.split('-', 1)[1]}.tflite"
+    if backend == 'onnx':
+        return f"{stem}.onnx"
+    return keras_path
+
+
+class InferenceBackend:
+    """Common interface: ``predict`` maps a float32 (N, 48, 48, 1) batch to (N, 7) probabilities"""
+
+    name = None
+
+    def __init__(self, path):
+        self.path = path
+
+    def predict(self, batch):
+        raise NotImplementedError
+
+
+class KerasBackend(InferenceBackend):
+    name = 'keras'
+
+    def __init__(self, path, model):
+        super().__init__(path)
+        self.model = model
+
+    def predict(self, batch):
+        return self.model.predict(batch, batch_size=len(batch), verbose=0)
+
+
+class TFLiteBackend(InferenceBackend):
+    """TFLite interpreter; handles int8-quantized input and output tensors"""
+
+    def __init__(self, path, name='tflite', num_threads=None):
+        super().__init__(path)
+        self.name = name
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        self.interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self.input_detail['shape'][0])
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.interpreter.resize_tensor_input(self.input_detail['index'], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+
+            input_dtype = self.input_detail['dtype']
+            if input_dtype != np.float32:
+                scale, zero_point = self.input_detail['quantization']
+                info = np.iinfo(input_dtype)
+                batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(input_dtype)
+
+            self.interpreter.set_tensor(self.input_detail['index'], batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output_detail['index'])
+
+        if output.dtype != np.float32:
+            scale, zero_point = self.output_detail['quantization']
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+
+class OnnxBackend(InferenceBackend):
+    name = 'onnx'
+
+    def __init__(self, path, num_threads=None):
+        super().__init__(path)
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+def create_backend(backend, keras_path=DEFAULT_KERAS_PATH, num_threads=None):
+    """Build a new backend instance; converted models must already exist"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if backend == 'keras':
+        from tensorflow.keras.models import load_model
+        return KerasBackend(keras_path, load_model(keras_path, compile=False))
+
+    path = converted_model_path(keras_path, backend)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"{path} not found; create it with scripts/inference_backends.py convert"
+        )
+    if backend == 'onnx':
+        return OnnxBackend(path, num_threads=num_threads)
+    return TFLiteBackend(path, name=backend, num_threads=num_threads)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(backend='keras'):
+    """Process-wide backend for the default model, or None if it can't be loaded.
+
+    The Keras backend reuses the registry's shared model. Other backends fall
+    back to Keras (with a message) when their converted model is unavailable.
+    """
+    if backend == 'keras':
+        shared = model_registry.get('video_emotion')
+        if shared is None:
+            return None
+        if 'keras' not in _backends:
+            _backends['keras'] = KerasBackend(shared.path, shared)
+        return _backends['keras']
+
+    with _backends_lock:
+        if backend not in _backends:
+            try:
+                _backends[backend] = create_backend(backend)
+            except Exception as e:
+                print(f"Error loading {backend} backend, falling back to keras: {e}")
+                _backends[backend] = None
+    if _backends[backend] is None:
+        return get_backend('keras')
+    return _backends[backend]
+
+
+def load_roi_set(directory, limit=None):
+    """Load face crops from ``directory`` as a float32 (N, 48, 48, 1) batch in [0, 1]"""
+    names = sorted(
+        name for name in os.listdir(directory)
+        if name.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.pgm'))
+    )
+    if limit is not None:
+        names = names[:limit]
+
+    rois = np.empty((len(names), 48, 48, 1), dtype=np.float32)
+    count = 0
+    for name in names:
+        image = cv2.imread(os.path.join(directory, name), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            continue
+        rois[count, :, :, 0] = cv2.resize(image, (48, 48))
+        count += 1
+    rois = rois[:count]
+    rois /= 255.0
+    return rois
+
+
+def convert_to_tflite(keras_model, output_path, quantization='float16', calibration_rois=None):
+    """Convert with post-training quantization: 'float16', or 'int8' calibrated on ROIs"""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if calibration_rois is None or len(calibration_rois) == 0:
+            raise ValueError("int8 quantization needs a calibration ROI set")
+
+        def representative_dataset():
+            for roi in calibration_rois:
+                yield [roi[np.newaxis].astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    else:
+        raise ValueError(f"Unknown quantization: {quantization}")
+
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+    return output_path
+
+
+def convert_to_onnx(keras_model, output_path, opset=13):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None,) + tuple(keras_model.input_shape[1:]), tf.float32, name='input'),)
+    tf2onnx.convert.from_keras(keras_model, input_signature=spec, opset=opset, output_path=output_path)
+    return output_path
@@ -0,0 +1,121 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from utils.metrics import metrics
+
+
+class InferenceBatcher:
+    """Coalesce single-ROI predict calls from many threads into batched model calls.
+
+    The worker thread waits for the first queued ROI, then keeps collecting
+    until ``max_batch_size`` ROIs are queued or ``max_wait_ms`` has passed,
+    runs ``predict_fn`` once on the stacked batch and resolves each caller's
+    future with its own row of predictions.
+    """
+
+    BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+    QUEUE_WAIT_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 250]
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0, name="inference"):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self.batch_size_hist = metrics.histogram(
+            f"{metrics.prefix}_{name}_batch_size", buckets=self.BATCH_SIZE_BUCKETS,
+            help_text="ROIs per batched predict call"
+        )
+        self.queue_wait_hist = metrics.histogram(
+            f"{metrics.prefix}_{name}_queue_wait_ms", buckets=self.QUEUE_WAIT_BUCKETS_MS,
+            help_text="Time an ROI waited for its batch, in milliseconds"
+        )
+        metrics.gauge(f"{metrics.prefix}_{name}_queue_depth", fn=self.queue_depth,
+                      help_text="ROIs waiting for a batch")
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, roi):
+        """Queue one ROI and return a Future resolving to its prediction row"""
+        if self._closed:
+            raise RuntimeError("InferenceBatcher is closed")
+        future = Future()
+        self._queue.put((np.asarray(roi, dtype=np.float32), future, time.perf_counter()))
+        return future
+
+    def predict(self, roi, timeout=None):
+        """Blocking helper: submit one ROI and wait for its prediction"""
+        return self.submit(roi).result(timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self.queue_depth(),
+            "batch_size": self.batch_size_hist.snapshot(),
+            "queue_wait_ms": self.queue_wait_hist.snapshot()
+        }
+
+    def close(self, timeout=None):
+        """Stop accepting work, finish queued batches and join the worker"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            self.queue_wait_hist.observe((started - enqueued) * 1000.0)
+        self.batch_size_hist.observe(len(batch))
+
+        # Any failure (e.g. ROIs of mismatched shapes) must reach every caller,
+        # or they would wait forever and the worker thread would die
+        try:
+            inputs = np.empty((len(batch),) + batch[0][0].shape, dtype=np.float32)
+            for i, (roi, _, _) in enumerate(batch):
+                inputs[i] = roi
+            predictions = self.predict_fn(inputs)
+            if len(predictions) != len(batch):
+                raise ValueError(f"Model returned {len(predictions)} predictions for {len(batch)} inputs")
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for i, (_, future, _) in enumerate(batch):
+            future.set_result(predictions[i])
@@ -0,0 +1,169 @@
+import threading
+import time
+
+from utils.metrics import metrics
+
+live_frames_analyzed = metrics.counter(
+    "engagement_live_frames_total", {"outcome": "analyzed"}, help_text="Live camera frames by outcome"
+)
+live_frames_dropped = metrics.counter(
+    "engagement_live_frames_total", {"outcome": "dropped"}, help_text="Live camera frames by outcome"
+)
+live_latency = metrics.histogram(
+    "engagement_live_latency_seconds", help_text="Time from camera read to displayed result"
+)
+
+
+class LatestFrameCapture:
+    """Read a cv2.VideoCapture on a background thread, keeping only the newest frame.
+
+    The camera is drained as fast as it delivers, so frames never back up
+    in the driver while analysis is busy. A frame that is replaced before
+    anyone takes it counts as dropped.
+    """
+
+    def __init__(self, cap):
+        self.cap = cap
+        self.captured = 0
+        self.dropped = 0
+        self.failed = False
+        self._frame = None
+        self._captured_at = None
+        self._seq = 0
+        self._taken_seq = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="camera-capture", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join(timeout=2.0)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.is_set():
+            ret, frame = self.cap.read()
+            captured_at = time.monotonic()
+            with self._cond:
+                if not ret:
+                    self.failed = True
+                    self._cond.notify_all()
+                    return
+                if self._seq > self._taken_seq:
+                    self.dropped += 1
+                    live_frames_dropped.inc()
+                self._frame = frame
+                self._captured_at = captured_at
+                self._seq += 1
+                self.captured += 1
+                self._cond.notify_all()
+
+    def take(self, timeout=1.0):
+        """Wait for a frame newer than the last one taken; returns (frame, captured_at) or None"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._seq == self._taken_seq:
+                remaining = deadline - time.monotonic()
+                if self.failed or self._stop.is_set() or remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            self._taken_seq = self._seq
+            return self._frame, self._captured_at
+
+
+class LiveRateController:
+    """Pace live analysis at a target rate, backing off when frames take too long.
+
+    ``wait()`` sleeps until the next analysis slot; ``record()`` feeds the
+    time one frame took to analyze and display. When the moving average
+    exceeds the per-frame budget the rate drops to what the machine keeps
+    up with (never below ``min_rate``); when it falls well under budget the
+    rate creeps back towards ``target_rate``.
+    """
+
+    def __init__(self, target_rate, min_rate=1.0, smoothing=0.2, recover=1.1):
+        self.target_rate = float(target_rate)
+        self.min_rate = min(float(min_rate), self.target_rate)
+        self.rate = self.target_rate
+        self.smoothing = smoothing
+        self.recover = recover
+        self.avg_frame_seconds = None
+        self._next_slot = None
+
+    @property
+    def budget(self):
+        return 1.0 / self.rate
+
+    def wait(self):
+        now = time.monotonic()
+        if self._next_slot is not None and now < self._next_slot:
+            time.sleep(self._next_slot - now)
+            now = self._next_slot
+        self._next_slot = now + self.budget
+
+    def record(self, frame_seconds):
+        if self.avg_frame_seconds is None:
+            self.avg_frame_seconds = frame_seconds
+        else:
+            self.avg_frame_seconds += self.smoothing * (frame_seconds - self.avg_frame_seconds)
+
+        if self.avg_frame_seconds > self.budget:
+            self.rate = max(self.min_rate, 1.0 / self.avg_frame_seconds)
+        elif self.avg_frame_seconds < 0.7 * self.budget and self.rate < self.target_rate:
+            self.rate = min(self.target_rate, self.rate * self.recover)
+
+
+class LiveFrameScheduler:
+    """Iterate over the newest camera frames at an adaptive rate.
+
+    Each iteration yields ``(frame, captured_at)``; the caller analyzes and
+    displays the frame before asking for the next one. The time that took
+    goes to the LiveRateController, and the capture-to-result latency is
+    recorded. Frames that arrive mid-analysis are dropped by the capture
+    thread. Iteration ends when the camera stops delivering frames.
+    """
+
+    def __init__(self, cap, target_rate, min_rate=1.0, timeout=1.0):
+        self.capture = LatestFrameCapture(cap)
+        self.controller = LiveRateController(target_rate, min_rate=min_rate)
+        self.timeout = timeout
+        self.analyzed = 0
+        self.last_latency = None
+        metrics.gauge("engagement_live_rate", fn=lambda: self.controller.rate,
+                      help_text="Current live analysis rate (frames/s)")
+
+    @property
+    def rate(self):
+        return self.controller.rate
+
+    @property
+    def dropped(self):
+        return self.capture.dropped
+
+    def __iter__(self):
+        with self.capture:
+            while True:
+                self.controller.wait()
+                taken = self.capture.take(self.timeout)
+                if taken is None:
+                    return
+                frame, captured_at = taken
+                started = time.monotonic()
+                yield frame, captured_at
+                finished = time.monotonic()
+                self.analyzed += 1
+                self.last_latency = finished - captured_at
+                live_frames_analyzed.inc()
+                live_latency.observe(self.last_latency)
+                self.controller.record(finished - started)
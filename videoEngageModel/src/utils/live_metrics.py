@@ -0,0 +1,159 @@
+import math
+from collections import deque
+
+import numpy as np
+
+
+class LiveEmotionMetrics:
+    """Running emotion statistics updated once per detection in O(1).
+
+    Keeps per-emotion and per-track counts, the most common emotion,
+    detection rates over the last ``window`` seconds and the mean and
+    variance of confidence (Welford's method), so the metrics panel never
+    has to rescan the session's results. ``snapshot()`` returns plain
+    Python data that ``restore()`` turns back into an aggregator.
+    """
+
+    def __init__(self, labels, window=10.0):
+        self.labels = list(labels)
+        self.window = window
+        self._label_index = {label: i for i, label in enumerate(self.labels)}
+        self.reset()
+
+    def reset(self):
+        self.total = 0
+        self.label_counts = [0] * len(self.labels)
+        self.track_counts = {}
+        self.mode_code = None
+        self.confidence_mean = 0.0
+        self._confidence_m2 = 0.0
+        self.last_timestamp = None
+        # (timestamp, label code) of detections inside the rolling window
+        self._recent = deque()
+        self._recent_counts = [0] * len(self.labels)
+
+    def add(self, emotion_data, timestamp):
+        """Count one face from EmotionDetector.detect_emotions"""
+        self._add(
+            self._label_index[emotion_data["dominant_emotion"]],
+            emotion_data.get("person_id", 0),
+            emotion_data["confidence"],
+            timestamp
+        )
+
+    def extend(self, emotions, timestamp):
+        for emotion_data in emotions:
+            self.add(emotion_data, timestamp)
+
+    def _add(self, code, track_id, confidence, timestamp):
+        self.total += 1
+        self.label_counts[code] += 1
+        # Counts only grow, so the mode can only change to the label just counted
+        if self.mode_code is None or self.label_counts[code] > self.label_counts[self.mode_code]:
+            self.mode_code = code
+        self.track_counts[track_id] = self.track_counts.get(track_id, 0) + 1
+
+        delta = confidence - self.confidence_mean
+        self.confidence_mean += delta / self.total
+        self._confidence_m2 += delta * (confidence - self.confidence_mean)
+
+        self._recent.append((timestamp, code))
+        self._recent_counts[code] += 1
+        self.last_timestamp = timestamp if self.last_timestamp is None else max(self.last_timestamp, timestamp)
+        self._expire(self.last_timestamp)
+
+    def _expire(self, now):
+        recent = self._recent
+        while recent and recent[0][0] <= now - self.window:
+            _, code = recent.popleft()
+            self._recent_counts[code] -= 1
+
+    def add_columns(self, columns):
+        """Count rows given as EmotionStore / AnalysisCache columns in one pass"""
+        n = len(columns["timestamp"])
+        if n == 0:
+            return
+        labels = [str(label) for label in columns["labels"]]
+        codes = np.array([self._label_index[label] for label in labels])[columns["label_code"]]
+
+        for code, count in enumerate(np.bincount(codes, minlength=len(self.labels))):
+            self.label_counts[code] += int(count)
+        # Like _add, the current mode only changes when another label overtakes it
+        best = max(self.label_counts)
+        if self.mode_code is None or self.label_counts[self.mode_code] < best:
+            self.mode_code = self.label_counts.index(best)
+        track_ids, track_counts = np.unique(columns["person_id"], return_counts=True)
+        for track_id, count in zip(track_ids.tolist(), track_counts.tolist()):
+            self.track_counts[track_id] = self.track_counts.get(track_id, 0) + count
+
+        # Chan et al. parallel combination of mean and M2
+        confidence = np.asarray(columns["confidence"], dtype=np.float64)
+        batch_mean = float(confidence.mean())
+        batch_m2 = float(((confidence - batch_mean) ** 2).sum())
+        total = self.total + n
+        delta = batch_mean - self.confidence_mean
+        self._confidence_m2 += batch_m2 + delta * delta * self.total * n / total
+        self.confidence_mean += delta * n / total
+        self.total = total
+
+        timestamps = columns["timestamp"]
+        latest = float(timestamps.max())
+        self.last_timestamp = latest if self.last_timestamp is None else max(self.last_timestamp, latest)
+        for i in np.flatnonzero(timestamps > self.last_timestamp - self.window):
+            self._recent.append((float(timestamps[i]), int(codes[i])))
+            self._recent_counts[int(codes[i])] += 1
+        self._expire(self.last_timestamp)
+
+    @property
+    def mode(self):
+        """Most common emotion so far, or None"""
+        return self.labels[self.mode_code] if self.mode_code is not None else None
+
+    @property
+    def unique_tracks(self):
+        return len(self.track_counts)
+
+    @property
+    def confidence_variance(self):
+        return self._confidence_m2 / self.total if self.total else 0.0
+
+    @property
+    def confidence_std(self):
+        return math.sqrt(self.confidence_variance)
+
+    def rates(self, now=None):
+        """Detections per second over the window, in total and per emotion"""
+        if now is not None:
+            self._expire(now)
+        per_emotion = {label: count / self.window for label, count in zip(self.labels, self._recent_counts)}
+        return len(self._recent) / self.window, per_emotion
+
+    def snapshot(self):
+        """JSON-serializable state, e.g. to store alongside a cached analysis"""
+        return {
+            "labels": list(self.labels),
+            "window": self.window,
+            "total": self.total,
+            "label_counts": list(self.label_counts),
+            "track_counts": [[int(track_id), count] for track_id, count in self.track_counts.items()],
+            "mode_code": self.mode_code,
+            "confidence_mean": float(self.confidence_mean),
+            "confidence_m2": float(self._confidence_m2),
+            "last_timestamp": float(self.last_timestamp) if self.last_timestamp is not None else None,
+            "recent": [[float(timestamp), code] for timestamp, code in self._recent]
+        }
+
+    @classmethod
+    def restore(cls, snapshot):
+        metrics = cls(snapshot["labels"], window=snapshot["window"])
+        metrics.total = snapshot["total"]
+        metrics.label_counts = list(snapshot["label_counts"])
+        metrics.track_counts = {track_id: count for track_id, count in snapshot["track_counts"]}
+        metrics.mode_code = snapshot["mode_code"]
+        metrics.confidence_mean = snapshot["confidence_mean"]
+        metrics._confidence_m2 = snapshot["confidence_m2"]
+        metrics.last_timestamp = snapshot["last_timestamp"]
+        for timestamp, code in snapshot["recent"]:
+            metrics._recent.append((timestamp, code))
+            metrics._recent_counts[code] += 1
+        return metrics
@@ -0,0 +1,249 @@
+import collections
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# Default latency buckets in seconds (0.1 ms .. 5 s)
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """A settable value, or a callback evaluated at scrape time"""
+
+    def __init__(self, fn=None):
+        self.fn = fn
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        if self.fn is not None:
+            try:
+                return float(self.fn())
+            except Exception:
+                return float("nan")
+        return self.value
+
+
+class Histogram:
+    """Fixed-bucket histogram that also keeps a window of recent samples for quantiles"""
+
+    def __init__(self, buckets, window=2048):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.recent = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            idx = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    idx = i
+                    break
+            self.counts[idx] += 1
+            self.count += 1
+            self.total += value
+            self.recent.append(value)
+
+    def quantiles(self, qs=(0.5, 0.95, 0.99)):
+        with self._lock:
+            recent = np.fromiter(self.recent, dtype=np.float64, count=len(self.recent))
+        if not len(recent):
+            return {q: 0.0 for q in qs}
+        return dict(zip(qs, np.quantile(recent, qs).tolist()))
+
+    def snapshot(self):
+        with self._lock:
+            labels = [str(b) for b in self.buckets] + ["+Inf"]
+            snapshot = {
+                "buckets": dict(zip(labels, self.counts)),
+                "count": self.count,
+                "sum": self.total,
+                "mean": self.total / self.count if self.count else 0.0
+            }
+        snapshot.update({f"p{int(q * 100)}": v for q, v in self.quantiles().items()})
+        return snapshot
+
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and histograms with Prometheus text output.
+
+    Metrics are identified by name plus an optional label dict and created on
+    first use, so hot paths can call ``metrics.counter("x").inc()`` directly.
+    ``span(stage)`` times a block into the ``<prefix>_stage_seconds`` histogram.
+    """
+
+    def __init__(self, prefix="engagement"):
+        self.prefix = prefix
+        self.enabled = os.environ.get("METRICS_DISABLED", "") != "1"
+        self._metrics = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, labels, factory, help_text):
+        key = (name, tuple(sorted((labels or {}).items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = factory()
+                    self._metrics[key] = metric
+                    self._help.setdefault(name, (kind, help_text))
+        return metric
+
+    def counter(self, name, labels=None, help_text=""):
+        return self._get("counter", name, labels, Counter, help_text)
+
+    def gauge(self, name, labels=None, fn=None, help_text=""):
+        gauge = self._get("gauge", name, labels, lambda: Gauge(fn), help_text)
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name, labels=None, buckets=LATENCY_BUCKETS, help_text=""):
+        return self._get("histogram", name, labels, lambda: Histogram(buckets), help_text)
+
+    @contextmanager
+    def span(self, stage):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(f"{self.prefix}_stage_seconds", {"stage": stage},
+                           help_text="Hot-path stage latency").observe(time.perf_counter() - started)
+
+    def stage_quantiles(self):
+        """{stage: {p50, p95, p99}} in milliseconds, for quick inspection"""
+        result = {}
+        for (name, labels), metric in list(self._metrics.items()):
+            if name == f"{self.prefix}_stage_seconds":
+                stage = dict(labels).get("stage")
+                result[stage] = {f"p{int(q * 100)}_ms": v * 1000.0 for q, v in metric.quantiles().items()}
+        return result
+
+    def render_prometheus(self):
+        by_name = collections.defaultdict(list)
+        for (name, labels), metric in list(self._metrics.items()):
+            by_name[name].append((labels, metric))
+
+        lines = []
+        for name in sorted(by_name):
+            kind, help_text = self._help.get(name, ("untyped", ""))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in by_name[name]:
+                if kind == "histogram":
+                    lines.extend(self._render_histogram(name, labels, metric))
+                elif kind == "gauge":
+                    lines.append(f"{name}{_format_labels(labels)} {metric.get()}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+
+            if kind == "histogram":
+                lines.append(f"# TYPE {name}_quantile summary")
+                for labels, metric in by_name[name]:
+                    for q, v in metric.quantiles().items():
+                        lines.append(f"{name}_quantile{_format_labels(labels + (('quantile', q),))} {v}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histogram(name, labels, histogram):
+        with histogram._lock:
+            counts = list(histogram.counts)
+            total, count = histogram.total, histogram.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(histogram.buckets + ["+Inf"], counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class SamplingProfiler:
+    """Opt-in statistical profiler producing collapsed stacks for flame graphs.
+
+    A background thread samples every other thread's Python stack every
+    ``interval`` seconds via ``sys._current_frames`` and counts identical
+    stacks. ``collapsed()`` returns the "frame;frame;frame count" lines that
+    flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self.stacks.clear()
+        self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.collapsed()
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+
+def _resident_bytes():
+    """Current resident set size of this process, or 0 if unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return 0
+
+
+class SharedModel:
+    """A loaded Keras model shared read-only by every session in the process.
+
+    ``predict`` holds a per-model lock because Keras models are not safe to
+    call concurrently from several threads.
+    """
+
+    def __init__(self, name, path, model, load_seconds, memory_bytes, warmup_seconds):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.load_seconds = load_seconds
+        self.memory_bytes = memory_bytes
+        self.warmup_seconds = warmup_seconds
+        self.input_shape = model.input_shape
+        self._lock = threading.Lock()
+
+    def predict(self, inputs, **kwargs):
+        with self._lock:
+            return self.model.predict(inputs, **kwargs)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "resident_bytes": self.memory_bytes,
+            "param_bytes": int(self.model.count_params()) * 4
+        }
+
+
+class ModelRegistry:
+    """Process-wide registry that loads each model once, on first use.
+
+    Models are registered by name with their file path. ``get`` loads the
+    model the first time it is requested, runs a warm-up inference on a
+    zero input and measures load time and the growth in resident memory.
+    A failed load or warm-up is remembered so callers don't retry it on
+    every frame.
+    """
+
+    def __init__(self):
+        self._paths = {}
+        self._models = {}
+        self._errors = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, path):
+        with self._lock:
+            self._paths[name] = path
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        """Return the SharedModel for ``name``, loading it if needed, or None on failure"""
+        model = self._models.get(name)
+        if model is not None or name in self._errors:
+            return model
+
+        with self._lock:
+            if name not in self._paths:
+                raise KeyError(f"Unknown model: {name}")
+            name_lock = self._locks[name]
+
+        with name_lock:
+            if name not in self._models and name not in self._errors:
+                self._load(name)
+        return self._models.get(name)
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def error(self, name):
+        return self._errors.get(name)
+
+    def stats(self):
+        stats = {}
+        for name, path in self._paths.items():
+            if name in self._models:
+                stats[name] = dict(self._models[name].stats(), status="loaded")
+            elif name in self._errors:
+                stats[name] = {"path": path, "status": "error", "error": self._errors[name]}
+            else:
+                stats[name] = {"path": path, "status": "not loaded"}
+        return stats
+
+    def _load(self, name):
+        from tensorflow.keras.models import load_model
+
+        path = self._paths[name]
+        rss_before = _resident_bytes()
+        started = time.perf_counter()
+        try:
+            model = load_model(path, compile=False)
+        except Exception as e:
+            print(f"Error loading model '{name}' from {path}: {e}")
+            self._errors[name] = str(e)
+            return
+        load_seconds = time.perf_counter() - started
+
+        # Warm-up so the first real request doesn't pay for graph tracing
+        started = time.perf_counter()
+        try:
+            input_shape = tuple(1 if dim is None else dim for dim in model.input_shape)
+            model.predict(np.zeros(input_shape, dtype=np.float32), verbose=0)
+        except Exception as e:
+            print(f"Error warming up model '{name}' from {path}: {e}")
+            self._errors[name] = f"warm-up failed: {e}"
+            return
+        warmup_seconds = time.perf_counter() - started
+
+        memory_bytes = max(0, _resident_bytes() - rss_before)
+        self._models[name] = SharedModel(name, path, model, load_seconds, memory_bytes, warmup_seconds)
+        print(f"Model '{name}' loaded in {load_seconds:.2f}s "
+              f"(warm-up {warmup_seconds:.2f}s, +{memory_bytes / 1e6:.1f} MB resident)")
+
+
+model_registry = ModelRegistry()
+model_registry.register("video_emotion", os.path.join("models", "model_num.hdf5"))
+model_registry.register("audio_emotion", os.path.join("models", "audio_model7label_CNN.hdf5"))
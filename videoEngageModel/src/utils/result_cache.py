@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def file_content_hash(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's bytes, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """Size-bounded on-disk cache of per-frame video analysis results.
+
+    Entries are keyed by the video's content hash, the model fingerprint and
+    the analysis parameters, so display-only option changes still hit. Each
+    entry is one compressed ``.npz`` of fixed-width columns (timestamp,
+    person_id, bbox, label code, confidence, probability matrix, sampling
+    info), plus any extra arrays the caller adds, such as a JSON
+    ``metrics_snapshot``. Loading an entry touches its mtime, and the least
+    recently used entries are evicted once the cache exceeds ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._hashes = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, video_path, model_fingerprint, params):
+        stat = os.stat(video_path)
+        stat_key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+        content_hash = self._hashes.get(stat_key)
+        if content_hash is None:
+            content_hash = file_content_hash(video_path)
+            self._hashes[stat_key] = content_hash
+
+        digest = hashlib.sha256()
+        digest.update(content_hash.encode())
+        digest.update(str(model_fingerprint).encode())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def load(self, key):
+        """Return the cached records for ``key`` as a list of dicts, or None"""
+        columns = self.load_columns(key)
+        return self._from_columns(columns) if columns is not None else None
+
+    def load_columns(self, key):
+        """Return the cached entry for ``key`` as a dict of arrays, or None"""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                columns = {name: data[name] for name in data.files}
+        except Exception as e:
+            print(f"Error reading analysis cache entry {path}: {e}")
+            return None
+        os.utime(path)
+        return columns
+
+    def store(self, key, records, labels):
+        """Write records as a columnar entry, then evict down to the size bound"""
+        return self.store_columns(key, self._to_columns(records, labels))
+
+    def store_columns(self, key, columns):
+        """Write an entry already in column form (e.g. EmotionStore.columns())"""
+        path = self._path(key)
+        tmp_path = path + f".{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(f, **columns)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error writing analysis cache entry {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return False
+        self.evict()
+        return True
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npz"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    @staticmethod
+    def _to_columns(records, labels):
+        n = len(records)
+        reasons = sorted({r.get("sampling_reason", "") for r in records})
+        label_index = {label: i for i, label in enumerate(labels)}
+        reason_index = {reason: i for i, reason in enumerate(reasons)}
+
+        columns = {
+            "labels": np.array(labels),
+            "reasons": np.array(reasons, dtype=str),
+            "timestamp": np.empty(n, dtype=np.float64),
+            "person_id": np.empty(n, dtype=np.int32),
+            "bbox": np.empty((n, 4), dtype=np.int32),
+            "label_code": np.empty(n, dtype=np.int8),
+            "confidence": np.empty(n, dtype=np.float32),
+            "probs": np.empty((n, len(labels)), dtype=np.float32),
+            "sample_weight": np.empty(n, dtype=np.float32),
+            "reason_code": np.empty(n, dtype=np.int8)
+        }
+        for i, r in enumerate(records):
+            columns["timestamp"][i] = r["timestamp"]
+            columns["person_id"][i] = r["person_id"]
+            columns["bbox"][i] = r["bbox"]
+            columns["label_code"][i] = label_index[r["dominant_emotion"]]
+            columns["confidence"][i] = r["confidence"]
+            columns["probs"][i] = [r["all_emotions"][label] for label in labels]
+            columns["sample_weight"][i] = r.get("sample_weight", 0.0)
+            columns["reason_code"][i] = reason_index[r.get("sampling_reason", "")]
+        return columns
+
+    @staticmethod
+    def _from_columns(data):
+        labels = [str(label) for label in data["labels"]]
+        reasons = [str(reason) for reason in data["reasons"]]
+        records = []
+        for i in range(len(data["timestamp"])):
+            probs = data["probs"][i]
+            records.append({
+                "person_id": int(data["person_id"][i]),
+                "bbox": tuple(int(v) for v in data["bbox"][i]),
+                "dominant_emotion": labels[data["label_code"][i]],
+                "confidence": float(data["confidence"][i]),
+                "all_emotions": {label: float(p) for label, p in zip(labels, probs)},
+                "timestamp": float(data["timestamp"][i]),
+                "sample_weight": float(data["sample_weight"][i]),
+                "sampling_reason": reasons[data["reason_code"][i]]
+            })
+        return records
@@ -0,0 +1,134 @@
+import numpy as np
+
+# Bucket widths in seconds, finest first
+DEFAULT_RESOLUTIONS = (1, 10, 60)
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling; returns indices of kept points.
+
+    Keeps the first and last point and, from each of ``n_out - 2`` equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the mean of the next bucket, which preserves
+    peaks and troughs that plain striding would drop.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        if next_end <= end:
+            next_x, next_y = x[-1], y[-1]
+        else:
+            next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        kept[i + 1] = previous
+    return kept
+
+
+class EmotionRollup:
+    """Per-bucket emotion counts and probability sums at several time resolutions.
+
+    Every detection is added to one bucket per resolution as it arrives, so
+    charts read precomputed rows instead of grouping the raw results.
+    Buckets are indexed by ``floor(timestamp / resolution)`` from zero and
+    the arrays grow by doubling.
+    """
+
+    def __init__(self, labels, resolutions=DEFAULT_RESOLUTIONS):
+        self.labels = list(labels)
+        self.resolutions = tuple(sorted(resolutions))
+        self._label_index = {label: i for i, label in enumerate(self.labels)}
+        self.reset()
+
+    def reset(self):
+        n_labels = len(self.labels)
+        self._counts = {res: np.zeros((16, n_labels), dtype=np.int64) for res in self.resolutions}
+        self._prob_sums = {res: np.zeros((16, n_labels), dtype=np.float64) for res in self.resolutions}
+        self._n_buckets = {res: 0 for res in self.resolutions}
+        self.start = None
+        self.end = None
+
+    def _ensure(self, res, n_buckets):
+        counts = self._counts[res]
+        if n_buckets > len(counts):
+            size = len(counts)
+            while size < n_buckets:
+                size *= 2
+            grown = np.zeros((size, counts.shape[1]), dtype=counts.dtype)
+            grown[:len(counts)] = counts
+            self._counts[res] = grown
+            sums = np.zeros((size, counts.shape[1]), dtype=np.float64)
+            sums[:len(counts)] = self._prob_sums[res]
+            self._prob_sums[res] = sums
+        self._n_buckets[res] = max(self._n_buckets[res], n_buckets)
+
+    def _extend_range(self, first, last):
+        self.start = first if self.start is None else min(self.start, first)
+        self.end = last if self.end is None else max(self.end, last)
+
+    def add(self, emotion_data, timestamp):
+        """Add one face from EmotionDetector.detect_emotions"""
+        timestamp = max(0.0, float(timestamp))
+        code = self._label_index[emotion_data["dominant_emotion"]]
+        emotions = emotion_data["all_emotions"]
+        probs = [emotions[label] for label in self.labels]
+        for res in self.resolutions:
+            bucket = int(timestamp // res)
+            self._ensure(res, bucket + 1)
+            self._counts[res][bucket, code] += 1
+            self._prob_sums[res][bucket] += probs
+        self._extend_range(timestamp, timestamp)
+
+    def extend(self, emotions, timestamp):
+        for emotion_data in emotions:
+            self.add(emotion_data, timestamp)
+
+    def add_columns(self, columns):
+        """Add rows given as EmotionStore / AnalysisCache columns in one pass"""
+        if len(columns["timestamp"]) == 0:
+            return
+        labels = [str(label) for label in columns["labels"]]
+        codes = np.array([self._label_index[label] for label in labels])[columns["label_code"]]
+        probs = np.asarray(columns["probs"], dtype=np.float64)[:, [labels.index(label) for label in self.labels]]
+        timestamps = np.maximum(np.asarray(columns["timestamp"], dtype=np.float64), 0.0)
+        for res in self.resolutions:
+            buckets = (timestamps // res).astype(np.int64)
+            self._ensure(res, int(buckets.max()) + 1)
+            np.add.at(self._counts[res], (buckets, codes), 1)
+            np.add.at(self._prob_sums[res], buckets, probs)
+        self._extend_range(float(timestamps.min()), float(timestamps.max()))
+
+    def level_for_range(self, span, max_buckets=600):
+        """Finest resolution that shows ``span`` seconds in at most ``max_buckets`` buckets"""
+        for res in self.resolutions:
+            if span / res <= max_buckets:
+                return res
+        return self.resolutions[-1]
+
+    def series(self, res, start=None, end=None):
+        """(bucket start times, counts, mean probabilities) for non-empty buckets in [start, end]"""
+        n = self._n_buckets[res]
+        first = int(start // res) if start is not None else 0
+        last = min(n, int(end // res) + 1) if end is not None else n
+        first = max(0, min(first, last))
+        counts = self._counts[res][first:last]
+        totals = counts.sum(axis=1)
+        present = totals > 0
+        times = (np.arange(first, last) * res)[present]
+        counts = counts[present]
+        means = self._prob_sums[res][first:last][present] / totals[present, None]
+        return times, counts, means
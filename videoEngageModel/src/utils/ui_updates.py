@@ -0,0 +1,90 @@
+import time
+
+import cv2
+
+DEFAULT_PREVIEW_WIDTH = 640
+DEFAULT_PREVIEW_QUALITY = 75
+DEFAULT_PREVIEW_FPS = 10
+DEFAULT_PROGRESS_INTERVAL_MS = 250
+
+
+class UIUpdateScheduler:
+    """Rate-limit what the analysis loops send to the browser.
+
+    Every widget update is a websocket message, so:
+    - previews are downscaled to ``preview_width`` (never upscaled),
+      JPEG-encoded at ``preview_quality`` and sent at most ``preview_fps``
+      times a second, whatever the analysis rate;
+    - progress and status text update at most every ``progress_interval_ms``;
+    - ``changed(name, signature)`` tells a panel whether its data moved since
+      it last drew, so unchanged charts and metrics are not resent.
+    Calls with ``force=True`` always go through (e.g. the final state).
+    """
+
+    def __init__(self, preview_width=DEFAULT_PREVIEW_WIDTH, preview_quality=DEFAULT_PREVIEW_QUALITY,
+                 preview_fps=DEFAULT_PREVIEW_FPS, progress_interval_ms=DEFAULT_PROGRESS_INTERVAL_MS):
+        self.preview_width = preview_width
+        self.preview_quality = int(preview_quality)
+        self.preview_interval = 1.0 / preview_fps if preview_fps else 0.0
+        self.progress_interval = progress_interval_ms / 1000.0
+        self._last_preview = None
+        self._last_progress = None
+        self._signatures = {}
+        self.previews_sent = 0
+        self.previews_skipped = 0
+        self.preview_bytes = 0
+
+    def _due(self, last, interval, force):
+        return force or last is None or time.monotonic() - last >= interval
+
+    def encode_preview(self, frame):
+        """Downscaled JPEG bytes of a BGR frame"""
+        height, width = frame.shape[:2]
+        if self.preview_width and width > self.preview_width:
+            size = (self.preview_width, max(1, int(round(height * self.preview_width / width))))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.preview_quality])
+        if not ok:
+            raise ValueError("Could not encode preview frame")
+        return encoded.tobytes()
+
+    def preview_due(self, force=False):
+        """Whether a preview sent now would be within the preview FPS cap"""
+        return self._due(self._last_preview, self.preview_interval, force)
+
+    def preview(self, placeholder, frame, force=False):
+        """Show ``frame`` in ``placeholder`` if the preview FPS cap allows; returns True if sent"""
+        if not self.preview_due(force):
+            self.previews_skipped += 1
+            return False
+        self._last_preview = time.monotonic()
+        data = self.encode_preview(frame)
+        placeholder.image(data, use_column_width=True)
+        self.previews_sent += 1
+        self.preview_bytes += len(data)
+        return True
+
+    def progress(self, progress_bar, status_text, fraction, text, force=False):
+        """Update a progress bar and its status text at most every progress interval"""
+        if not self._due(self._last_progress, self.progress_interval, force):
+            return False
+        self._last_progress = time.monotonic()
+        progress_bar.progress(min(1.0, max(0.0, fraction)))
+        status_text.text(text)
+        return True
+
+    def changed(self, name, signature, min_interval_ms=0):
+        """True (and remembered) if ``signature`` differs from the last one drawn for ``name``.
+
+        With ``min_interval_ms`` a changed panel is also held back until that
+        long after its last redraw.
+        """
+        last = self._signatures.get(name)
+        if last is not None:
+            last_signature, last_time = last
+            if last_signature == signature:
+                return False
+            if time.monotonic() - last_time < min_interval_ms / 1000.0:
+                return False
+        self._signatures[name] = (signature, time.monotonic())
+        return True
@@ -0,0 +1,262 @@
+import multiprocessing as mp
+import queue
+import threading
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from utils.face_tracker import TrackAssigner
+
+
+def create_emotion_detector(backend='keras', detection_width=None):
+    """Default worker model factory; imported lazily so only workers load TensorFlow"""
+    from utils.emotion_detector import EmotionDetector
+    detector = EmotionDetector(backend=backend)
+    if detection_width is not None:
+        detector.set_detection_width(detection_width)
+    return detector
+
+
+def _worker_main(shm_name, ring_shape, detector_factory, task_queue, result_queue):
+    """Worker process: attach to the frame ring, hold one model, analyze frames"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        ring = np.ndarray(ring_shape, dtype=np.uint8, buffer=shm.buf)
+        detector = detector_factory()
+        result_queue.put(("ready", None, None, None))
+
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            seq, slot = task
+            try:
+                emotions = detector.detect_emotions(ring[slot])
+            except Exception as e:
+                print(f"Error analyzing frame in worker: {e}")
+                emotions = []
+            result_queue.put(("result", seq, slot, emotions))
+        del ring
+    finally:
+        shm.close()
+
+
+class VideoPipeline:
+    """Staged video analysis: decoder thread -> worker processes -> ordered reassembly.
+
+    The decoder thread copies each frame chosen by ``sampler`` (or every
+    ``frame_stride``-th frame without one) into a shared-memory ring of
+    ``queue_depth`` slots and hands the slot index to a pool of worker
+    processes, each holding its own model. Results are yielded in frame order
+    as ``(frame_index, frame, emotions, sample)`` where ``sample`` is the
+    sampling decision; ``frame`` is a view into the ring that stays valid
+    until the next item is requested.
+
+    With ``workers=1`` no processes are started and frames are analyzed in the
+    calling thread with ``detector``, exactly like the original loop.
+
+    When ``track_faces`` is set, ``person_id`` is a track ID that persists for
+    the whole video: in-process the detector's tracker also skips the cascade
+    between every ``detect_every`` analyzed frames; with worker processes the
+    reassembly stage associates each frame's boxes with the previous tracks.
+    """
+
+    def __init__(self, video_path, workers=1, queue_depth=8, frame_stride=5, sampler=None,
+                 track_faces=True, detect_every=5, detector=None,
+                 detector_factory=create_emotion_detector):
+        self.video_path = video_path
+        self.workers = max(1, int(workers))
+        self.queue_depth = max(self.workers, int(queue_depth))
+        self.frame_stride = max(1, int(frame_stride))
+        self.sampler = sampler
+        self.track_faces = track_faces
+        self.detect_every = detect_every
+        self.detector = detector
+        self.detector_factory = detector_factory
+
+        self.frames_decoded = 0
+        self.total_frames = 0
+        self.fps = 0.0
+
+    def __iter__(self):
+        cap = cv2.VideoCapture(self.video_path)
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = cap.get(cv2.CAP_PROP_FPS)
+        try:
+            if self.workers == 1:
+                yield from self._run_in_process(cap)
+            else:
+                yield from self._run_pipelined(cap)
+        finally:
+            cap.release()
+
+    def analysis_params(self):
+        """The settings that change this pipeline's results, e.g. for a result cache key"""
+        if self.sampler is not None:
+            sampling = {
+                "sampler": type(self.sampler).__name__,
+                "target_rate": self.sampler.target_rate,
+                "min_rate": self.sampler.min_rate,
+                "max_rate": self.sampler.max_rate
+            }
+        else:
+            sampling = {"sampler": "stride", "frame_stride": self.frame_stride}
+        if not self.track_faces:
+            person_ids = "per_frame"
+        elif self.workers == 1:
+            person_ids = "flow_tracking"
+        else:
+            # Workers see interleaved frames; IDs come from TrackAssigner after reassembly
+            person_ids = "track_assigner"
+        return dict(sampling, track_faces=self.track_faces, detect_every=self.detect_every,
+                    person_ids=person_ids)
+
+    def _sample(self, frame_index, frame):
+        if self.sampler is not None:
+            return self.sampler.decide(frame_index, frame)
+        if frame_index % self.frame_stride != 0:
+            return {"analyze": False, "reason": "stride", "change_score": None}
+        fps = self.fps if self.fps and self.fps > 0 else 30.0
+        return {"analyze": True, "reason": "stride", "change_score": None,
+                "sample_weight": self.frame_stride / fps}
+    
+    def _report_faces(self, frame, emotions):
+        if self.sampler is not None:
+            self.sampler.update_faces([e['bbox'] for e in emotions], frame.shape)
+
+    def _run_in_process(self, cap):
+        detector = self.detector if self.detector is not None else self.detector_factory()
+        if self.track_faces:
+            detector.start_tracking(self.detect_every)
+        try:
+            frame_index = 0
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                self.frames_decoded = frame_index + 1
+                sample = self._sample(frame_index, frame)
+                if sample["analyze"]:
+                    emotions = detector.detect_emotions(frame)
+                    self._report_faces(frame, emotions)
+                    yield frame_index, frame, emotions, sample
+                frame_index += 1
+        finally:
+            if self.track_faces:
+                detector.stop_tracking()
+
+    def _run_pipelined(self, cap):
+        ret, first_frame = cap.read()
+        if not ret:
+            return
+
+        ring_shape = (self.queue_depth,) + first_frame.shape
+        shm = shared_memory.SharedMemory(create=True, size=int(np.prod(ring_shape)))
+        ring = np.ndarray(ring_shape, dtype=np.uint8, buffer=shm.buf)
+
+        ctx = mp.get_context("spawn")
+        task_queue = ctx.Queue()
+        result_queue = ctx.Queue()
+        processes = [
+            ctx.Process(
+                target=_worker_main,
+                args=(shm.name, ring_shape, self.detector_factory, task_queue, result_queue),
+                daemon=True
+            )
+            for _ in range(self.workers)
+        ]
+        for p in processes:
+            p.start()
+
+        free_slots = queue.Queue()
+        for slot in range(self.queue_depth):
+            free_slots.put(slot)
+
+        # seq -> (frame_index, sample), filled by the decoder before the task is queued
+        submitted = {}
+        decode_done = threading.Event()
+        stop = threading.Event()
+
+        def decode():
+            frame_index = 0
+            seq = 0
+            frame = first_frame
+            try:
+                while not stop.is_set():
+                    if frame.shape != first_frame.shape:
+                        frame = cv2.resize(frame, (first_frame.shape[1], first_frame.shape[0]))
+                    self.frames_decoded = frame_index + 1
+                    sample = self._sample(frame_index, frame)
+                    if sample["analyze"]:
+                        slot = None
+                        while slot is None and not stop.is_set():
+                            try:
+                                slot = free_slots.get(timeout=0.1)
+                            except queue.Empty:
+                                pass
+                        if slot is None:
+                            break
+                        np.copyto(ring[slot], frame)
+                        submitted[seq] = (frame_index, sample)
+                        task_queue.put((seq, slot))
+                        seq += 1
+                    frame_index += 1
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+            finally:
+                decode_done.set()
+
+        decoder = threading.Thread(target=decode, name="video-decoder", daemon=True)
+        decoder.start()
+
+        # Workers see interleaved frames, so IDs are assigned here, in frame order
+        assigner = TrackAssigner() if self.track_faces else None
+        pending = {}
+        next_seq = 0
+        try:
+            while not (decode_done.is_set() and next_seq == len(submitted)):
+                try:
+                    kind, seq, slot, emotions = result_queue.get(timeout=0.1)
+                except queue.Empty:
+                    # Workers only exit on the shutdown sentinel, so any exit here
+                    # lost the frame it was analyzing and the ordered output would stall
+                    crashed = [p for p in processes if p.exitcode is not None]
+                    if crashed:
+                        raise RuntimeError(
+                            f"Video analysis worker exited unexpectedly (exit code {crashed[0].exitcode})"
+                        )
+                    continue
+                if kind != "result":
+                    continue
+                pending[seq] = (slot, emotions)
+
+                # Deliver everything that is now contiguous, in order
+                while next_seq in pending:
+                    slot, emotions = pending.pop(next_seq)
+                    frame_index, sample = submitted[next_seq]
+                    if assigner is not None:
+                        ids = assigner.assign([e['bbox'] for e in emotions])
+                        for emotion_data, person_id in zip(emotions, ids):
+                            emotion_data['person_id'] = person_id
+                    self._report_faces(ring[slot], emotions)
+                    yield frame_index, ring[slot], emotions, sample
+                    free_slots.put(slot)
+                    next_seq += 1
+        finally:
+            stop.set()
+            decoder.join()
+            for _ in processes:
+                task_queue.put(None)
+            for p in processes:
+                p.join(timeout=5)
+                if p.is_alive():
+                    p.terminate()
+            del ring
+            try:
+                shm.close()
+            except BufferError:
+                # The caller still holds a view of the last frame; unlinking is enough
+                pass
+            shm.unlink()
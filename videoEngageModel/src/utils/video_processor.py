@@ -1,61 +1,116 @@
 import cv2
 import numpy as np
+from collections import OrderedDict
+
+from utils.metrics import metrics
+
+# Static emotion -> BGR color palette shared by every renderer
+EMOTION_COLORS = {
+    'Happy': (0, 255, 0),      # Green
+    'Sad': (255, 0, 0),        # Blue
+    'Angry': (0, 0, 255),      # Red
+    'Fear': (128, 0, 128),     # Purple
+    'Surprise': (255, 255, 0), # Cyan
+    'Disgust': (0, 128, 0),    # Dark Green
+    'Neutral': (128, 128, 128) # Gray
+}
+DEFAULT_COLOR = (255, 255, 255)
 
 class VideoProcessor:
+    # Upper bound on cached label sprites (7 emotions x 101 confidence buckets x display options)
+    MAX_SPRITES = 4096
+    
     def __init__(self):
         self.font = cv2.FONT_HERSHEY_SIMPLEX
         self.font_scale = 0.7
         self.thickness = 2
+        
+        self._sprites = OrderedDict()
+        self._output = None
     
-    def draw_emotions(self, frame, emotions, options):
-        """Draw emotion labels and bounding boxes on frame"""
-        processed_frame = frame.copy()
+    def draw_emotions(self, frame, emotions, options, in_place=False):
+        """Draw emotion labels and bounding boxes on frame
         
+        Draws into ``frame`` itself when ``in_place`` is set, otherwise into a
+        reusable output buffer that is overwritten by the next call.
+        """
+        with metrics.span("draw"):
+            return self._draw_emotions(frame, emotions, options, in_place)
+    
+    def _draw_emotions(self, frame, emotions, options, in_place):
+        processed_frame = frame if in_place else self._output_buffer(frame)
+        
+        show_emotions = options.get('show_emotions', True)
+        show_confidence = options.get('show_confidence', True)
+        
+        # Boxes first, then labels, so a label is never hidden by a neighbouring box
         for emotion_data in emotions:
             x, y, w, h = emotion_data['bbox']
-            emotion = emotion_data['dominant_emotion']
-            confidence = emotion_data['confidence']
-            
-            # Get color for emotion
-            from utils.emotion_detector import EmotionDetector
-            detector = EmotionDetector()
-            color = detector.get_emotion_color(emotion)
-            
-            # Draw bounding box
+            color = EMOTION_COLORS.get(emotion_data['dominant_emotion'], DEFAULT_COLOR)
             cv2.rectangle(processed_frame, (x, y), (x+w, y+h), color, 2)
+        
+        for emotion_data in emotions:
+            x, y, w, h = emotion_data['bbox']
+            emotion = emotion_data['dominant_emotion']
             
-            # Prepare label text
-            label_parts = []
-            if options.get('show_emotions', True):
-                label_parts.append(emotion)
-            if options.get('show_confidence', True):
-                label_parts.append(f"{confidence:.2f}")
-            
-            label = " | ".join(label_parts)
-            
-            # Draw label background
-            label_size = cv2.getTextSize(label, self.font, self.font_scale, self.thickness)[0]
-            cv2.rectangle(
-                processed_frame,
-                (x, y - label_size[1] - 10),
-                (x + label_size[0], y),
-                color,
-                -1
-            )
-            
-            # Draw label text
-            cv2.putText(
-                processed_frame,
-                label,
-                (x, y - 5),
-                self.font,
-                self.font_scale,
-                (255, 255, 255),
-                self.thickness
-            )
+            # Labels show confidence to 2 decimals, so that is the sprite bucket
+            bucket = int(round(emotion_data['confidence'] * 100)) if show_confidence else None
+            sprite = self._get_label_sprite(emotion if show_emotions else None, bucket, emotion)
+            self._blit(processed_frame, sprite, x, y - sprite.shape[0])
         
         return processed_frame
     
+    def _output_buffer(self, frame):
+        if self._output is None or self._output.shape != frame.shape or self._output.dtype != frame.dtype:
+            self._output = np.empty_like(frame)
+        np.copyto(self._output, frame)
+        return self._output
+    
+    def _get_label_sprite(self, label_emotion, bucket, emotion):
+        """Return a pre-rendered label patch, rendering it on first use"""
+        key = (label_emotion, bucket, emotion, self.font, self.font_scale, self.thickness)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            return sprite
+        
+        label_parts = []
+        if label_emotion is not None:
+            label_parts.append(label_emotion)
+        if bucket is not None:
+            label_parts.append(f"{bucket / 100:.2f}")
+        label = " | ".join(label_parts)
+        
+        color = EMOTION_COLORS.get(emotion, DEFAULT_COLOR)
+        label_size = cv2.getTextSize(label, self.font, self.font_scale, self.thickness)[0]
+        sprite = np.empty((label_size[1] + 10, max(label_size[0], 1), 3), dtype=np.uint8)
+        sprite[:] = color
+        cv2.putText(
+            sprite,
+            label,
+            (0, label_size[1] + 5),
+            self.font,
+            self.font_scale,
+            (255, 255, 255),
+            self.thickness
+        )
+        
+        self._sprites[key] = sprite
+        if len(self._sprites) > self.MAX_SPRITES:
+            self._sprites.popitem(last=False)
+        return sprite
+    
+    @staticmethod
+    def _blit(frame, sprite, x, y):
+        """Copy sprite into frame at (x, y), clipped to the frame bounds"""
+        frame_h, frame_w = frame.shape[:2]
+        sprite_h, sprite_w = sprite.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sprite_w, frame_w), min(y + sprite_h, frame_h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        frame[y0:y1, x0:x1] = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
+    
     def resize_frame(self, frame, max_width=640, max_height=480):
         """Resize frame while maintaining aspect ratio"""
         h, w = frame.shape[:2]
@@ -84,14 +139,17 @@ class VideoProcessor:
         else:
             return frame
     
-    def add_overlay_info(self, frame, info_text, position=(10, 30)):
+    def add_overlay_info(self, frame, info_text, position=(10, 30), in_place=False):
         """Add overlay information to frame"""
-        processed_frame = frame.copy()
+        with metrics.span("overlay"):
+            return self._add_overlay_info(frame, info_text, position, in_place)
+    
+    def _add_overlay_info(self, frame, info_text, position, in_place):
+        processed_frame = frame if in_place else self._output_buffer(frame)
         
-        # Add semi-transparent background
-        overlay = processed_frame.copy()
-        cv2.rectangle(overlay, (0, 0), (400, 80), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, processed_frame, 0.3, 0, processed_frame)
+        # Darken the background region in place; same as a 0.7 black overlay blend
+        background = processed_frame[0:80, 0:400]
+        np.multiply(background, 0.3, out=background, casting='unsafe')
         
         # Add text
         y_offset = position[1]
@@ -107,4 +165,4 @@ class VideoProcessor:
             )
             y_offset += 25
         
-        return processed_frame
\ No newline at end of file
+        return processed_frame
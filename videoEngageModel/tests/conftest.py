@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import modules the way the app does: utils.* with src on the path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
@@ -0,0 +1,77 @@
+import numpy as np
+
+from utils.emotion_store import EmotionStore
+from utils.result_cache import AnalysisCache
+
+LABELS = ["Angry", "Happy", "Neutral"]
+
+
+def face(emotion="Happy", person_id=0, confidence=0.8):
+    probs = {label: (1.0 - confidence) / (len(LABELS) - 1) for label in LABELS}
+    probs[emotion] = confidence
+    return {
+        "person_id": person_id,
+        "bbox": (1, 2, 30, 40),
+        "dominant_emotion": emotion,
+        "confidence": confidence,
+        "all_emotions": probs
+    }
+
+
+def test_append_stores_columns():
+    store = EmotionStore(LABELS, capacity=8)
+    store.append(face("Angry", person_id=3), 1.5, sample_weight=0.2, sampling_reason="change")
+
+    columns = store.columns()
+    assert len(store) == 1
+    assert columns["timestamp"][0] == 1.5
+    assert columns["person_id"][0] == 3
+    assert LABELS[columns["label_code"][0]] == "Angry"
+    assert store.reasons[columns["reason_code"][0]] == "change"
+    assert list(columns["bbox"][0]) == [1, 2, 30, 40]
+
+
+def test_columns_are_views_of_the_buffer():
+    store = EmotionStore(LABELS, capacity=8)
+    store.append(face(), 0.0)
+    assert np.shares_memory(store.columns()["timestamp"], store._buffer)
+
+
+def test_full_buffer_evicts_oldest_chunk():
+    store = EmotionStore(LABELS, capacity=8, chunk_rows=4)
+    for i in range(10):
+        store.append(face(), float(i))
+
+    # Rows 0-3 were dropped in one chunk when row 8 arrived; the rest stay in order
+    assert store.dropped == 4
+    assert list(store.columns()["timestamp"]) == [float(i) for i in range(4, 10)]
+
+
+def test_evicted_chunks_spill_to_disk(tmp_path):
+    store = EmotionStore(LABELS, capacity=4, chunk_rows=2, spill_dir=str(tmp_path))
+    for i in range(9):
+        store.append(face(), float(i))
+
+    assert store.dropped == 0
+    assert len(store.spilled_paths()) == 3
+    assert list(store.columns(include_spilled=True)["timestamp"]) == [float(i) for i in range(9)]
+
+
+def test_spill_keeps_at_most_max_chunks(tmp_path):
+    store = EmotionStore(LABELS, capacity=4, chunk_rows=2, spill_dir=str(tmp_path), max_spill_chunks=1)
+    for i in range(9):
+        store.append(face(), float(i))
+
+    assert len(store.spilled_paths()) == 1
+    assert store.dropped == 4
+    assert list(store.columns(include_spilled=True)["timestamp"]) == [float(i) for i in range(4, 9)]
+
+
+def test_extend_columns_reorders_labels():
+    records = [dict(face("Angry"), timestamp=0.0), dict(face("Neutral", confidence=0.6), timestamp=1.0)]
+    columns = AnalysisCache._to_columns(records, list(reversed(LABELS)))
+
+    store = EmotionStore.from_columns(columns, labels=LABELS)
+    out = store.columns()
+    assert [LABELS[code] for code in out["label_code"]] == ["Angry", "Neutral"]
+    assert abs(out["probs"][1][LABELS.index("Neutral")] - 0.6) < 1e-6
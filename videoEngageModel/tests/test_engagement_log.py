@@ -0,0 +1,87 @@
+import json
+import os
+
+from utils import engagement_log
+from utils.engagement_log import EngagementLog
+
+
+def test_records_round_trip(tmp_path):
+    log = EngagementLog(str(tmp_path), "video", flush_interval=0.01)
+    for i in range(5):
+        assert log.append({"i": i})
+    log.close()
+
+    assert [record["i"] for record in log.read_all()] == list(range(5))
+    assert log.written == 5
+    assert log.dropped == 0
+
+
+def test_rotates_by_size(tmp_path):
+    log = EngagementLog(str(tmp_path), "video", batch_size=1, flush_interval=0.01, max_segment_bytes=1)
+    # batch_size=1 writes each record as its own batch, and every batch finds
+    # the previous segment over the size limit
+    for i in range(3):
+        log.append({"i": i})
+    log.close()
+
+    assert len(log.segments()) == 3
+    assert sorted(record["i"] for record in log.read_all()) == [0, 1, 2]
+
+
+def test_survives_fsync_errors(tmp_path, monkeypatch):
+    real_fsync = os.fsync
+    failures = []
+
+    def flaky_fsync(fd):
+        if len(failures) < 2:
+            failures.append(fd)
+            raise OSError(5, "Input/output error")
+        real_fsync(fd)
+
+    monkeypatch.setattr(engagement_log.os, "fsync", flaky_fsync)
+    log = EngagementLog(str(tmp_path), "video", fsync="batch", batch_size=1, flush_interval=0.01)
+    for i in range(4):
+        log.append({"i": i})
+    log.close()
+
+    assert log.errors == 2
+    assert log.written == 4
+    assert sorted(record["i"] for record in log.read_all()) == [0, 1, 2, 3]
+
+
+def test_skips_torn_final_line(tmp_path):
+    log = EngagementLog(str(tmp_path), "video", flush_interval=0.01)
+    log.append({"i": 0})
+    log.close()
+    with open(log.segments()[-1], "a") as f:
+        f.write('{"i": 1')
+
+    assert list(log.read_all()) == [{"i": 0}]
+
+
+def test_migrates_legacy_file_once(tmp_path):
+    legacy = tmp_path / "video.json"
+    legacy.write_text(json.dumps([{"i": 0}, {"i": 1}]))
+
+    log = EngagementLog(str(tmp_path), "video")
+    log.close()
+    assert list(log.read_all()) == [{"i": 0}, {"i": 1}]
+    assert not legacy.exists()
+    assert (tmp_path / "video.json.migrated").exists()
+
+    # A crash after the segment was written but before the rename leaves both behind
+    legacy.write_text(json.dumps([{"i": 0}, {"i": 1}]))
+    log = EngagementLog(str(tmp_path), "video")
+    log.close()
+    assert list(log.read_all()) == [{"i": 0}, {"i": 1}]
+    assert not legacy.exists()
+
+
+def test_leaves_unreadable_legacy_file(tmp_path):
+    legacy = tmp_path / "video.json"
+    legacy.write_text('[{"i": 0},')
+
+    log = EngagementLog(str(tmp_path), "video")
+    log.close()
+    assert legacy.exists()
+    assert list(log.read_all()) == []
@@ -0,0 +1,73 @@
+import threading
+
+import numpy as np
+
+from utils.frame_sampler import AdaptiveFrameSampler
+
+
+def frame(value, shape=(72, 128, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_first_frame_is_analyzed():
+    sampler = AdaptiveFrameSampler(30, target_rate=10)
+    decision = sampler.decide(0, frame(0))
+    assert decision["analyze"]
+    assert decision["reason"] == "first"
+
+
+def test_respects_min_and_max_gap():
+    sampler = AdaptiveFrameSampler(30, target_rate=6)
+    sampler.decide(0, frame(0))
+
+    # A big change right away is still held back by the minimum gap
+    assert sampler.decide(1, frame(255))["reason"] == "min_interval"
+
+    # A static video is analyzed at least every max_gap frames
+    analyzed = [i for i in range(1, 200) if sampler.decide(i, frame(0))["analyze"]]
+    gaps = np.diff([0] + analyzed)
+    assert gaps.max() <= sampler.max_gap
+    assert gaps.min() >= sampler.min_gap
+
+
+def test_scene_change_triggers_analysis():
+    sampler = AdaptiveFrameSampler(30, target_rate=6)
+    sampler.decide(0, frame(0))
+    decision = sampler.decide(sampler.min_gap, frame(255))
+    assert decision["analyze"]
+    assert decision["reason"] == "change"
+    assert decision["sample_weight"] == sampler.min_gap / 30
+
+
+def test_change_inside_a_face_counts_more():
+    still = frame(0)
+    moved = still.copy()
+    moved[10:20, 10:20] = 255
+
+    whole = AdaptiveFrameSampler(30)
+    whole.decide(0, still)
+    faces = AdaptiveFrameSampler(30)
+    faces.decide(0, still)
+    faces.update_faces([(8, 8, 14, 14)], still.shape)
+
+    assert faces._change_score(faces._thumbnail(moved)) > whole._change_score(whole._thumbnail(moved))
+
+
+def test_update_faces_from_another_thread():
+    sampler = AdaptiveFrameSampler(30)
+    stop = threading.Event()
+
+    def report():
+        while not stop.is_set():
+            sampler.update_faces([(10, 10, 40, 40)], (72, 128, 3))
+            sampler.update_faces([(0, 0, 100, 60)], (720, 1280, 3))
+
+    reporter = threading.Thread(target=report)
+    reporter.start()
+    try:
+        for i in range(500):
+            sampler.decide(i, frame(i % 2 * 255))
+    finally:
+        stop.set()
+        reporter.join()
+    assert sampler.seen == 500
@@ -0,0 +1,112 @@
+import json
+
+import numpy as np
+
+from utils.live_metrics import LiveEmotionMetrics
+from utils.result_cache import AnalysisCache
+
+LABELS = ["Angry", "Happy", "Neutral"]
+
+
+def detections(n, seed=0):
+    rng = np.random.default_rng(seed)
+    out = []
+    for i in range(n):
+        emotion = LABELS[rng.integers(len(LABELS))]
+        confidence = float(rng.uniform(0.3, 1.0))
+        probs = {label: (1.0 - confidence) / 2 for label in LABELS}
+        probs[emotion] = confidence
+        out.append(({
+            "person_id": int(rng.integers(3)),
+            "bbox": (0, 0, 10, 10),
+            "dominant_emotion": emotion,
+            "confidence": confidence,
+            "all_emotions": probs
+        }, i * 0.25))
+    return out
+
+
+def columns_of(items):
+    records = [dict(emotion_data, timestamp=timestamp) for emotion_data, timestamp in items]
+    return AnalysisCache._to_columns(records, LABELS)
+
+
+def assert_same(a, b):
+    assert a.total == b.total
+    assert a.label_counts == b.label_counts
+    assert a.track_counts == b.track_counts
+    assert a.mode == b.mode
+    assert abs(a.confidence_mean - b.confidence_mean) < 1e-6
+    assert abs(a.confidence_variance - b.confidence_variance) < 1e-6
+    assert a.rates() == b.rates()
+
+
+def test_welford_matches_numpy():
+    items = detections(200)
+    metrics = LiveEmotionMetrics(LABELS)
+    for emotion_data, timestamp in items:
+        metrics.add(emotion_data, timestamp)
+
+    confidence = np.array([emotion_data["confidence"] for emotion_data, _ in items])
+    assert abs(metrics.confidence_mean - confidence.mean()) < 1e-9
+    assert abs(metrics.confidence_variance - confidence.var()) < 1e-9
+    counts = [sum(e["dominant_emotion"] == label for e, _ in items) for label in LABELS]
+    assert metrics.label_counts == counts
+    assert metrics.mode == LABELS[int(np.argmax(counts))]
+
+
+def test_add_columns_merges_like_adding_one_by_one():
+    # Counts without a tie: which tied label is the mode depends on arrival order
+    items = detections(301)
+    one_by_one = LiveEmotionMetrics(LABELS)
+    for emotion_data, timestamp in items:
+        one_by_one.add(emotion_data, timestamp)
+
+    # Chan et al. merge of a cached batch into a running aggregate
+    merged = LiveEmotionMetrics(LABELS)
+    for emotion_data, timestamp in items[:100]:
+        merged.add(emotion_data, timestamp)
+    merged.add_columns(columns_of(items[100:]))
+
+    assert_same(merged, one_by_one)
+
+
+def test_add_columns_keeps_mode_on_a_tie():
+    items = detections(6)
+    metrics = LiveEmotionMetrics(LABELS)
+    metrics.add(dict(items[0][0], dominant_emotion="Neutral"), 0.0)
+    tie = [(dict(emotion_data, dominant_emotion="Angry"), timestamp) for emotion_data, timestamp in items[1:2]]
+    metrics.add_columns(columns_of(tie))
+    assert metrics.mode == "Neutral"
+
+
+def test_add_columns_into_empty_aggregate():
+    items = detections(50)
+    one_by_one = LiveEmotionMetrics(LABELS)
+    for emotion_data, timestamp in items:
+        one_by_one.add(emotion_data, timestamp)
+
+    merged = LiveEmotionMetrics(LABELS)
+    merged.add_columns(columns_of(items))
+    assert_same(merged, one_by_one)
+
+
+def test_rates_expire_with_time():
+    metrics = LiveEmotionMetrics(LABELS, window=10.0)
+    for emotion_data, timestamp in detections(20):
+        metrics.add(emotion_data, timestamp)
+
+    rate, per_emotion = metrics.rates()
+    assert rate == 20 / 10.0
+    assert abs(sum(per_emotion.values()) - rate) < 1e-9
+    # Nothing new for a whole window: the rates fall to zero
+    assert metrics.rates(now=metrics.last_timestamp + 10.0)[0] == 0.0
+
+
+def test_snapshot_round_trips_through_json():
+    metrics = LiveEmotionMetrics(LABELS)
+    for emotion_data, timestamp in detections(40):
+        metrics.add(emotion_data, timestamp)
+
+    restored = LiveEmotionMetrics.restore(json.loads(json.dumps(metrics.snapshot())))
+    assert_same(restored, metrics)
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+
+from utils.result_cache import AnalysisCache
+
+LABELS = ["Angry", "Happy", "Neutral"]
+
+
+def record(timestamp, emotion, person_id=0):
+    probs = {label: 0.1 for label in LABELS}
+    probs[emotion] = 0.8
+    return {
+        "timestamp": timestamp,
+        "person_id": person_id,
+        "bbox": (1, 2, 30, 40),
+        "dominant_emotion": emotion,
+        "confidence": 0.8,
+        "all_emotions": probs,
+        "sample_weight": 0.2,
+        "sampling_reason": "change"
+    }
+
+
+def video(tmp_path, content=b"video bytes"):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_key_depends_on_content_model_and_params(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    path = video(tmp_path)
+    key = cache.make_key(path, "model-a", {"frame_rate": 6})
+
+    assert cache.make_key(path, "model-a", {"frame_rate": 6}) == key
+    assert cache.make_key(path, "model-b", {"frame_rate": 6}) != key
+    assert cache.make_key(path, "model-a", {"frame_rate": 10}) != key
+    assert cache.make_key(video(tmp_path, b"other bytes"), "model-a", {"frame_rate": 6}) != key
+
+
+def test_records_round_trip(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    records = [record(0.0, "Happy"), record(0.5, "Angry", person_id=1)]
+    assert cache.store("key", records, LABELS)
+
+    loaded = cache.load("key")
+    assert [r["dominant_emotion"] for r in loaded] == ["Happy", "Angry"]
+    assert [r["person_id"] for r in loaded] == [0, 1]
+    assert loaded[0]["bbox"] == (1, 2, 30, 40)
+    assert abs(loaded[1]["all_emotions"]["Angry"] - 0.8) < 1e-6
+    assert cache.load("missing") is None
+
+
+def test_extra_columns_are_kept(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    columns = AnalysisCache._to_columns([record(0.0, "Happy")], LABELS)
+    columns["metrics_snapshot"] = np.array('{"total": 1}')
+    cache.store_columns("key", columns)
+
+    assert str(cache.load_columns("key")["metrics_snapshot"]) == '{"total": 1}'
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    records = [record(i * 0.1, "Happy") for i in range(50)]
+    for key in ("old", "used", "new"):
+        cache.store(key, records, LABELS)
+    # Give the entries distinct ages, then touch "used" by loading it
+    for age, key in enumerate(("new", "used", "old")):
+        stamp = 1_000_000 - age * 100
+        os.utime(cache._path(key), (stamp, stamp))
+    cache.load_columns("used")
+
+    cache.max_bytes = 2 * os.path.getsize(cache._path("new"))
+    cache.evict()
+    assert cache.load_columns("old") is None
+    assert cache.load_columns("used") is not None
+    assert cache.load_columns("new") is not None
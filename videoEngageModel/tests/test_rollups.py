@@ -0,0 +1,81 @@
+import numpy as np
+
+from utils.result_cache import AnalysisCache
+from utils.rollups import EmotionRollup, lttb
+
+LABELS = ["Angry", "Happy", "Neutral"]
+
+
+def face(emotion, confidence=0.8):
+    probs = {label: (1.0 - confidence) / 2 for label in LABELS}
+    probs[emotion] = confidence
+    return {"person_id": 0, "bbox": (0, 0, 10, 10), "dominant_emotion": emotion,
+            "confidence": confidence, "all_emotions": probs}
+
+
+def test_lttb_keeps_endpoints_and_size():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50.0)
+    kept = lttb(x, y, 100)
+
+    assert len(kept) == 100
+    assert kept[0] == 0
+    assert kept[-1] == 999
+    assert np.all(np.diff(kept) > 0)
+
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(500, dtype=float)
+    y = np.zeros(500)
+    y[237] = 10.0
+    assert 237 in lttb(x, y, 20)
+
+
+def test_lttb_returns_everything_when_small():
+    x = np.arange(10, dtype=float)
+    assert list(lttb(x, x, 10)) == list(range(10))
+    assert list(lttb(x, x, 50)) == list(range(10))
+    assert list(lttb(x, x, 2)) == list(range(10))
+
+
+def test_buckets_at_each_resolution():
+    rollup = EmotionRollup(LABELS, resolutions=(1, 10))
+    rollup.add(face("Happy"), 0.2)
+    rollup.add(face("Happy"), 0.7)
+    rollup.add(face("Angry", confidence=0.6), 12.5)
+
+    times, counts, means = rollup.series(1)
+    assert list(times) == [0, 12]
+    assert counts[0].tolist() == [0, 2, 0]
+    assert abs(means[1][LABELS.index("Angry")] - 0.6) < 1e-9
+
+    times, counts, _ = rollup.series(10)
+    assert list(times) == [0, 10]
+    assert counts.sum(axis=1).tolist() == [2, 1]
+    assert (rollup.start, rollup.end) == (0.2, 12.5)
+
+
+def test_add_columns_matches_add():
+    rng = np.random.default_rng(0)
+    items = [(face(LABELS[rng.integers(3)], float(rng.uniform(0.4, 1.0))), float(t))
+             for t in rng.uniform(0, 300, 500)]
+
+    one_by_one = EmotionRollup(LABELS)
+    for emotion_data, timestamp in items:
+        one_by_one.add(emotion_data, timestamp)
+    batched = EmotionRollup(LABELS)
+    batched.add_columns(AnalysisCache._to_columns(
+        [dict(emotion_data, timestamp=timestamp) for emotion_data, timestamp in items], LABELS
+    ))
+
+    for res in one_by_one.resolutions:
+        for a, b in zip(one_by_one.series(res), batched.series(res)):
+            assert np.allclose(a, b, atol=1e-6)
+
+
+def test_level_for_range():
+    rollup = EmotionRollup(LABELS)
+    assert rollup.level_for_range(300) == 1
+    assert rollup.level_for_range(3600) == 10
+    assert rollup.level_for_range(10 * 3600) == 60
+    assert rollup.level_for_range(1000 * 3600) == 60
@@ -0,0 +1,36 @@
+from utils.face_tracker import TrackAssigner, box_iou
+
+
+def test_box_iou():
+    assert box_iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert box_iou((0, 0, 10, 10), (20, 20, 10, 10)) == 0.0
+    assert abs(box_iou((0, 0, 10, 10), (5, 0, 10, 10)) - 50 / 150) < 1e-9
+
+
+def test_ids_persist_as_faces_move():
+    assigner = TrackAssigner()
+    assert assigner.assign([(0, 0, 50, 50), (200, 0, 50, 50)]) == [0, 1]
+    # Listed in the other order and shifted a little: same people
+    assert assigner.assign([(205, 5, 50, 50), (5, 5, 50, 50)]) == [1, 0]
+
+
+def test_fast_motion_matches_by_center():
+    assigner = TrackAssigner()
+    assigner.assign([(0, 0, 40, 40)])
+    # Barely overlapping, but the center moved less than max_center_dist box sizes
+    assert assigner.assign([(25, 0, 40, 40)]) == [0]
+
+
+def test_new_face_gets_new_id():
+    assigner = TrackAssigner()
+    assigner.assign([(0, 0, 50, 50)])
+    assert assigner.assign([(0, 0, 50, 50), (300, 300, 50, 50)]) == [0, 1]
+
+
+def test_tracks_expire_after_max_missed():
+    assigner = TrackAssigner(max_missed=2)
+    assigner.assign([(0, 0, 50, 50)])
+    for _ in range(3):
+        assigner.assign([])
+    assert 0 not in assigner.tracks
+    assert assigner.assign([(0, 0, 50, 50)]) == [1]